@@ -0,0 +1,68 @@
+"""Benchmark JSON and YAML serialization backends.
+
+Times loads and dumps of every installed backend for payloads of
+increasing size, going through FileHandle so that the numbers include
+the (uncompressed) file I/O.
+
+Usage:
+    python benchmarks/bench_backends.py --records 10 1000 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from suthing import FileHandle
+from suthing.backend import available_backends
+
+
+def make_payload(n: int) -> dict:
+    return {
+        "name": "payload",
+        "items": [
+            {"id": i, "label": f"item-{i}", "weight": i / 7, "tags": ["a", "b"]}
+            for i in range(n)
+        ],
+    }
+
+
+def best_of(foo, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        foo()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in args.records:
+            item = make_payload(n)
+            for ext, kind in (("json", "json"), ("jsonld", "json"), ("yaml", "yaml")):
+                payload = item["items"] if ext == "jsonld" else item
+                path = os.path.join(tmpdir, f"payload.{ext}")
+                for backend in available_backends(kind):
+                    dump = best_of(
+                        lambda: FileHandle.dump(payload, path, backend=backend),
+                        args.repeat,
+                    )
+                    load = best_of(
+                        lambda: FileHandle.load(path, backend=backend), args.repeat
+                    )
+                    size = os.path.getsize(path) / 1024
+                    print(
+                        f"{ext:>6} {n:>7} records ({size:9.1f} KiB) "
+                        f"{backend.value:>8}: dump {dump * 1e3:9.2f} ms, "
+                        f"load {load * 1e3:9.2f} ms"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark peak RSS and wall time of FileHandle.load read paths.
+
+Compares the legacy read path (whole file read into bytes, copied through
+io.BytesIO before parsing) against the streaming and memory-mapped paths.
+Every measurement runs in a fresh interpreter so that peak RSS is not
+polluted by previous runs.
+
+Usage:
+    python benchmarks/bench_load.py --sizes 1 100 1000 --formats jsonld pkl
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import pathlib
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from suthing import FileHandle
+
+MB = 1 << 20
+
+MODES = ("legacy", "stream", "mmap")
+
+
+# suffixes handled by FileHandle._find_mode before streaming
+LEGACY_SUFFIXES = {
+    ".yml": "yaml",
+    ".yaml": "yaml",
+    ".json": "json",
+    ".jsonld": "jsonld",
+    ".pkl": "pkl",
+    ".csv": "csv",
+    ".txt": "txt",
+}
+
+
+def legacy_load(path: str):
+    """Reproduce the read path FileHandle.load used before streaming.
+
+    A standalone copy of the former implementation: the whole file is read
+    into bytes and copied through io.BytesIO (and gzip) before parsing with
+    the standard library parsers, independent of the current FileHandle.
+    """
+    lemmas = pathlib.Path(path).suffixes
+    compressed = lemmas[-1] == ".gz"
+    how = LEGACY_SUFFIXES.get(lemmas[-2] if compressed else lemmas[-1], "yaml")
+    with open(path, "rb") as fp:
+        bytes_ = fp.read()
+    if compressed:
+        with gzip.GzipFile(fileobj=io.BytesIO(bytes_), mode="r") as p:
+            return _legacy_parse(p, how)
+    with io.BytesIO(bytes_) as p:
+        return _legacy_parse(p, how)
+
+
+def _legacy_parse(p, how: str):
+    if how == "pkl":
+        return pickle.load(p)
+    elif how == "yaml":
+        import yaml
+
+        return yaml.load(p, Loader=yaml.FullLoader)
+    elif how == "json":
+        return json.load(p)
+    elif how == "jsonld":
+        return [json.loads(s.decode()) for s in p.readlines()]
+    elif how == "csv":
+        import pandas as pd
+
+        return pd.read_csv(p)
+    return p.read().decode()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss survives exec on Linux, so the child would inherit the peak
+    # of the parent that generated the data: prefer the per-mm high-water mark
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode: str, path: str) -> None:
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "legacy":
+        legacy_load(path)
+    else:
+        FileHandle.load(path, memory_map=mode == "mmap")
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"elapsed": elapsed, "peak": peak_rss_mb() - baseline}))
+
+
+def make_records(size_mb: int) -> list[dict]:
+    record = {"id": 0, "name": "x" * 64, "values": list(range(16))}
+    per_record = len(json.dumps(record)) + 1
+    return [dict(record, id=i) for i in range(size_mb * MB // per_record)]
+
+
+def write_file(records: list[dict], fmt: str, path: str) -> None:
+    if fmt == "pkl":
+        with open(path, "wb") as f:
+            pickle.dump(records, f, pickle.HIGHEST_PROTOCOL)
+    else:
+        FileHandle.dump(records, path)
+
+
+def run(size_mb: int, fmt: str, tmpdir: str) -> None:
+    records = make_records(size_mb)
+    path = os.path.join(tmpdir, f"data_{size_mb}mb.{fmt}")
+    write_file(records, fmt, path)
+    del records
+    on_disk = os.path.getsize(path) / MB
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", mode, path],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        r = json.loads(out.stdout)
+        print(
+            f"{size_mb:>6} MB {fmt:>10} ({on_disk:8.1f} MB on disk) {mode:>7}: "
+            f"{r['elapsed']:8.3f} s, peak RSS +{r['peak']:9.1f} MB"
+        )
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument(
+        "--formats", nargs="+", default=["jsonld", "jsonld.gz", "json", "pkl"]
+    )
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"))
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in args.sizes:
+            for fmt in args.formats:
+                run(size, fmt, tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark the per call overhead of the profile decorator.
+
+Times a trivial function called directly and through profile in its
+different configurations: without a profiler, with a profiler and a named
+key argument, with hashed arguments (keys cached for hashable arguments,
+hashed at every call otherwise), sampled, with resource collectors, and
+with profiling disabled process wide.
+
+Usage:
+    python benchmarks/bench_profile.py --calls 200000
+"""
+
+import argparse
+import time
+
+from suthing.decorate import SProfiler, profile, set_profiling
+
+
+def f(x, y=None, **kwargs):
+    return x
+
+
+def per_call(foo, calls: int, *args, **kwargs) -> float:
+    """Best of 3 runs, in nanoseconds per call."""
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(calls):
+            foo(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+    n = args.calls
+
+    sp = SProfiler(aggregate=True)
+    named = profile(_argnames="x")(f)
+    hashed = profile(f)
+    sampled = profile(_argnames="x", _sample=100)(f)
+    cpu = profile(_argnames="x", _collect=("cpu", "thread_cpu"))(f)
+    alloc = profile(_argnames="x", _collect="alloc")(f)
+    payload = list(range(1000))
+
+    baseline = per_call(f, n, 1, _profiler=sp)
+    rows = [
+        ("direct call", baseline),
+        ("profiled, no profiler", per_call(named, n, 1)),
+        ("profiled, _argnames", per_call(named, n, 1, _profiler=sp)),
+        ("profiled, hashed args (int)", per_call(hashed, n, 1, _profiler=sp)),
+        (
+            "profiled, hashed args (tuple of 1000)",
+            per_call(hashed, n // 10, tuple(payload), _profiler=sp),
+        ),
+        (
+            "profiled, hashed args (list, uncached)",
+            per_call(hashed, n // 100, payload, _profiler=sp),
+        ),
+        ("profiled, 1 in 100 sampled", per_call(sampled, n, 1, _profiler=sp)),
+        ("profiled, cpu and thread_cpu", per_call(cpu, n, 1, _profiler=sp)),
+        ("profiled, alloc", per_call(alloc, n // 10, 1, _profiler=sp)),
+    ]
+    set_profiling(False)
+    rows.append(("profiling disabled", per_call(named, n, 1, _profiler=sp)))
+    set_profiling(True)
+
+    print(f"{'configuration':<40}{'ns/call':>10}{'overhead':>10}")
+    for label, ns in rows:
+        print(f"{label:<40}{ns:>10.0f}{ns - baseline:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark the memory and allocation cost of decorator results.
+
+Creates a batch of Return, SimpleReturn and Report objects as timeit and
+secureit do, and reports the memory held per million objects (measured
+with tracemalloc, excluding the values they point to) and the construction
+time per object.
+
+Usage:
+    python benchmarks/bench_returns.py --count 1000000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from suthing.decorate import Report, Return, SimpleReturn
+
+FACTORIES = {
+    "Return": lambda i, v: Return(ret=v, hkey="f<(x)>", elapsed=0.5, success=True),
+    "SimpleReturn": lambda i, v: SimpleReturn(ret=v, elapsed=0.5),
+    "Report": lambda i, v: Report(hkey="f<(x)>", elapsed=0.5, success=True),
+}
+
+
+def measure(factory, count: int) -> tuple[float, float]:
+    """Memory in MB per million objects and construction time in ns each."""
+    value = object()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(i, value) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    gc.collect()
+
+    start = time.perf_counter()
+    objects = [factory(i, value) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    del objects
+    # the list holding the objects accounts for 8 bytes per object
+    return (size - 8 * count) / count, elapsed / count * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1000000)
+    args = parser.parse_args()
+
+    print(f"{'type':<15}{'MB / million':>14}{'ns / object':>14}")
+    for name, factory in FACTORIES.items():
+        per_object, ns = measure(factory, args.count)
+        print(f"{name:<15}{per_object:>14.1f}{ns:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
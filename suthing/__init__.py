@@ -1,12 +1,11 @@
-from importlib.metadata import version
+from typing import TYPE_CHECKING
 
 from .compare import equals
-from .decorate import Report, Return, SProfiler, profile, secureit, timeit
-from .file_handle import FileHandle
+from .decorate import Report, Return, SProfiler, cached, profile, secureit, timeit
 from .timer import Timer
 
-__version__ = version(__name__)
-
+if TYPE_CHECKING:
+    from .file_handle import FileHandle
 
 __all__ = [
     "Timer",
@@ -17,5 +16,25 @@ __all__ = [
     "profile",
     "timeit",
     "secureit",
+    "cached",
     "FileHandle",
 ]
+
+
+def __getattr__(name: str):
+    # resolved on first access: timing and profiling do not pay for the
+    # imports of file handling and package metadata
+    if name == "FileHandle":
+        from .file_handle import FileHandle as value
+    elif name == "__version__":
+        from importlib.metadata import version
+
+        value = version(__name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), "FileHandle", "__version__"])
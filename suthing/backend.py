@@ -0,0 +1,232 @@
+"""Serialization backends for JSON and YAML.
+
+By default JSON goes through the stdlib json module and YAML through the
+fastest installed implementation, libyaml (PyYAML's C loader and dumper) or
+pure PyYAML.
+
+orjson and ujson are opt-in, globally with set_backend or per call by passing
+backend=... to FileHandle.load / FileHandle.dump. They are faster but not
+lossless: orjson writes NaN and infinities as null and reads integers above
+64 bits as floats, and both format their output differently. Documents they
+can not read (e.g. NaN written by the stdlib json module) are read with the
+stdlib json module.
+"""
+
+import importlib
+import json
+from collections.abc import Callable
+from enum import Enum
+from functools import cache
+from typing import IO, Any
+
+
+class Backend(str, Enum):
+    """Available serialization backends."""
+
+    JSON = "json"
+    ORJSON = "orjson"
+    UJSON = "ujson"
+    PYYAML = "pyyaml"
+    LIBYAML = "libyaml"
+
+
+# candidates by format, in order of preference; the fast JSON backends are
+# opt-in since they do not round trip every document the stdlib json does
+JSON_BACKENDS = (Backend.JSON, Backend.ORJSON, Backend.UJSON)
+YAML_BACKENDS = (Backend.LIBYAML, Backend.PYYAML)
+
+# modules implementing the backends
+MODULES = {
+    Backend.JSON: "json",
+    Backend.ORJSON: "orjson",
+    Backend.UJSON: "ujson",
+    Backend.PYYAML: "yaml",
+    Backend.LIBYAML: "yaml",
+}
+
+_selected: dict[str, Backend | None] = {"json": None, "yaml": None}
+
+
+@cache
+def is_available(backend: Backend | str) -> bool:
+    """Check whether a backend can be used in the current environment.
+
+    Args:
+        backend: Backend or its name
+
+    Returns:
+        True if the backend's module (and for libyaml, the C bindings) is installed
+    """
+    backend = Backend(backend)
+    try:
+        module = importlib.import_module(MODULES[backend])
+    except ImportError:
+        return False
+    return backend != Backend.LIBYAML or hasattr(module, "CFullLoader")
+
+
+def available_backends(kind: str) -> list[Backend]:
+    """List installed backends for a format, in order of preference.
+
+    Args:
+        kind: "json" or "yaml"
+
+    Returns:
+        List of available backends
+    """
+    return [b for b in _candidates(kind) if is_available(b)]
+
+
+def _candidates(kind: str) -> tuple[Backend, ...]:
+    if kind == "json":
+        return JSON_BACKENDS
+    elif kind == "yaml":
+        return YAML_BACKENDS
+    raise ValueError(f"no serialization backends for {kind}")
+
+
+def set_backend(
+    json: Backend | str | None = None, yaml: Backend | str | None = None
+) -> None:
+    """Select backends globally.
+
+    Args:
+        json: Backend for JSON and JSON lines; "auto" restores automatic selection
+        yaml: Backend for YAML; "auto" restores automatic selection
+
+    Raises:
+        ValueError: If a backend does not serve the format or is not installed
+    """
+    for kind, name in (("json", json), ("yaml", yaml)):
+        if name is None:
+            continue
+        _selected[kind] = None if name == "auto" else resolve_backend(kind, name)
+
+
+def resolve_backend(kind: str, backend: Backend | str | None = None) -> Backend:
+    """Determine the backend to use for a format.
+
+    Args:
+        kind: "json" or "yaml"
+        backend: Requested backend; None means the global choice or,
+            if none was made, the first available one (stdlib json for
+            JSON, libyaml if installed for YAML)
+
+    Returns:
+        Backend
+
+    Raises:
+        ValueError: If the backend does not serve the format or is not installed
+    """
+    candidates = _candidates(kind)
+    if backend is None:
+        backend = _selected[kind]
+        if backend is None:
+            return next(b for b in candidates if is_available(b))
+    backend = Backend(backend)
+    if backend not in candidates:
+        raise ValueError(f"{backend.value} backend can not handle {kind}")
+    if not is_available(backend):
+        raise ValueError(f"{backend.value} backend is not installed")
+    return backend
+
+
+def json_loader(backend: Backend | str | None = None) -> Callable[[Any], Any]:
+    """Get the JSON deserialization function of a backend.
+
+    Resolving the backend once is cheaper than calling json_loads for every
+    record of a JSON lines file.
+
+    Args:
+        backend: Backend override
+
+    Returns:
+        Function deserializing a bytes or str document
+    """
+    backend = resolve_backend("json", backend)
+    if backend == Backend.JSON:
+        return json.loads
+    loads = importlib.import_module(MODULES[backend]).loads
+
+    def loads_or_fallback(data: bytes | str) -> Any:
+        try:
+            return loads(data)
+        except ValueError:
+            # e.g. NaN or Infinity, accepted by the stdlib json module
+            return json.loads(data)
+
+    return loads_or_fallback
+
+
+def json_loads(data: bytes | str, backend: Backend | str | None = None) -> Any:
+    """Deserialize a JSON document.
+
+    Args:
+        data: Serialized document
+        backend: Backend override
+
+    Returns:
+        Deserialized object
+    """
+    return json_loader(backend)(data)
+
+
+def json_dumps(
+    item: Any, indent: bool = False, backend: Backend | str | None = None
+) -> bytes:
+    """Serialize an object to UTF-8 encoded JSON.
+
+    Objects a fast backend can not serialize (e.g. integers above 64 bits for
+    orjson) are serialized with the stdlib json module.
+
+    Args:
+        item: Object to serialize
+        indent: Indent nested structures by 2 spaces
+        backend: Backend override
+
+    Returns:
+        Serialized document
+    """
+    backend = resolve_backend("json", backend)
+    try:
+        if backend == Backend.ORJSON:
+            orjson = importlib.import_module("orjson")
+            return orjson.dumps(item, option=orjson.OPT_INDENT_2 if indent else 0)
+        elif backend == Backend.UJSON:
+            ujson = importlib.import_module("ujson")
+            return ujson.dumps(item, indent=2 if indent else 0).encode("utf-8")
+    except (TypeError, OverflowError):
+        pass
+    return json.dumps(item, indent=2 if indent else None).encode("utf-8")
+
+
+def yaml_load(stream: IO[bytes] | bytes | str, backend: Backend | str | None = None):
+    """Deserialize a YAML document.
+
+    Args:
+        stream: Serialized document or a stream over it
+        backend: Backend override
+
+    Returns:
+        Deserialized object
+    """
+    yaml = importlib.import_module("yaml")
+    if resolve_backend("yaml", backend) == Backend.LIBYAML:
+        return yaml.load(stream, Loader=yaml.CFullLoader)
+    return yaml.load(stream, Loader=yaml.FullLoader)
+
+
+def yaml_dump(item: Any, backend: Backend | str | None = None) -> bytes:
+    """Serialize an object to UTF-8 encoded YAML.
+
+    Args:
+        item: Object to serialize
+        backend: Backend override
+
+    Returns:
+        Serialized document
+    """
+    yaml = importlib.import_module("yaml")
+    if resolve_backend("yaml", backend) == Backend.LIBYAML:
+        return yaml.dump(item, Dumper=yaml.CDumper).encode("utf-8")
+    return yaml.dump(item).encode("utf-8")
@@ -0,0 +1,449 @@
+"""Batches of calls with retries, timeouts and a summary.
+
+run_batch calls a function on every input in a pool of workers (threads,
+processes or asyncio tasks) and streams a Return per input, as secureit
+and timeit would: ret is the result, success and exception the outcome of
+the last attempt, elapsed its duration, hkey "name<(i)>" with i the
+position of the input. Failed attempts that were retried are kept as
+Reports in Return.reports.
+
+Inputs are consumed lazily, at most workers calls running at once. Retries
+wait backoff * 2 ** (attempt - 1) seconds, at most max_backoff. A call
+exceeding the timeout fails with TimeoutError: asyncio tasks are
+cancelled, while threads and processes (functions run in threads by the
+asyncio executor included) can not be interrupted and keep their worker
+busy until the call returns, its result being discarded.
+
+The Batch returned by run_batch (AsyncBatch for arun_batch, iterated with
+async for) summarizes the Returns it yielded: success rate, retries,
+latency distribution and failures by exception type.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import heapq
+import inspect
+import time
+from collections import Counter
+from collections.abc import AsyncGenerator, Callable, Generator, Iterable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from timeit import default_timer
+from typing import Any
+
+from suthing.decorate import Report, Return
+from suthing.stats import RunningStats, Summary
+
+
+@dataclasses.dataclass(frozen=True)
+class BatchSummary:
+    """Outcome of the calls of a batch."""
+
+    count: int
+    succeeded: int
+    failed: int
+    retries: int
+    success_rate: float
+    latency: Summary
+    failures: dict[str, int]
+
+
+class _Task:
+    __slots__ = ("attempts", "deadline", "index", "item", "reports")
+
+    def __init__(self, index: int, item: Any):
+        self.index = index
+        self.item = item
+        self.attempts = 0
+        self.deadline = 0.0
+        self.reports: list[Report] = []
+
+
+class _Scheduler:
+    """Inputs, retries and results of a batch, independent of the workers."""
+
+    def __init__(
+        self,
+        inputs: Iterable[Any],
+        name: str,
+        ordered: bool,
+        retries: int,
+        backoff: float,
+        max_backoff: float,
+        retry_on: tuple[type[BaseException], ...],
+    ):
+        self._inputs = enumerate(inputs)
+        self._exhausted = False
+        self._delayed: list[tuple[float, int, _Task]] = []
+        self._ready: dict[int, Return] = {}
+        self._next = 0
+        self.name = name
+        self.ordered = ordered
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+
+    def take(self, now: float, capacity: int) -> list[_Task]:
+        """Tasks to start: retries due, then new inputs."""
+        tasks = []
+        while len(tasks) < capacity and self._delayed and self._delayed[0][0] <= now:
+            tasks.append(heapq.heappop(self._delayed)[2])
+        while len(tasks) < capacity and not self._exhausted:
+            try:
+                tasks.append(_Task(*next(self._inputs)))
+            except StopIteration:
+                self._exhausted = True
+        for task in tasks:
+            task.attempts += 1
+        return tasks
+
+    def wake(self) -> float | None:
+        """Time of the next retry."""
+        return self._delayed[0][0] if self._delayed else None
+
+    @property
+    def idle(self) -> bool:
+        """No input nor retry left to start."""
+        return self._exhausted and not self._delayed
+
+    def finish(self, task: _Task, ok: bool, value: Any, elapsed: float) -> None:
+        """Record an attempt, scheduling a retry if it failed and may be retried."""
+        hkey = f"{self.name}<({task.index})>"
+        if ok:
+            r = Return(ret=value, hkey=hkey, success=True, elapsed=elapsed)
+        elif task.attempts <= self.retries and isinstance(value, self.retry_on):
+            task.reports.append(
+                Report(hkey=hkey, success=False, exception=value, elapsed=elapsed)
+            )
+            delay = min(self.backoff * 2 ** (task.attempts - 1), self.max_backoff)
+            heapq.heappush(self._delayed, (time.monotonic() + delay, task.index, task))
+            return
+        else:
+            r = Return(
+                ret=None, hkey=hkey, success=False, exception=value, elapsed=elapsed
+            )
+        r.reports = task.reports
+        self._ready[task.index] = r
+
+    def results(self) -> Iterator[Return]:
+        """Finished Returns, in input order if ordered."""
+        if not self.ordered:
+            ready, self._ready = self._ready, {}
+            yield from ready.values()
+            return
+        while self._next in self._ready:
+            yield self._ready.pop(self._next)
+            self._next += 1
+
+
+def _attempt(fn: Callable, item: Any) -> tuple[bool, Any, float]:
+    """Call fn, capturing the outcome (module level to be picklable)."""
+    start = default_timer()
+    try:
+        return True, fn(item), default_timer() - start
+    except Exception as e:
+        return False, e, default_timer() - start
+
+
+def _run_pool(
+    fn: Callable,
+    scheduler: _Scheduler,
+    pool: Executor,
+    workers: int,
+    timeout: float | None,
+) -> Generator[Return]:
+    running: dict[Future, _Task] = {}
+    # calls which timed out, still occupying a worker
+    abandoned: set[Future] = set()
+    try:
+        while True:
+            now = time.monotonic()
+            capacity = workers - len(running) - len(abandoned)
+            for task in scheduler.take(now, capacity):
+                if timeout is not None:
+                    task.deadline = now + timeout
+                running[pool.submit(_attempt, fn, task.item)] = task
+            yield from scheduler.results()
+            if not running and scheduler.idle:
+                return
+            wakes = [t.deadline for t in running.values()] if timeout else []
+            if (wake := scheduler.wake()) is not None:
+                wakes.append(wake)
+            delay = max(min(wakes) - now, 0) if wakes else None
+            if not running and not abandoned:
+                time.sleep(delay or 0)
+                continue
+            done, _ = wait([*running, *abandoned], delay, FIRST_COMPLETED)
+            abandoned -= done
+            for f in done:
+                task = running.pop(f, None)
+                if task is None:
+                    continue
+                try:
+                    ok, value, elapsed = f.result()
+                except Exception as e:
+                    # e.g. the input or result could not be pickled
+                    ok, value, elapsed = False, e, 0.0
+                scheduler.finish(task, ok, value, elapsed)
+            if timeout is not None:
+                now = time.monotonic()
+                for f, task in list(running.items()):
+                    if task.deadline <= now:
+                        del running[f]
+                        if not f.cancel():
+                            abandoned.add(f)
+                        scheduler.finish(
+                            task,
+                            False,
+                            TimeoutError(f"timed out after {timeout}s"),
+                            timeout,
+                        )
+    finally:
+        pool.shutdown(wait=not abandoned, cancel_futures=True)
+
+
+async def _aattempt(
+    fn: Callable, item: Any, timeout: float | None, abandoned: set[asyncio.Task]
+) -> tuple[bool, Any, float]:
+    start = default_timer()
+    if not inspect.iscoroutinefunction(fn):
+        return await _athread(fn, item, timeout, abandoned)
+    try:
+        return True, await asyncio.wait_for(fn(item), timeout), default_timer() - start
+    except asyncio.TimeoutError:
+        e = TimeoutError(f"timed out after {timeout}s")
+        return False, e, default_timer() - start
+    except Exception as e:
+        return False, e, default_timer() - start
+
+
+async def _athread(
+    fn: Callable, item: Any, timeout: float | None, abandoned: set[asyncio.Task]
+) -> tuple[bool, Any, float]:
+    """Call fn in a thread, adding it to abandoned if it times out."""
+    start = default_timer()
+    call = asyncio.ensure_future(asyncio.to_thread(_attempt, fn, item))
+    try:
+        await asyncio.wait({call}, timeout=timeout)
+    except asyncio.CancelledError:
+        call.cancel()
+        raise
+    if call.done():
+        return call.result()
+    # the thread keeps running, occupying a worker until it returns
+    abandoned.add(call)
+    e = TimeoutError(f"timed out after {timeout}s")
+    return False, e, default_timer() - start
+
+
+async def _run_tasks(
+    fn: Callable, scheduler: _Scheduler, workers: int, timeout: float | None
+) -> AsyncGenerator[Return]:
+    running: dict[asyncio.Task, _Task] = {}
+    # calls in threads which timed out, still occupying a worker
+    abandoned: set[asyncio.Task] = set()
+    try:
+        while True:
+            now = time.monotonic()
+            capacity = workers - len(running) - len(abandoned)
+            for task in scheduler.take(now, capacity):
+                call = _aattempt(fn, task.item, timeout, abandoned)
+                running[asyncio.ensure_future(call)] = task
+            for r in scheduler.results():
+                yield r
+            if not running and scheduler.idle:
+                return
+            wake = scheduler.wake()
+            delay = None if wake is None else max(wake - now, 0)
+            if not running and not abandoned:
+                await asyncio.sleep(delay or 0)
+                continue
+            done, _ = await asyncio.wait(
+                [*running, *abandoned], timeout=delay, return_when=FIRST_COMPLETED
+            )
+            abandoned -= done
+            for f in done:
+                task = running.pop(f, None)
+                if task is not None:
+                    scheduler.finish(task, *f.result())
+    finally:
+        for f in running:
+            f.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+def _sync(results: AsyncGenerator[Return]) -> Generator[Return]:
+    """Iterate over async results, running an event loop in this thread."""
+
+    async def step():
+        return await anext(results)
+
+    with asyncio.Runner() as runner:
+        try:
+            while True:
+                try:
+                    yield runner.run(step())
+                except StopAsyncIteration:
+                    return
+        finally:
+            runner.run(results.aclose())
+
+
+class _Summarized:
+    """Summary of the Returns of a batch, updated as they are read."""
+
+    def __init__(self):
+        self._latency = RunningStats()
+        self._failures: Counter[str] = Counter()
+        self._succeeded = 0
+        self._retries = 0
+
+    def _add(self, r: Return) -> Return:
+        self._latency.add(0.0 if r.elapsed is None else r.elapsed)
+        self._retries += len(r.reports)
+        if r.success:
+            self._succeeded += 1
+        else:
+            self._failures[type(r.exception).__name__] += 1
+        return r
+
+    def summary(self) -> BatchSummary:
+        """Summary of the Returns read so far."""
+        count = self._latency.count
+        return BatchSummary(
+            count=count,
+            succeeded=self._succeeded,
+            failed=count - self._succeeded,
+            retries=self._retries,
+            success_rate=self._succeeded / count if count else float("nan"),
+            latency=self._latency.summary(),
+            failures=dict(self._failures.most_common()),
+        )
+
+
+class Batch(_Summarized):
+    """Iterator over the Returns of a batch, summarizing them as they are read."""
+
+    def __init__(self, results: Generator[Return]):
+        super().__init__()
+        self._results = results
+
+    def __iter__(self) -> Batch:
+        return self
+
+    def __next__(self) -> Return:
+        return self._add(next(self._results))
+
+    def close(self) -> None:
+        """Stop the batch, cancelling the calls not started."""
+        self._results.close()
+
+
+class AsyncBatch(_Summarized):
+    """Async iterator over the Returns of a batch, see Batch."""
+
+    def __init__(self, results: AsyncGenerator[Return]):
+        super().__init__()
+        self._results = results
+
+    def __aiter__(self) -> AsyncBatch:
+        return self
+
+    async def __anext__(self) -> Return:
+        return self._add(await anext(self._results))
+
+    async def aclose(self) -> None:
+        """Stop the batch, cancelling the running calls."""
+        await self._results.aclose()
+
+
+def _scheduler(fn, inputs, workers, ordered, retries, backoff, max_backoff, retry_on):
+    if workers < 1:
+        raise ValueError(f"workers should be positive, got {workers}")
+    if retries < 0:
+        raise ValueError(f"retries should be non negative, got {retries}")
+    name = getattr(fn, "__name__", type(fn).__name__)
+    return _Scheduler(
+        inputs, name, ordered, retries, backoff, max_backoff, tuple(retry_on)
+    )
+
+
+def run_batch(
+    fn: Callable,
+    inputs: Iterable[Any],
+    workers: int = 4,
+    executor: str = "thread",
+    ordered: bool = False,
+    retries: int = 0,
+    backoff: float = 0.1,
+    max_backoff: float = 10.0,
+    retry_on: Iterable[type[BaseException]] = (Exception,),
+    timeout: float | None = None,
+) -> Batch:
+    """Call fn on every input, in parallel, streaming a Return per input.
+
+    Args:
+        fn: Function of one input; picklable for the process executor, a
+            coroutine function (or a function run in threads) for asyncio
+        inputs: Inputs, possibly a lazy iterable
+        workers: Maximum number of calls running at once
+        executor: "thread", "process" or "asyncio" (an event loop run in
+            the calling thread, see arun_batch within a running loop)
+        ordered: Yield Returns in input order, otherwise as they complete
+        retries: Number of retries of a failed call
+        backoff: Delay before the first retry, in seconds, doubled at every retry
+        max_backoff: Maximum delay between retries, in seconds
+        retry_on: Exception types of the failures to retry
+        timeout: Maximum duration of a call, in seconds
+
+    Returns:
+        Batch, an iterator of Returns with a summary
+
+    Raises:
+        ValueError: If the executor is unknown, workers is not positive or
+            retries is negative
+    """
+    scheduler = _scheduler(
+        fn, inputs, workers, ordered, retries, backoff, max_backoff, retry_on
+    )
+    if executor == "asyncio":
+        return Batch(_sync(_run_tasks(fn, scheduler, workers, timeout)))
+    if executor == "thread":
+        pool: Executor = ThreadPoolExecutor(max_workers=workers)
+    elif executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        raise ValueError(
+            f"executor should be thread, process or asyncio, got {executor}"
+        )
+    return Batch(_run_pool(fn, scheduler, pool, workers, timeout))
+
+
+def arun_batch(
+    fn: Callable,
+    inputs: Iterable[Any],
+    workers: int = 4,
+    ordered: bool = False,
+    retries: int = 0,
+    backoff: float = 0.1,
+    max_backoff: float = 10.0,
+    retry_on: Iterable[type[BaseException]] = (Exception,),
+    timeout: float | None = None,
+) -> AsyncBatch:
+    """Call fn on every input in asyncio tasks of the running loop.
+
+    Same as run_batch with the asyncio executor, iterated with async for.
+    """
+    scheduler = _scheduler(
+        fn, inputs, workers, ordered, retries, backoff, max_backoff, retry_on
+    )
+    return AsyncBatch(_run_tasks(fn, scheduler, workers, timeout))
@@ -0,0 +1,205 @@
+"""In-memory cache of loaded files.
+
+LoadCache keeps parsed file contents keyed on their source (resolved path, or
+package and resource name) and load parameters. Every entry records the
+version of its source (mtime and size for files): a changed file is a miss
+and its stale entry is replaced. Entries are evicted in least recently used
+order once the entry or byte budget is exceeded, the bytes of an entry being
+an estimate of the memory of its value, not the size of its (possibly
+compressed) file.
+"""
+
+import copy
+import dataclasses
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable, Mapping
+from enum import Enum
+from types import MappingProxyType
+from typing import Any
+
+
+class CacheMode(str, Enum):
+    """How cached values are handed out."""
+
+    # every hit returns a deep copy, callers may mutate it
+    COPY = "copy"
+    # dicts and lists are frozen into read-only views shared by all callers,
+    # pandas objects, which can not be frozen, are copied at every hit
+    FROZEN = "frozen"
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """Counters of a LoadCache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+def freeze(item: Any) -> Any:
+    """Convert nested dicts, lists and sets into read-only counterparts.
+
+    Args:
+        item: Object to freeze
+
+    Returns:
+        MappingProxyType for dicts, tuples for lists, frozensets for sets,
+        other objects unchanged
+    """
+    if isinstance(item, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in item.items()})
+    elif isinstance(item, list | tuple):
+        return tuple(freeze(v) for v in item)
+    elif isinstance(item, set):
+        return frozenset(freeze(v) for v in item)
+    return item
+
+
+def _is_frame(item: Any) -> bool:
+    """Check for a pandas DataFrame or Series, without importing pandas."""
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(item, pd.DataFrame | pd.Series)
+
+
+def sizeof(item: Any) -> int:
+    """Estimate the memory of an object and of the objects it holds.
+
+    Args:
+        item: Loaded value, nested dicts, lists, tuples and sets, DataFrames
+            or arrays
+
+    Returns:
+        Size in bytes; objects referenced more than once are counted once
+    """
+    seen: set[int] = set()
+    size = 0
+    stack = [item]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if _is_frame(item):
+            size += int(item.memory_usage(deep=True).sum())
+            continue
+        size += sys.getsizeof(item)
+        if isinstance(item, Mapping):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, list | tuple | set | frozenset):
+            stack.extend(item)
+    return size
+
+
+class LoadCache:
+    """Thread safe LRU cache of loaded files."""
+
+    def __init__(
+        self,
+        max_entries: int | None = 128,
+        max_bytes: int | None = None,
+        mode: CacheMode | str = CacheMode.COPY,
+    ):
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of entries, unbounded if None
+            max_bytes: Maximum total memory of cached values, as estimated
+                by sizeof, unbounded if None
+            mode: CacheMode, "copy" or "frozen"
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.mode = CacheMode(mode)
+        self._entries: OrderedDict[Hashable, tuple[Hashable, int, Any]] = OrderedDict()
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def _view(self, value: Any) -> Any:
+        if self.mode == CacheMode.COPY:
+            return copy.deepcopy(value)
+        return value.copy() if _is_frame(value) else value
+
+    def get(self, key: Hashable, version: Hashable, default: Any = None) -> Any:
+        """Look up a value.
+
+        Args:
+            key: Source and load parameters
+            version: Current version of the source; an entry of another
+                version is dropped
+            default: Returned on a miss
+
+        Returns:
+            Copy or frozen view of the cached value, default on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                self._drop(key)
+                self._stats.invalidations += 1
+                entry = None
+            if entry is None:
+                self._stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            value = entry[2]
+        return self._view(value)
+
+    def put(
+        self, key: Hashable, version: Hashable, value: Any, size: int | None = None
+    ) -> Any:
+        """Store a value, evicting least recently used entries if needed.
+
+        Values larger than max_bytes are not stored.
+
+        Args:
+            key: Source and load parameters
+            version: Version of the source the value was loaded from
+            value: Value to store
+            size: Cost of the value counted against max_bytes, sizeof(value)
+                if None
+
+        Returns:
+            Copy or frozen view of the value, to be handed to the caller
+        """
+        if self.mode == CacheMode.FROZEN:
+            value = freeze(value)
+        if size is None:
+            size = sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (version, size, value)
+            self._stats.bytes += size
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self._stats.bytes > self.max_bytes)
+            ):
+                self._drop(next(iter(self._entries)))
+                self._stats.evictions += 1
+        return self._view(value)
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._stats.bytes -= size
+
+    def clear(self) -> None:
+        """Remove all entries, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._stats.bytes = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        """Snapshot of the cache counters."""
+        with self._lock:
+            return dataclasses.replace(self._stats, entries=len(self._entries))
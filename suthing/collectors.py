@@ -0,0 +1,167 @@
+"""Resource usage of profiled calls, besides wall clock time.
+
+A collector measures a resource before and after a call and yields named
+metrics of the difference:
+
+    cpu          process CPU time (user + system), in seconds
+    thread_cpu   CPU time of the calling thread, in seconds
+    alloc        alloc_peak: peak of the memory traced by tracemalloc above
+                 its level at the start of the call, alloc_net: memory
+                 allocated and not freed by the call, in bytes
+    rss          rss: change of the resident set size, in bytes
+
+Collectors are selected by name (see profile and timeit) and cost nothing
+unless selected. Unless already tracing, tracemalloc is started for the
+calls measured by alloc, slowing down every allocation of the process
+meanwhile; its peak is shared by the process, so allocations of other
+threads overlap with the call.
+The RSS is read from /proc where available, elsewhere the growth of the
+peak RSS is measured.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from typing import Any, ClassVar
+
+
+class Collector(ABC):
+    """Measures a resource over a call."""
+
+    @abstractmethod
+    def start(self) -> Any:
+        """Measure before the call, returning the state passed to stop."""
+
+    @abstractmethod
+    def stop(self, state: Any) -> Iterator[tuple[str, float]]:
+        """Measure after the call, yielding metric names and values."""
+
+
+class CpuTime(Collector):
+    def start(self) -> float:
+        return time.process_time()
+
+    def stop(self, state: float) -> Iterator[tuple[str, float]]:
+        yield "cpu", time.process_time() - state
+
+
+class ThreadCpuTime(Collector):
+    def start(self) -> float:
+        return time.thread_time()
+
+    def stop(self, state: float) -> Iterator[tuple[str, float]]:
+        yield "thread_cpu", time.thread_time() - state
+
+
+class Allocations(Collector):
+    """tracemalloc peak and net allocation.
+
+    The peak of tracemalloc is reset at the start of every call; the peaks
+    seen by the calls still open are kept, so nested calls are measured
+    correctly.
+    """
+
+    # shared by the instances of the process, as tracemalloc is
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+    # [size at start, peak seen] of the calls being measured
+    _open: ClassVar[list[list[int]]] = []
+    # tracemalloc was started by the collector, to stop after the calls
+    _started: ClassVar[bool] = False
+
+    def start(self) -> list[int]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                Allocations._started = True
+            size, peak = tracemalloc.get_traced_memory()
+            for state in self._open:
+                state[1] = max(state[1], peak)
+            tracemalloc.reset_peak()
+            state = [size, size]
+            self._open.append(state)
+        return state
+
+    def stop(self, state: list[int]) -> Iterator[tuple[str, float]]:
+        with self._lock:
+            size, peak = tracemalloc.get_traced_memory()
+            for other in self._open:
+                other[1] = max(other[1], peak)
+            del self._open[next(i for i, s in enumerate(self._open) if s is state)]
+            if not self._open and self._started:
+                tracemalloc.stop()
+                Allocations._started = False
+        yield "alloc_peak", state[1] - state[0]
+        yield "alloc_net", size - state[0]
+
+
+def _statm_rss() -> int:
+    with open("/proc/self/statm", "rb") as f:
+        return int(f.read().split()[1]) * _PAGE_SIZE
+
+
+def _peak_rss() -> int:
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+if os.path.exists("/proc/self/statm"):
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+    _rss = _statm_rss
+else:
+    _rss = _peak_rss
+
+
+class Rss(Collector):
+    def start(self) -> int:
+        return _rss()
+
+    def stop(self, state: int) -> Iterator[tuple[str, float]]:
+        yield "rss", _rss() - state
+
+
+COLLECTORS: dict[str, type[Collector]] = {
+    "cpu": CpuTime,
+    "thread_cpu": ThreadCpuTime,
+    "alloc": Allocations,
+    "rss": Rss,
+}
+
+
+class Collectors:
+    """Collectors selected by name, measuring calls together."""
+
+    def __init__(self, names: str | Iterable[str]):
+        """
+        Args:
+            names: Collector name or names, keys of COLLECTORS
+
+        Raises:
+            ValueError: If a collector is unknown
+        """
+        names = [names] if isinstance(names, str) else list(names)
+        unknown = [n for n in names if n not in COLLECTORS]
+        if unknown:
+            raise ValueError(
+                f"unknown collectors {unknown}, expected some of {list(COLLECTORS)}"
+            )
+        self.names = tuple(dict.fromkeys(names))
+        self.collectors = [COLLECTORS[n]() for n in self.names]
+
+    def start(self) -> list[Any]:
+        return [c.start() for c in self.collectors]
+
+    def stop(self, states: list[Any]) -> dict[str, float]:
+        """Measure after the call, in the reverse order of start."""
+        metrics: dict[str, float] = {}
+        for c, state in zip(reversed(self.collectors), reversed(states)):
+            metrics.update(c.stop(state))
+        return metrics
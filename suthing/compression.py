@@ -0,0 +1,126 @@
+"""Compression codecs for reading and writing files.
+
+The codec is detected from the last file suffix: .gz, .bz2, .xz, .lzma and,
+if the zstandard package is installed, .zst. All readers decompress
+incrementally; all codecs read concatenated streams (members / frames),
+which makes appending to compressed files possible.
+"""
+
+import bz2
+import gzip
+import importlib
+import io
+import lzma
+from enum import Enum
+from typing import IO, cast
+
+
+class Compression(str, Enum):
+    """Supported compression codecs, valued by file suffix."""
+
+    GZ = "gz"
+    BZ2 = "bz2"
+    XZ = "xz"
+    LZMA = "lzma"
+    ZSTD = "zst"
+
+    @classmethod
+    def from_suffix(cls, lemma: str) -> "Compression | None":
+        """Determine the codec from a file suffix.
+
+        Args:
+            lemma: File suffix, e.g. ".gz"
+
+        Returns:
+            Compression or None if the suffix is not a compression suffix
+        """
+        try:
+            return cls(lemma.lstrip("."))
+        except ValueError:
+            return None
+
+
+def _zstandard():
+    try:
+        return importlib.import_module("zstandard")
+    except ImportError as e:
+        raise ImportError(
+            "zstandard package is required for .zst files: pip install zstandard"
+        ) from e
+
+
+def open_reader(fp: IO[bytes], compression: Compression | str) -> IO[bytes]:
+    """Wrap a binary stream with an incremental decompressor.
+
+    The underlying stream is not closed with the returned one.
+
+    Args:
+        fp: Binary stream over compressed content
+        compression: Codec of the content
+
+    Returns:
+        Binary stream over decompressed content
+    """
+    compression = Compression(compression)
+    if compression == Compression.GZ:
+        return cast(IO[bytes], gzip.GzipFile(fileobj=fp, mode="rb"))
+    elif compression == Compression.BZ2:
+        return cast(IO[bytes], bz2.BZ2File(fp, mode="rb"))
+    elif compression in (Compression.XZ, Compression.LZMA):
+        return cast(IO[bytes], lzma.LZMAFile(fp, mode="rb"))
+    reader = (
+        _zstandard()
+        .ZstdDecompressor()
+        .stream_reader(fp, read_across_frames=True, closefd=False)
+    )
+    # buffered for readline / line iteration
+    return io.BufferedReader(reader)  # type: ignore[arg-type]
+
+
+def open_writer(
+    fp: IO[bytes],
+    compression: Compression | str,
+    compresslevel: int | None = None,
+    threads: int | None = None,
+) -> IO[bytes]:
+    """Wrap a binary stream with an incremental compressor.
+
+    The underlying stream is not closed with the returned one.
+
+    Args:
+        fp: Binary stream receiving compressed content
+        compression: Codec to compress with
+        compresslevel: Codec specific level (gz and bz2: 1-9, default 9;
+            xz and lzma: preset 0-9, default 6; zst: 1-22, default 3)
+        threads: Number of compression threads, zst only
+            (-1 uses all cores, default single threaded)
+
+    Returns:
+        Binary stream accepting uncompressed content
+
+    Raises:
+        ValueError: If threads are requested for a codec other than zst
+    """
+    compression = Compression(compression)
+    if threads is not None and compression != Compression.ZSTD:
+        raise ValueError(
+            f"multi-threaded compression is not supported for {compression.value}"
+        )
+    if compression == Compression.GZ:
+        level = 9 if compresslevel is None else compresslevel
+        return cast(
+            IO[bytes], gzip.GzipFile(fileobj=fp, mode="wb", compresslevel=level)
+        )
+    elif compression == Compression.BZ2:
+        level = 9 if compresslevel is None else compresslevel
+        return cast(IO[bytes], bz2.BZ2File(fp, mode="wb", compresslevel=level))
+    elif compression in (Compression.XZ, Compression.LZMA):
+        format = lzma.FORMAT_XZ if compression == Compression.XZ else lzma.FORMAT_ALONE
+        return cast(
+            IO[bytes], lzma.LZMAFile(fp, mode="wb", format=format, preset=compresslevel)
+        )
+    zstd = _zstandard()
+    compressor = zstd.ZstdCompressor(
+        level=3 if compresslevel is None else compresslevel, threads=threads or 0
+    )
+    return compressor.stream_writer(fp, closefd=False)
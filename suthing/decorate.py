@@ -1,63 +1,328 @@
 from __future__ import annotations
 
+import contextlib
 import dataclasses
 import functools
 import hashlib
-from collections import defaultdict
+import inspect
+import itertools
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from collections.abc import AsyncGenerator, Generator
 from copy import deepcopy
-from typing import Any
+from timeit import default_timer
+from typing import Any, Protocol, cast
 
+from suthing.collectors import Collectors
+from suthing.stats import RunningStats, Summary
 from suthing.timer import Timer
+from suthing.trace import Tracer
 
 
-class SProfiler:
+class _Buffer:
+    """Metrics of one thread, merged into the profiler on read."""
+
+    __slots__ = ("lock", "slots", "stats", "thread", "values")
+
     def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = threading.current_thread()
+        self.values: defaultdict[str, list] = defaultdict(list)
+        self.stats: dict[str, RunningStats] = {}
+        self.slots: dict[int, dict[str, RunningStats]] = {}
+
+
+@dataclasses.dataclass
+class ProfileSnapshot:
+    """Picklable copy of the metrics of a SProfiler, see SProfiler.snapshot."""
+
+    aggregate: bool
+    values: dict[str, list] = dataclasses.field(default_factory=dict)
+    stats: dict[str, RunningStats] = dataclasses.field(default_factory=dict)
+
+    def merge(self, other: ProfileSnapshot) -> ProfileSnapshot:
+        """Combine with another snapshot into a new one."""
+        r = SProfiler(aggregate=self.aggregate)
+        r.merge(self)
+        r.merge(other)
+        return r.snapshot()
+
+    def to_dict(self) -> dict:
+        """Convert to JSON serializable structures, e.g. for FileHandle.dump."""
+        return {
+            "aggregate": self.aggregate,
+            "values": self.values,
+            "stats": {k: v.to_dict() for k, v in self.stats.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> ProfileSnapshot:
+        """Rebuild a snapshot converted with to_dict."""
+        return cls(
+            aggregate=d["aggregate"],
+            values=d["values"],
+            stats={k: RunningStats.from_dict(v) for k, v in d["stats"].items()},
+        )
+
+
+class SProfiler:
+    """Collects metrics (by default timings) of profiled calls by hkey.
+
+    By default every value is kept in a list. With aggregate=True only a
+    RunningStats per hkey is kept (count, sum, extrema, variance and
+    quantiles, see suthing.stats), in constant memory, and view_stats
+    returns immutable Summary snapshots instead of copies of the lists.
+
+    A profiler may be shared by threads: every thread adds metrics to its
+    own buffer, the buffers are merged when the metrics are read. Profiles
+    of other processes are combined through snapshot and merge.
+
+    With trace=True, nested profiled calls are traced as spans by
+    self.tracer (see suthing.trace): the self time of a call, excluding its
+    profiled children, is recorded as metric "self" of its hkey.
+
+    With a window, the metrics of the last window seconds are also kept in
+    RunningStats per time slot of resolution seconds, for views of recent
+    metrics, e.g. view_stats(last=300); older slots are dropped.
+    """
+
+    def __init__(
+        self,
+        aggregate: bool = False,
+        trace: bool = False,
+        window: float | None = None,
+        resolution: float = 10.0,
+    ):
+        if window is not None and not 0 < resolution <= window:
+            raise ValueError(
+                f"resolution should be in (0, window], got {resolution} for {window}"
+            )
+        self.aggregate = aggregate
+        self.tracer = Tracer() if trace else None
+        self.window = window
+        self.resolution = resolution
+        self._slots: defaultdict[int, defaultdict[str, RunningStats]] = defaultdict(
+            lambda: defaultdict(RunningStats)
+        )
         self._accumulator: defaultdict[str, list] = defaultdict(list)
+        self._stats: defaultdict[str, RunningStats] = defaultdict(RunningStats)
+        self._local = threading.local()
+        self._buffers: list[_Buffer] = []
+        self._lock = threading.Lock()
+
+    def _buffer(self) -> _Buffer:
+        buffer = _Buffer()
+        with self._lock:
+            self._buffers.append(buffer)
+        self._local.buffer = buffer
+        return buffer
 
     def add_metric(self, hkey, metric_key=None, value=0):
-        self._accumulator[hkey] += [value]
+        """Add a value of the metric of hkey, kept as "hkey:metric_key"."""
+        if metric_key is not None:
+            hkey = f"{hkey}:{metric_key}"
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._buffer()
+        with buffer.lock:
+            if self.aggregate:
+                stats = buffer.stats.get(hkey)
+                if stats is None:
+                    stats = buffer.stats[hkey] = RunningStats()
+                stats.add(value)
+            else:
+                buffer.values[hkey].append(value)
+            if self.window is not None:
+                self._add_windowed(buffer, hkey, value, self.window)
 
-    def view_stats(self):
-        return deepcopy(self._accumulator)
+    def _slot(self) -> int:
+        return int(default_timer() // self.resolution)
 
+    def _add_windowed(
+        self, buffer: _Buffer, hkey: str, value: float, window: float
+    ) -> None:
+        slot = self._slot()
+        slots = buffer.slots.get(slot)
+        if slots is None:
+            oldest = slot - window // self.resolution
+            for k in [k for k in buffer.slots if k < oldest]:
+                del buffer.slots[k]
+            slots = buffer.slots[slot] = {}
+        stats = slots.get(hkey)
+        if stats is None:
+            stats = slots[hkey] = RunningStats()
+        stats.add(value)
 
-@dataclasses.dataclass
+    def _collect(self) -> None:
+        """Merge the thread buffers, with self._lock held."""
+        alive = []
+        for buffer in self._buffers:
+            with buffer.lock:
+                values, buffer.values = buffer.values, defaultdict(list)
+                stats, buffer.stats = buffer.stats, {}
+                slots, buffer.slots = buffer.slots, {}
+            for k, v in values.items():
+                self._accumulator[k] += v
+            for k, st in stats.items():
+                self._stats[k].merge(st)
+            for slot, slot_stats in slots.items():
+                for k, st in slot_stats.items():
+                    self._slots[slot][k].merge(st)
+            if buffer.thread.is_alive():
+                alive.append(buffer)
+        self._buffers = alive
+        if self.window is not None:
+            oldest = self._slot() - self.window // self.resolution
+            for slot in [slot for slot in self._slots if slot < oldest]:
+                del self._slots[slot]
+
+    def view_stats(self, last: float | None = None):
+        """Metrics by hkey: lists of values, or Summary if aggregating.
+
+        Args:
+            last: Summarize the metrics of the last seconds only, rounded up
+                to the resolution, at most the window of the profiler
+
+        Raises:
+            ValueError: If last exceeds the window
+        """
+        if last is not None:
+            return self._view_window(last)
+        with self._lock:
+            self._collect()
+            if self.aggregate:
+                return {k: v.summary() for k, v in self._stats.items()}
+            return deepcopy(self._accumulator)
+
+    def _view_window(self, last: float) -> dict[str, Summary]:
+        if self.window is None or not 0 < last <= self.window:
+            raise ValueError(
+                f"last should be in (0, {self.window}] seconds, got {last}"
+            )
+        merged: defaultdict[str, RunningStats] = defaultdict(RunningStats)
+        with self._lock:
+            self._collect()
+            first = self._slot() - math.ceil(last / self.resolution) + 1
+            for slot, slot_stats in self._slots.items():
+                if slot >= first:
+                    for k, st in slot_stats.items():
+                        merged[k].merge(st)
+        return {k: v.summary() for k, v in merged.items()}
+
+    def snapshot(self) -> ProfileSnapshot:
+        with self._lock:
+            self._collect()
+            return ProfileSnapshot(
+                aggregate=self.aggregate,
+                values=deepcopy(dict(self._accumulator)),
+                stats=deepcopy(dict(self._stats)),
+            )
+
+    def merge(self, other: ProfileSnapshot | SProfiler) -> None:
+        """Add the metrics of a snapshot or another profiler.
+
+        Raises:
+            ValueError: If aggregated metrics are merged into a non aggregating
+                profiler
+        """
+        if isinstance(other, SProfiler):
+            other = other.snapshot()
+        if other.stats and not self.aggregate:
+            raise ValueError("can not merge aggregated metrics into raw metrics")
+        with self._lock:
+            for k, v in other.values.items():
+                if self.aggregate:
+                    for value in v:
+                        self._stats[k].add(value)
+                else:
+                    self._accumulator[k] += v
+            for k, st in other.stats.items():
+                self._stats[k].merge(st)
+
+
+@dataclasses.dataclass(slots=True)
 class SimpleReturn:
     ret: Any
     elapsed: float | None = None
     success: bool | None = None
     exception: Exception | None = None
+    items: int | None = None
 
 
 class Report:
-    def __init__(self, *args, **kwargs):
-        self.hkey: str = kwargs.pop("hkey", None)
-        self.elapsed: float = kwargs.pop("elapsed", None)
-        self.success: bool = kwargs.pop("success", None)
-        self.exception: Exception = kwargs.pop("exception", None)
+    """Outcome of a call: hkey, elapsed time, success and exception."""
+
+    __slots__ = ("elapsed", "exception", "hkey", "items", "metrics", "success")
+
+    # attributes, in the order of repr
+    _fields: tuple[str, ...] = (
+        "hkey",
+        "elapsed",
+        "success",
+        "exception",
+        "items",
+        "metrics",
+    )
+
+    def __init__(
+        self,
+        *args,
+        hkey: str | None = None,
+        elapsed: float | None = None,
+        success: bool | None = None,
+        exception: Exception | None = None,
+        items: int | None = None,
+        metrics: dict[str, float] | None = None,
+        **kwargs,
+    ):
+        self.hkey = hkey
+        self.elapsed = elapsed
+        self.success = success
+        self.exception = exception
+        self.items = items
+        self.metrics = metrics
 
     def __repr__(self):
         s = ""
-        for k, v in self.__dict__.items():
-            s += f"{k} : {v.__repr__()} \n"
+        for k in self._fields:
+            s += f"{k} : {getattr(self, k).__repr__()} \n"
         return s
 
 
 class Return(Report):
-    def __init__(self, *args, **kwargs):
+    """Result of a call with its Report, and the Reports of nested calls."""
+
+    __slots__ = ("_reports", "ret")
+
+    _fields = (*Report._fields, "ret", "reports")
+
+    def __init__(
+        self, *args, ret: Any = None, reports: list[Report] | None = None, **kwargs
+    ):
         super().__init__(*args, **kwargs)
-        self.ret: Any = kwargs.pop("ret", None)
-        self.reports: list[Report] = kwargs.pop("reports", [])
+        self.ret = ret
+        self._reports = reports
 
-    def __repr__(self):
-        s = ""
-        for k, v in self.__dict__.items():
-            s += f"{k} : {v.__repr__()} \n"
-        return s
+    @property
+    def reports(self) -> list[Report]:
+        # most Returns have no nested reports: the list is created on demand
+        if self._reports is None:
+            self._reports = []
+        return self._reports
+
+    @reports.setter
+    def reports(self, reports: list[Report]) -> None:
+        self._reports = reports
 
     def update(self, rets: list[Report]):
         for r in rets:
-            self.reports += [Report(**r.__dict__)]
+            self.reports += [Report(**{k: getattr(r, k) for k in Report._fields})]
 
 
 def hash_args(*args, **kwargs):
@@ -96,92 +361,552 @@ def derive_hid(arg_names, *args, **kwargs):
     return extra
 
 
+class _Observed:
+    """Reports the steps of a wrapped (async) generator to observers.
+
+    on_item observers are called with the time of every step yielding an
+    item, on_end observers once with the time of the last step and the
+    exception ending the iteration, None if it was exhausted or closed;
+    the exception is suppressed if any on_end observer returns True.
+    """
+
+    __slots__ = ("done", "on_end", "on_item")
+
+    def __init__(self):
+        self.done = False
+        self.on_item: list = []
+        self.on_end: list = []
+
+    def observe(self, on_item=None, on_end=None) -> None:
+        if on_item is not None:
+            self.on_item.append(on_item)
+        if on_end is not None:
+            self.on_end.append(on_end)
+
+    def _item(self, elapsed: float) -> None:
+        for f in self.on_item:
+            f(elapsed)
+
+    def _end(self, elapsed: float, exception: BaseException | None) -> bool:
+        self.done = True
+        suppress = False
+        for f in self.on_end:
+            if f(elapsed, exception):
+                suppress = True
+        return suppress
+
+
+class _Stream(_Observed, Generator):
+    """Generator delegating to a generator, timing its steps."""
+
+    __slots__ = ("gen",)
+
+    def __init__(self, gen):
+        super().__init__()
+        self.gen = gen
+
+    def send(self, value):
+        return self._step(self.gen.send, value)
+
+    def throw(self, typ, val=None, tb=None):
+        if val is None and tb is None:
+            return self._step(self.gen.throw, typ)
+        return self._step(lambda _: self.gen.throw(typ, val, tb), None)
+
+    def close(self) -> None:
+        if self.done:
+            return
+        start = default_timer()
+        try:
+            self.gen.close()
+        finally:
+            self._end(default_timer() - start, None)
+
+    def _step(self, method, value):
+        if self.done:
+            return method(value)
+        start = default_timer()
+        try:
+            item = method(value)
+        except StopIteration:
+            self._end(default_timer() - start, None)
+            raise
+        except BaseException as e:
+            if self._end(default_timer() - start, e):
+                raise StopIteration from None
+            raise
+        self._item(default_timer() - start)
+        return item
+
+    def __del__(self):
+        # streams abandoned before exhaustion are reported when collected
+        self.close()
+
+
+class _AsyncStream(_Observed, AsyncGenerator):
+    """Async generator delegating to an async generator, timing its steps."""
+
+    __slots__ = ("agen",)
+
+    def __init__(self, agen):
+        super().__init__()
+        self.agen = agen
+
+    async def asend(self, value):
+        return await self._step(self.agen.asend, value)
+
+    async def athrow(self, typ, val=None, tb=None):
+        if val is None and tb is None:
+            return await self._step(self.agen.athrow, typ)
+        return await self._step(lambda _: self.agen.athrow(typ, val, tb), None)
+
+    async def aclose(self) -> None:
+        if self.done:
+            return
+        start = default_timer()
+        try:
+            await self.agen.aclose()
+        finally:
+            self._end(default_timer() - start, None)
+
+    async def _step(self, method, value):
+        if self.done:
+            return await method(value)
+        start = default_timer()
+        try:
+            item = await method(value)
+        except StopAsyncIteration:
+            self._end(default_timer() - start, None)
+            raise
+        except BaseException as e:
+            if self._end(default_timer() - start, e):
+                raise StopAsyncIteration from None
+            raise
+        self._item(default_timer() - start)
+        return item
+
+    def __del__(self):
+        # can not be awaited here: the event loop finalizes self.agen
+        if not self.done:
+            self._end(0.0, None)
+
+
+def _call(foo, args, kwargs):
+    """Call foo, wrapping returned (async) generators into streams."""
+    r = foo(*args, **kwargs)
+    if inspect.isgenerator(r):
+        return _Stream(r)
+    if inspect.isasyncgen(r):
+        return _AsyncStream(r)
+    return r
+
+
+def _streamed(r) -> _Observed | None:
+    """Stream returned by a wrapped call, if any."""
+    if isinstance(r, (Return, SimpleReturn)):
+        r = r.ret
+    return r if isinstance(r, _Observed) else None
+
+
+def _observe_timing(r, stream: _Observed) -> None:
+    """Add the time spent in the steps of the stream to r.elapsed."""
+    r.items = 0
+
+    def on_item(elapsed):
+        r.elapsed += elapsed
+        r.items += 1
+
+    def on_end(elapsed, exception):
+        r.elapsed += elapsed
+
+    stream.observe(on_item, on_end)
+
+
+def _observe_failure(r, stream: _Observed) -> None:
+    """Record the success of the iteration of the stream on r.
+
+    Exceptions raised by the stream end the iteration and are stored in
+    r.exception.
+    """
+    r.success = None
+
+    def on_end(elapsed, exception):
+        if exception is None:
+            r.success = True
+        elif isinstance(exception, Exception):
+            r.success = False
+            r.exception = exception
+            return True
+        return False
+
+    stream.observe(on_end=on_end)
+
+
+def _simple_timed(r, elapsed):
+    if isinstance(r, Return):
+        r.elapsed = elapsed
+    else:
+        r = SimpleReturn(ret=r, elapsed=elapsed)
+    stream = _streamed(r)
+    if stream is not None:
+        _observe_timing(r, stream)
+    return r
+
+
 def simple_timeit(foo):
+    if inspect.iscoroutinefunction(foo):
+
+        @functools.wraps(foo)
+        async def async_wrapper(*args, **kwargs):
+            with Timer() as timer:
+                r = await foo(*args, **kwargs)
+            return _simple_timed(r, timer.elapsed)
+
+        return async_wrapper
+
     @functools.wraps(foo)
     def wrapper(*args, **kwargs):
         with Timer() as timer:
-            r = foo(*args, **kwargs)
-        if isinstance(r, Return):
-            r.elapsed = timer.elapsed
-        else:
-            r = SimpleReturn(ret=r, elapsed=timer.elapsed)
-        return r
+            r = _call(foo, args, kwargs)
+        return _simple_timed(r, timer.elapsed)
 
     return wrapper
 
 
+def _simple_secured(r):
+    if isinstance(r, Return):
+        r.success = True
+    else:
+        r = SimpleReturn(ret=r, success=True)
+    stream = _streamed(r)
+    if stream is not None:
+        _observe_failure(r, stream)
+    return r
+
+
 def simple_secureit(foo):
+    if inspect.iscoroutinefunction(foo):
+
+        @functools.wraps(foo)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                r = await foo(*args, **kwargs)
+            except Exception as e:
+                return SimpleReturn(ret=None, success=False, exception=e)
+            return _simple_secured(r)
+
+        return async_wrapper
+
     @functools.wraps(foo)
     def wrapper(*args, **kwargs):
         try:
-            r = foo(*args, **kwargs)
-            if isinstance(r, Return):
-                r.success = True
-            else:
-                r = SimpleReturn(ret=r, success=True)
+            r = _call(foo, args, kwargs)
         except Exception as e:
-            r = SimpleReturn(ret=None, success=False, exception=e)
-        return r
+            return SimpleReturn(ret=None, success=False, exception=e)
+        return _simple_secured(r)
 
     return wrapper
 
 
-def timeit(foo, arg_name=None):
+def _timed(r, elapsed, hkey):
+    if isinstance(r, Return):
+        r.elapsed = elapsed
+        if r.hkey is None:
+            r.hkey = hkey
+    else:
+        r = Return(ret=r, hkey=hkey, elapsed=elapsed)
+    stream = _streamed(r)
+    if stream is not None:
+        _observe_timing(r, stream)
+    return r
+
+
+def timeit(foo, arg_name=None, collect=None):
+    """Time calls of foo into a Return.
+
+    Args:
+        arg_name: Name(s) of the arguments whose values go into the hkey;
+            all arguments are hashed into it if None
+        collect: Names of resource collectors (see suthing.collectors),
+            whose metrics go into Return.metrics; not applied to generators
+    """
+    collectors = Collectors(collect) if collect else None
+
+    if inspect.iscoroutinefunction(foo):
+
+        @functools.wraps(foo)
+        async def async_wrapper(*args, **kwargs):
+            states = [] if collectors is None else collectors.start()
+            try:
+                with Timer() as timer:
+                    r = await foo(*args, **kwargs)
+            finally:
+                metrics = None if collectors is None else collectors.stop(states)
+            hkey = foo.__name__ + f"<{derive_hid(arg_name, *args, **kwargs)}>"
+            r = _timed(r, timer.elapsed, hkey)
+            if metrics is not None:
+                r.metrics = metrics
+            return r
+
+        return async_wrapper
+
     @functools.wraps(foo)
     def wrapper(*args, **kwargs):
-        with Timer() as timer:
-            r = foo(*args, **kwargs)
+        states = [] if collectors is None else collectors.start()
+        try:
+            with Timer() as timer:
+                r = _call(foo, args, kwargs)
+        finally:
+            metrics = None if collectors is None else collectors.stop(states)
 
         extra_str = derive_hid(arg_name, *args, **kwargs)
         hkey = foo.__name__ + f"<{extra_str}>"
-        if isinstance(r, Return):
-            r.elapsed = timer.elapsed
-            if r.hkey is None:
-                r.hkey = hkey
-        else:
-            r = Return(ret=r, hkey=hkey, elapsed=timer.elapsed)
+        r = _timed(r, timer.elapsed, hkey)
+        if metrics is not None:
+            r.metrics = metrics
         return r
 
     return wrapper
 
 
+def _secured(r, hkey):
+    if isinstance(r, Return):
+        r.success = True
+        if r.hkey is None:
+            r.hkey = hkey
+    else:
+        r = Return(ret=r, hkey=hkey, success=True)
+    stream = _streamed(r)
+    if stream is not None:
+        _observe_failure(r, stream)
+    return r
+
+
 def secureit(foo, arg_name=None):
+    if inspect.iscoroutinefunction(foo):
+
+        @functools.wraps(foo)
+        async def async_wrapper(*args, **kwargs):
+            hkey = foo.__name__ + f"<{derive_hid(arg_name, *args, **kwargs)}>"
+            try:
+                r = await foo(*args, **kwargs)
+            except Exception as e:
+                return Return(ret=None, hkey=hkey, success=False, exception=e)
+            return _secured(r, hkey)
+
+        return async_wrapper
+
     @functools.wraps(foo)
     def wrapper(*args, **kwargs):
         extra_str = derive_hid(arg_name, *args, **kwargs)
         hkey = foo.__name__ + f"<{extra_str}>"
         try:
-            r = foo(*args, **kwargs)
-            if isinstance(r, Return):
-                r.success = True
-                if r.hkey is None:
-                    r.hkey = hkey
-            else:
-                r = Return(ret=r, hkey=hkey, success=True)
+            r = _call(foo, args, kwargs)
         except Exception as e:
-            r = Return(ret=None, hkey=hkey, success=False, exception=e)
-        return r
+            return Return(ret=None, hkey=hkey, success=False, exception=e)
+        return _secured(r, hkey)
 
     return wrapper
 
 
-def profile(_foo=None, _argnames=None):
+# process wide switch of profile, also set by SUTHING_PROFILE=0 in the environment
+_profiling = os.environ.get("SUTHING_PROFILE", "1").lower() not in ("0", "false", "off")
+
+
+def set_profiling(enabled: bool) -> None:
+    """Enable or disable profile in the whole process.
+
+    Disabled profiled functions are called directly, at the cost of one
+    global lookup.
+    """
+    global _profiling
+    _profiling = enabled
+
+
+def profiling_enabled() -> bool:
+    return _profiling
+
+
+def _key_function(foo, argnames):
+    """Build the hkey derivation of a profiled function, once.
+
+    Keys are those of derive_hid, given that profiled calls always have a
+    _profiler keyword argument. Keys of hashed arguments are cached by the
+    arguments and their types, when hashable: equal values of different
+    types (1, 1.0 and True) have different strings, hence hkeys.
+    """
+    name = foo.__name__
+    if argnames is None:
+
+        @functools.lru_cache(maxsize=1024)
+        def typed_key(args, items, types):
+            return name + derive_hid(None, *args, **dict(items))
+
+        def key(args, kwargs):
+            items = tuple(kwargs.items())
+            types = (*map(type, args), *map(type, kwargs.values()))
+            try:
+                return typed_key(args, items, types)
+            except TypeError:
+                # unhashable arguments
+                return name + derive_hid(None, *args, **kwargs)
+
+        return key
+
+    prefix = f"{name}({argnames}="
+
+    def key(args, kwargs):
+        value = kwargs.get(argnames, None)
+        if value is None and args:
+            value = args[0]
+        return f"{prefix}{value})"
+
+    return key
+
+
+def _recorder(profiler: SProfiler, hkey: str):
+    """Observers of a profiled stream, recording its items and total time."""
+    total = 0.0
+
+    def on_item(elapsed):
+        nonlocal total
+        total += elapsed
+        profiler.add_metric(hkey, "item", elapsed)
+
+    def on_end(elapsed, exception):
+        profiler.add_metric(hkey, value=total + elapsed)
+
+    return on_item, on_end
+
+
+class _Call:
+    """A profiled call, traced or measured by collectors."""
+
+    __slots__ = ("collectors", "hkey", "profiler", "start", "states", "trace")
+
+    def __init__(self, profiler: SProfiler, hkey: str, collectors: Collectors | None):
+        self.profiler = profiler
+        self.hkey = hkey
+        self.collectors = collectors
+        self.states = [] if collectors is None else collectors.start()
+        # tracer, span and context token of a traced call
+        self.trace = None
+        if profiler.tracer is not None:
+            self.trace = (profiler.tracer, *profiler.tracer.start(hkey))
+        self.start = default_timer()
+
+    def close(self, failed: bool = False) -> None:
+        """Record the metrics of the call, unless it failed."""
+        elapsed = default_timer() - self.start
+        self_time = None
+        if self.trace is not None:
+            tracer, span, token = self.trace
+            elapsed, self_time = tracer.finish(span, token)
+        metrics = {} if self.collectors is None else self.collectors.stop(self.states)
+        if failed:
+            return
+        self.profiler.add_metric(hkey=self.hkey, value=elapsed)
+        if self_time is not None:
+            self.profiler.add_metric(self.hkey, "self", self_time)
+        for name, value in metrics.items():
+            self.profiler.add_metric(self.hkey, name, value)
+
+
+def profile(_foo=None, _argnames=None, _sample=1, _collect=None):
+    """Time calls made with a _profiler keyword argument into the profiler.
+
+    Coroutine functions are timed until their result is returned. Calls of
+    (async) generator functions return a generator timing its steps: the
+    time of every item is recorded as "hkey:item", the total time spent
+    in the generator under hkey once it is exhausted, fails or is closed.
+
+    Calls are traced as spans if the profiler traces, see SProfiler;
+    generators are not, as their steps run in the context of the consumer.
+
+    Args:
+        _argnames: Name of the argument whose value goes into the hkey;
+            all arguments are hashed into it if None
+        _sample: Profile one in _sample calls
+        _collect: Names of resource collectors (see suthing.collectors), e.g.
+            ("cpu", "alloc"), whose metrics are recorded as "hkey:metric";
+            not applied to generators
+    """
+    if _argnames is not None and not isinstance(_argnames, str):
+        raise TypeError(f"_arg_name type should be str, got {type(_argnames)} instead")
+    if _sample < 1:
+        raise ValueError(f"_sample should be positive, got {_sample}")
+
+    collectors = Collectors(_collect) if _collect else None
+
     def wrapper(foo):
+        key = _key_function(foo, _argnames)
+        calls = itertools.count()
+
+        def profiler_of(kwargs):
+            if not _profiling:
+                return None
+            _profiler = kwargs.get("_profiler", None)
+            if _profiler is None or (_sample > 1 and next(calls) % _sample):
+                return None
+            return _profiler
+
+        if inspect.iscoroutinefunction(foo):
+
+            @functools.wraps(foo)
+            async def decorate_coroutine(*args, **kwargs):
+                _profiler = profiler_of(kwargs)
+                if _profiler is None:
+                    return await foo(*args, **kwargs)
+                if _profiler.tracer is None and collectors is None:
+                    start = default_timer()
+                    r = await foo(*args, **kwargs)
+                    elapsed = default_timer() - start
+                    _profiler.add_metric(hkey=key(args, kwargs), value=elapsed)
+                    return r
+                call = _Call(_profiler, key(args, kwargs), collectors)
+                try:
+                    r = await foo(*args, **kwargs)
+                except BaseException:
+                    call.close(failed=True)
+                    raise
+                call.close()
+                return r
+
+            return decorate_coroutine
+
+        if inspect.isgeneratorfunction(foo) or inspect.isasyncgenfunction(foo):
+
+            @functools.wraps(foo)
+            def decorate_generator(*args, **kwargs):
+                _profiler = profiler_of(kwargs)
+                if _profiler is None:
+                    return foo(*args, **kwargs)
+                stream = _call(foo, args, kwargs)
+                stream.observe(*_recorder(_profiler, key(args, kwargs)))
+                return stream
+
+            return decorate_generator
+
         @functools.wraps(foo)
         def decorate_with_timing(*args, **kwargs):
+            if not _profiling:
+                return foo(*args, **kwargs)
             _profiler = kwargs.get("_profiler", None)
-            if _argnames is not None and not isinstance(_argnames, str):
-                raise TypeError(
-                    f"_arg_name type should be str, got {type(_argnames)} instead"
-                )
-            if _profiler is not None:
-                with Timer() as timer:
-                    r = foo(*args, **kwargs)
-                extra_str = derive_hid(_argnames, *args, **kwargs)
-                hkey = foo.__name__ + f"{extra_str}"
-                _profiler.add_metric(hkey=hkey, value=timer.elapsed)
-            else:
+            if _profiler is None or (_sample > 1 and next(calls) % _sample):
+                return foo(*args, **kwargs)
+            if _profiler.tracer is None and collectors is None:
+                start = default_timer()
+                r = foo(*args, **kwargs)
+                elapsed = default_timer() - start
+                _profiler.add_metric(hkey=key(args, kwargs), value=elapsed)
+                return r
+            call = _Call(_profiler, key(args, kwargs), collectors)
+            try:
                 r = foo(*args, **kwargs)
+            except BaseException:
+                call.close(failed=True)
+                raise
+            call.close()
             return r
 
         return decorate_with_timing
@@ -190,3 +915,356 @@ def profile(_foo=None, _argnames=None):
         return wrapper
     else:
         return wrapper(_foo)
+
+
+_MISSING = object()
+
+# counter of CacheInfo by metric of cached
+_COUNTERS = {
+    "hit": "hits",
+    "disk_hit": "disk_hits",
+    "miss": "misses",
+    "coalesced": "coalesced",
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheInfo:
+    """Counters of a cached function, see cached."""
+
+    hits: int
+    disk_hits: int
+    misses: int
+    coalesced: int
+    size: int
+    maxsize: int | None
+
+
+class CachedFunction(Protocol):
+    """Function decorated with cached."""
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any: ...
+
+    def cache_info(self) -> CacheInfo: ...
+
+    def cache_clear(self) -> None: ...
+
+
+class _Flight:
+    """A computation other callers of the same key wait for."""
+
+    __slots__ = ("event", "exception", "value")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.exception: BaseException | None = None
+
+
+class _Cache:
+    """In memory LRU with expiry, backed by files written with FileHandle."""
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int | None,
+        ttl: float | None,
+        path: str | None,
+        how: str,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.how = how
+        self.lock = threading.Lock()
+        # key -> (value, expiry time or None)
+        self.entries: OrderedDict[str, tuple[Any, float | None]] = OrderedDict()
+        # computations in progress: _Flight by key for functions, task by
+        # (event loop, key) for coroutine functions
+        self.flights: dict[Any, Any] = {}
+        self.counts = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+
+    def get(self, key: str) -> Any:
+        """Value in memory, _MISSING if absent or expired; with self.lock held."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires = entry
+        if expires is not None and expires <= time.time():
+            del self.entries[key]
+            return _MISSING
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any, expires: float | None) -> None:
+        """Keep a value in memory; with self.lock held."""
+        if self.maxsize == 0:
+            return
+        self.entries[key] = (value, expires)
+        self.entries.move_to_end(key)
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def load(self, key: str) -> tuple[Any, float | None]:
+        """Value and expiry time on disk, _MISSING if absent, expired or corrupt."""
+        if self.path is None:
+            return _MISSING, None
+        from suthing.file_handle import FileHandle
+
+        path = os.path.join(self.path, f"{self.name}-{key}.{self.how}")
+        try:
+            entry = FileHandle.load(path)
+            value, expires = entry["value"], entry["expires"]
+        except FileNotFoundError:
+            return _MISSING, None
+        except Exception:
+            # corrupt or truncated, dropped to be recomputed
+            expires = 0.0
+        if expires is not None and expires <= time.time():
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            return _MISSING, None
+        return value, expires
+
+    def dump(self, key: str, value: Any, expires: float | None) -> None:
+        """Write a value to disk, atomically."""
+        if self.path is None:
+            return
+        from suthing.file_handle import FileHandle, FileType
+
+        name = f"{self.name}-{key}.{self.how}"
+        # hidden, with the suffix of the format
+        tmp = os.path.join(self.path, f".{os.getpid()}.{threading.get_ident()}.{name}")
+        try:
+            FileHandle.dump(
+                {"value": value, "expires": expires}, tmp, how=FileType(self.how)
+            )
+            os.replace(tmp, os.path.join(self.path, name))
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+
+    def compute(self, key: str, compute) -> tuple[Any, str]:
+        """Value from disk or computed, stored in both tiers."""
+        value, expires = self.load(key)
+        if value is not _MISSING:
+            tier = "disk_hit"
+        else:
+            value = compute()
+            expires = None if self.ttl is None else time.time() + self.ttl
+            self.dump(key, value, expires)
+            tier = "miss"
+        with self.lock:
+            self.put(key, value, expires)
+        return value, tier
+
+    async def acompute(self, key: str, compute) -> tuple[Any, float | None, str]:
+        """Value from disk or awaited, written to disk in a thread."""
+        import asyncio
+
+        value, expires = _MISSING, None
+        if self.path is not None:
+            value, expires = await asyncio.to_thread(self.load, key)
+        if value is not _MISSING:
+            return value, expires, "disk_hit"
+        value = await compute()
+        expires = None if self.ttl is None else time.time() + self.ttl
+        if self.path is not None:
+            await asyncio.to_thread(self.dump, key, value, expires)
+        return value, expires, "miss"
+
+    def land(self, flight_key: tuple, task) -> None:
+        """Keep the value of a finished task in memory, ending its flight."""
+        with self.lock:
+            if not task.cancelled() and task.exception() is None:
+                value, expires, _ = task.result()
+                self.put(flight_key[1], value, expires)
+            del self.flights[flight_key]
+
+    def count(self, tier: str) -> None:
+        with self.lock:
+            self.counts[_COUNTERS[tier]] += 1
+
+    def info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(
+                **self.counts, size=len(self.entries), maxsize=self.maxsize
+            )
+
+    def clear(self) -> None:
+        """Empty both tiers and reset the counters."""
+        with self.lock:
+            self.entries.clear()
+            self.counts = dict.fromkeys(self.counts, 0)
+        if self.path is not None and os.path.isdir(self.path):
+            prefix, suffix = f"{self.name}-", f".{self.how}"
+            for f in os.listdir(self.path):
+                if f.startswith(prefix) and f.endswith(suffix):
+                    with contextlib.suppress(OSError):
+                        os.remove(os.path.join(self.path, f))
+
+
+def _cache_key(args, kwargs) -> str | None:
+    """Key of a call, hash of its pickled arguments, None if not picklable.
+
+    Pickles hold the types and full values of the arguments: 1, 1.0, True
+    and "1" have distinct keys, as have large arrays differing anywhere.
+    Equal arguments pickled differently (e.g. dicts in another order) get
+    distinct keys, missing the cache but never returning a wrong result.
+    """
+    items = sorted(
+        ((k, v) for k, v in kwargs.items() if k != "_profiler"), key=lambda kv: kv[0]
+    )
+    try:
+        data = pickle.dumps((args, items), pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+    return hashlib.sha256(data).hexdigest()
+
+
+def cached(
+    _foo=None,
+    maxsize: int | None = 128,
+    ttl: float | None = None,
+    path: str | None = None,
+    how: str = "pkl",
+):
+    """Cache the results of a function by its arguments.
+
+    Results are kept in memory, the least recently used dropped beyond
+    maxsize, and optionally in files of the directory path, written with
+    FileHandle, which outlive the process and are shared by processes
+    (named after the qualified name of the function and the key).
+    Keys are a hash of the pickled arguments, _profiler excluded, so that
+    arguments of different types or values never share a result (see
+    _cache_key); calls with arguments that can not be pickled are not
+    cached. Concurrent calls of the same key, in threads or in asyncio
+    tasks of an event loop, wait for a single computation; exceptions are
+    not cached and are raised to every waiting caller. The computation of a
+    coroutine function runs in its own task, which the cancellation of a
+    caller does not interrupt.
+
+    With a _profiler keyword argument the latency of every call is recorded
+    under the name of the function, as metric "hit", "disk_hit", "miss" or
+    "coalesced" (callers which waited for another computation).
+
+    The wrapper has cache_info() and cache_clear() methods.
+
+    Args:
+        maxsize: Maximum number of results in memory, unbounded if None,
+            disk only if 0
+        ttl: Lifetime of results, in seconds, unlimited if None
+        path: Directory of the disk tier, none if None
+        how: File format of the disk tier, "pkl" or "json" (JSON
+            serializable results only)
+
+    Raises:
+        ValueError: If how is neither pkl nor json or maxsize is negative
+    """
+    if how not in ("pkl", "json"):
+        raise ValueError(f"how should be pkl or json, got {how}")
+    if maxsize is not None and maxsize < 0:
+        raise ValueError(f"maxsize should be non negative, got {maxsize}")
+    if path is not None:
+        path = os.path.expanduser(path)
+        os.makedirs(path, exist_ok=True)
+
+    def wrapper(foo) -> CachedFunction:
+        name = foo.__name__
+        # files are named after the qualified name of the function
+        qualname = re.sub(r"[^\w.]", "_", f"{foo.__module__}.{foo.__qualname__}")
+        cache = _Cache(qualname, maxsize, ttl, path, how)
+
+        def record(kwargs, tier, start):
+            cache.count(tier)
+            _profiler = kwargs.get("_profiler", None)
+            if _profiler is not None and _profiling:
+                _profiler.add_metric(name, tier, default_timer() - start)
+
+        if inspect.iscoroutinefunction(foo):
+
+            @functools.wraps(foo)
+            async def decorate_coroutine(*args, **kwargs):
+                import asyncio
+
+                start = default_timer()
+                key = _cache_key(args, kwargs)
+                if key is None:
+                    value = await foo(*args, **kwargs)
+                    record(kwargs, "miss", start)
+                    return value
+                loop = asyncio.get_running_loop()
+                # tasks and their results belong to one event loop
+                flight_key = (loop, key)
+                with cache.lock:
+                    value = cache.get(key)
+                    if value is _MISSING:
+                        task = cache.flights.get(flight_key)
+                        leader = task is None
+                        if leader:
+                            task = cache.flights[flight_key] = loop.create_task(
+                                cache.acompute(key, lambda: foo(*args, **kwargs))
+                            )
+                            # run by the loop once the task is done, also
+                            # retrieving its exception
+                            task.add_done_callback(
+                                functools.partial(cache.land, flight_key)
+                            )
+                if value is not _MISSING:
+                    record(kwargs, "hit", start)
+                    return value
+                value, _, tier = await asyncio.shield(task)
+                record(kwargs, tier if leader else "coalesced", start)
+                return value
+
+            decorated = decorate_coroutine
+        else:
+
+            @functools.wraps(foo)
+            def decorate_function(*args, **kwargs):
+                start = default_timer()
+                key = _cache_key(args, kwargs)
+                if key is None:
+                    value = foo(*args, **kwargs)
+                    record(kwargs, "miss", start)
+                    return value
+                with cache.lock:
+                    value = cache.get(key)
+                    if value is _MISSING:
+                        flight = cache.flights.get(key)
+                        leader = flight is None
+                        if leader:
+                            flight = cache.flights[key] = _Flight()
+                if value is not _MISSING:
+                    record(kwargs, "hit", start)
+                    return value
+                if not leader:
+                    flight.event.wait()
+                    if flight.exception is not None:
+                        raise flight.exception
+                    record(kwargs, "coalesced", start)
+                    return flight.value
+                try:
+                    value, tier = cache.compute(key, lambda: foo(*args, **kwargs))
+                    flight.value = value
+                except BaseException as e:
+                    flight.exception = e
+                    raise
+                finally:
+                    with cache.lock:
+                        del cache.flights[key]
+                    flight.event.set()
+                record(kwargs, tier, start)
+                return value
+
+            decorated = decorate_function
+
+        setattr(decorated, "cache_info", cache.info)
+        setattr(decorated, "cache_clear", cache.clear)
+        return cast(CachedFunction, decorated)
+
+    if _foo is None:
+        return wrapper
+    else:
+        return wrapper(_foo)
@@ -0,0 +1,266 @@
+"""Periodic export of SProfiler metrics.
+
+An Exporter flushes summaries of the metrics of a profiler to a file at a
+fixed interval, from a background thread, in one of the formats:
+
+    prometheus  Prometheus / OpenMetrics text exposition format, one summary
+                per metric with quantiles 0.5, 0.95 and 0.99, rewritten
+                atomically at every flush (e.g. for the textfile collector
+                of the node exporter)
+    csv         one row per hkey and window, appended at every flush
+    jsonl       one record per hkey and window, appended at every flush
+
+CSV and JSON lines files are appended to in place by a non atomic
+FileHandle.writer, the cost of a flush not growing with the file; a
+compressed file gets a new member (frame) per flush. A failed flush is
+logged, the next one retried at the following interval.
+
+Summaries cover the whole history of the profiler (window None) or the
+last seconds of it (see SProfiler window and view_stats(last=...)).
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import math
+import os
+import threading
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from suthing.compression import Compression
+from suthing.decorate import SProfiler
+from suthing.file_handle import FileHandle, FileType
+from suthing.stats import RunningStats, Summary
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("prometheus", "csv", "jsonl")
+
+# metric name of the exported summaries
+METRIC = "suthing_metric"
+
+
+def split_hkey(hkey: str) -> tuple[str, str]:
+    """Split "hkey:metric" keys of SProfiler.add_metric into hkey and metric.
+
+    Keys without a metric are timings, of metric "seconds".
+    """
+    name, sep, metric = hkey.rpartition(":")
+    if sep and name and ")" not in metric:
+        return name, metric
+    return hkey, "seconds"
+
+
+def _summaries(stats: dict[str, Any]) -> dict[str, Summary]:
+    """Summaries of the result of view_stats, raw or aggregated."""
+    summaries = {}
+    for k, v in stats.items():
+        if not isinstance(v, Summary):
+            running = RunningStats()
+            for value in v:
+                running.add(value)
+            v = running.summary()
+        summaries[k] = v
+    return summaries
+
+
+def to_records(
+    views: dict[float | None, dict[str, Summary]], timestamp: float | None = None
+) -> list[dict[str, Any]]:
+    """Flatten summaries by window and hkey into records.
+
+    Args:
+        views: Summaries by hkey, by window in seconds (None for all history)
+        timestamp: Unix time of the records, now if None
+
+    Returns:
+        Records with time, window, hkey, metric and the Summary fields
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    records = []
+    for window, summaries in views.items():
+        for hkey, summary in summaries.items():
+            name, metric = split_hkey(hkey)
+            record = {
+                "time": timestamp,
+                "window": window,
+                "hkey": name,
+                "metric": metric,
+            }
+            record.update(
+                (k, None if isinstance(v, float) and math.isnan(v) else v)
+                for k, v in dataclasses.asdict(summary).items()
+            )
+            records.append(record)
+    return records
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def to_prometheus(
+    views: dict[float | None, dict[str, Summary]], metric: str = METRIC
+) -> str:
+    """Render summaries in the Prometheus / OpenMetrics text format.
+
+    Every hkey is a summary with labels hkey, metric and, for windowed
+    views, window (in seconds).
+
+    Args:
+        views: Summaries by hkey, by window in seconds (None for all history)
+        metric: Metric name
+
+    Returns:
+        Exposition text, terminated by "# EOF"
+    """
+    lines = [f"# TYPE {metric} summary"]
+    for window, summaries in views.items():
+        for hkey, summary in sorted(summaries.items()):
+            name, kind = split_hkey(hkey)
+            labels = f'hkey="{_escape(name)}",metric="{_escape(kind)}"'
+            if window is not None:
+                labels += f',window="{window:g}"'
+            for q, v in (
+                ("0.5", summary.p50),
+                ("0.95", summary.p95),
+                ("0.99", summary.p99),
+            ):
+                lines.append(f'{metric}{{{labels},quantile="{q}"}} {_number(v)}')
+            lines.append(f"{metric}_sum{{{labels}}} {_number(summary.total)}")
+            lines.append(f"{metric}_count{{{labels}}} {summary.count}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class Exporter:
+    """Flushes the metrics of a profiler to a file, periodically.
+
+    Use as a context manager, or with start and stop:
+
+        with Exporter(profiler, "metrics.prom", windows=(60, 300, 900)):
+            serve()
+    """
+
+    def __init__(
+        self,
+        profiler: SProfiler,
+        path: str,
+        how: str | None = None,
+        interval: float = 60.0,
+        windows: Iterable[float | None] = (None,),
+    ):
+        """
+        Args:
+            profiler: Profiler to export
+            path: Destination file, compressed as its suffix says
+            how: One of FORMATS, inferred from the suffix of path if None
+                (.csv, .jsonld / .jsonl, otherwise prometheus)
+            interval: Seconds between flushes
+            windows: Windows in seconds of the exported summaries, None
+                for the whole history
+
+        Raises:
+            ValueError: If the format is unknown, a window exceeds the
+                window of the profiler or records are to be appended to an
+                lzma file
+        """
+        _, kind, compression = FileHandle.resolve_dump(path, FileType.TXT)
+        if how is None:
+            how = {FileType.CSV: "csv", FileType.JSONLD: "jsonl"}.get(
+                kind, "prometheus"
+            )
+        if how not in FORMATS:
+            raise ValueError(f"unknown export format {how}, expected one of {FORMATS}")
+        if how != "prometheus" and compression == Compression.LZMA:
+            raise ValueError("can not append to lzma files, use xz instead")
+        if interval <= 0:
+            raise ValueError(f"interval should be positive, got {interval}")
+        self.windows = tuple(windows)
+        for window in self.windows:
+            if window is not None and (
+                profiler.window is None or not 0 < window <= profiler.window
+            ):
+                raise ValueError(
+                    f"window {window} exceeds the window of the profiler"
+                    f" {profiler.window}"
+                )
+        self.profiler = profiler
+        self.path = str(path)
+        self.how = how
+        self.compression = compression
+        self.interval = interval
+        self.flushes = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def views(self) -> dict[float | None, dict[str, Summary]]:
+        """Current summaries by window."""
+        return {
+            window: _summaries(self.profiler.view_stats(last=window))
+            for window in self.windows
+        }
+
+    def flush(self) -> None:
+        """Export the current summaries."""
+        views = self.views()
+        if self.how == "prometheus":
+            head, tail = os.path.split(self.path)
+            tmp = os.path.join(head, f".{tail}.{os.getpid()}.tmp")
+            FileHandle.dump(to_prometheus(views), tmp, how=FileType.TXT)
+            os.replace(tmp, self.path)
+        else:
+            self._append(to_records(views))
+        self.flushes += 1
+
+    def _append(self, records: list[dict[str, Any]]) -> None:
+        if not records:
+            return
+        how = FileType.CSV if self.how == "csv" else FileType.JSONLD
+        with FileHandle.writer(
+            self.path, how, mode="a", batch_size=len(records), atomic=False
+        ) as writer:
+            writer.write_many(records)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                # e.g. a full disk, retried at the next flush
+                logger.exception("export of metrics to %s failed", self.path)
+
+    def start(self) -> Exporter:
+        """Start flushing in a daemon thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="suthing-exporter", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the thread, with a last flush."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __enter__(self) -> Exporter:
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
@@ -1,25 +1,71 @@
 """Utilities for handling different file types and formats.
 
 This module provides a flexible interface for reading and writing various file formats
-including YAML, JSON, CSV, pickle and others. Supports both regular and gzipped files.
+including YAML, JSON, CSV, pickle and others. Supports both regular and compressed
+(gzip, bz2, xz/lzma, zstd) files.
 """
 
-import gzip
+import asyncio
+import collections
+import contextlib
 import io
-import json
+import itertools
 import logging
+import mmap
+import os
 import pathlib
 import pickle
-import pkgutil
+import sys
+import threading
+import weakref
+from collections.abc import (
+    AsyncIterator,
+    Callable,
+    Generator,
+    Hashable,
+    Iterable,
+    Iterator,
+)
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from enum import Enum
+from importlib import resources
+from typing import IO, TYPE_CHECKING, Any, Literal, cast, overload
 
-import pandas as pd
-import yaml
-from dotenv import load_dotenv
+from suthing.backend import (
+    Backend,
+    json_dumps,
+    json_loader,
+    json_loads,
+    yaml_dump,
+    yaml_load,
+)
+from suthing.cache import LoadCache
+from suthing.compression import Compression, open_reader, open_writer
+from suthing.decorate import Return
+from suthing.index import RecordIndex, dump_indexed
+from suthing.keypath import select_json, select_yaml
+from suthing.manifest import read_manifest, shard_path, split, write_manifest
+from suthing.oob import dump_oob, is_oob, load_oob, read_oob
+from suthing.timer import Timer
+from suthing.typed import decode, decoder, record_type
+
+if TYPE_CHECKING:
+    from suthing.writer import RecordWriter
 
 logger = logging.getLogger(__name__)
 
 
+def _is_frame(item: Any) -> bool:
+    """Check for a pandas DataFrame or Series, without importing pandas."""
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(item, pd.DataFrame | pd.Series)
+
+
 def suffixes(fp: str | pathlib.Path):
     """Extract file suffixes from a path.
 
@@ -47,11 +93,65 @@ class FileType(str, Enum):
     CSV = "csv"
     TXT = "txt"
     ENV = "env"
+    PARQUET = "parquet"
+    FEATHER = "feather"
+    MANIFEST = "manifest"
+
+
+# columnar formats are binary and read through pyarrow
+COLUMNAR_TYPES = (FileType.PARQUET, FileType.FEATHER)
+
+
+_MISSING = object()
+
+
+def _batched(records: Iterator[Any], batch_size: int | None) -> Iterator[Any]:
+    """Group records in lists of batch_size, pass them through if None."""
+    if batch_size is None:
+        yield from records
+    else:
+        while batch := list(itertools.islice(records, batch_size)):
+            yield batch
+
+
+class _CancellableReader(io.RawIOBase):
+    """Raw stream that stops reading once a cancellation event is set."""
+
+    def __init__(self, fp: IO[bytes], cancel: threading.Event):
+        self._fp = fp
+        # files and package resources are buffered streams, memory maps are
+        # not used with cancellation
+        self._readinto = cast(io.BufferedIOBase, fp).readinto
+        self._cancel = cancel
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._cancel.is_set():
+            raise asyncio.CancelledError("read cancelled")
+        return self._readinto(b)
+
+    def seekable(self) -> bool:
+        return self._fp.seekable()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._fp.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._fp.tell()
 
 
 class FileHandle:
     """Main class for handling file operations across different formats."""
 
+    # default cache of load(..., cache=True)
+    cache: LoadCache = LoadCache()
+
+    # maximum number of aload / adump / aiter_load steps running at once
+    async_limit: int = 8
+    _semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
     @classmethod
     def _find_mode(cls, lemma: str):
         """Determine file type from file extension.
@@ -66,7 +166,7 @@ class FileHandle:
             return FileType.YAML
         elif lemma == ".json":
             return FileType.JSON
-        elif lemma == ".jsonld":
+        elif lemma in [".jsonld", ".jsonl"]:
             return FileType.JSONLD
         elif lemma in [".pkl", ".pickle"]:
             return FileType.PICKLE
@@ -74,11 +174,25 @@ class FileHandle:
             return FileType.CSV
         elif lemma in [".env"]:
             return FileType.ENV
+        elif lemma in [".parquet", ".pq"]:
+            return FileType.PARQUET
+        elif lemma in [".feather", ".arrow", ".ipc"]:
+            return FileType.FEATHER
+        elif lemma == ".manifest":
+            return FileType.MANIFEST
         else:
             return FileType.TXT
 
     @classmethod
-    def _dump_pointer(cls, item, p, how: FileType, bytes_: bool = True) -> None:
+    def _dump_pointer(
+        cls,
+        item,
+        p,
+        how: FileType,
+        bytes_: bool = True,
+        backend: Backend | str | None = None,
+        out_of_band: bool = False,
+    ) -> None:
         """Write data to file pointer in specified format.
 
         Args:
@@ -86,110 +200,152 @@ class FileHandle:
             p: File pointer
             how: FileType indicating format to write in
             bytes_: Whether to write in bytes mode
+            backend: JSON or YAML serialization backend, see suthing.backend
+            out_of_band: Write a pickle container with out-of-band buffers,
+                see suthing.oob
         """
-        if how == FileType.PICKLE:
+        if how == FileType.PICKLE and out_of_band:
+            dump_oob(item, p)
+        elif how == FileType.PICKLE:
             pickle.dump(item, p, pickle.HIGHEST_PROTOCOL)
         elif how == FileType.YAML:
-            yc = yaml.dump(item)
-            if bytes_:
-                yc = yc.encode("utf-8")  # type: ignore
-            p.write(yc)
+            yc = yaml_dump(item, backend)
+            p.write(yc if bytes_ else yc.decode("utf-8"))
         elif how == FileType.JSON:
-            jc = json.dumps(item, indent=2) + "\n"
-            if bytes_:
-                jc = jc.encode("utf-8")  # type: ignore
-            p.write(jc)
+            jc = json_dumps(item, indent=True, backend=backend) + b"\n"
+            p.write(jc if bytes_ else jc.decode("utf-8"))
         elif how == FileType.JSONLD:
             for subitem in item:
-                jc = json.dumps(subitem) + "\n"
-                if bytes_:
-                    jc = jc.encode("utf-8")  # type: ignore
-                p.write(jc)
-        elif how == FileType.CSV and (
-            isinstance(item, pd.DataFrame) or isinstance(item, pd.Series)
-        ):
+                jc = json_dumps(subitem, backend=backend) + b"\n"
+                p.write(jc if bytes_ else jc.decode("utf-8"))
+        elif how == FileType.CSV and _is_frame(item):
             r = item.to_csv()
             if bytes_:
-                r = r.encode("utf-8")  # type: ignore
+                r = r.encode("utf-8")
             p.write(r)
+        elif how in COLUMNAR_TYPES and _is_frame(item):
+            import pandas as pd
+
+            if isinstance(item, pd.Series):
+                item = item.to_frame()
+            if how == FileType.PARQUET:
+                item.to_parquet(p)
+            else:
+                item.to_feather(p)
         elif how == FileType.TXT:
-            p.write(str(item))
+            tc = str(item)
+            p.write(tc.encode("utf-8") if bytes_ else tc)
 
     @classmethod
-    def _open_pointer(cls, p: io.BytesIO | gzip.GzipFile, how: FileType, **kwargs):
+    def _open_pointer(cls, p: IO[bytes], how: FileType, **kwargs):
         """Read data from file pointer in specified format.
 
+        The pointer is handed to the parsers as is, without reading it ahead.
+
         Args:
-            p: File pointer
+            p: Binary file pointer (file, memory map or decompressing stream)
             how: FileType indicating format to read
-            **kwargs: Additional arguments passed to readers
+            **kwargs: Additional arguments passed to readers; JSON, JSONLD and
+                YAML accept backend (see suthing.backend), columnar formats
+                accept columns (projection), Parquet also row_groups
+                (indices of row groups to read) and filters (pyarrow
+                expression or DNF list of tuples); JSON and YAML accept select
+                (key path or list of key paths, see suthing.keypath); all
+                formats accept into (a dataclass type or list of it), see
+                suthing.typed
 
         Returns:
             Data read from file in appropriate format
-
-        Raises:
-            ValueError: If trying to read gzipped env files
         """
+        backend = kwargs.pop("backend", None)
+        select = kwargs.pop("select", None)
+        into = kwargs.pop("into", None)
         if how == FileType.PICKLE:
-            r = pickle.load(p)
+            r = read_oob(p) if is_oob(p) else pickle.load(p)
         elif how == FileType.YAML:
-            r = yaml.load(p, Loader=yaml.FullLoader)
+            if select is None:
+                r = yaml_load(p, backend)
+            else:
+                r = select_yaml(p, select, backend)
         elif how == FileType.JSON:
-            r = json.load(p)
+            if select is None:
+                r = json_loads(p.read(), backend)
+            else:
+                r = select_json(p, select, backend)
+        elif how == FileType.JSONLD and into is not None:
+            # records are decoded as they are parsed, without a list of dicts
+            loads, decode_one = json_loader(backend), decoder(record_type(into)[0])
+            r = [decode_one(loads(s)) for s in iter(p.readline, b"") if s.strip()]
+            into = None
         elif how == FileType.JSONLD:
-            r = [json.loads(s.decode()) for s in p.readlines()]
+            loads = json_loader(backend)
+            r = [loads(s) for s in iter(p.readline, b"") if s.strip()]
         elif how == FileType.CSV:
+            import pandas as pd
+
             r = pd.read_csv(p, **kwargs)  # type: ignore[arg-type]
+        elif how == FileType.PARQUET:
+            import pyarrow.parquet as pq
+
+            columns = kwargs.pop("columns", None)
+            row_groups = kwargs.pop("row_groups", None)
+            filters = kwargs.pop("filters", None)
+            if row_groups is not None:
+                table = pq.ParquetFile(p).read_row_groups(row_groups, columns=columns)
+                if filters is not None:
+                    table = table.filter(pq.filters_to_expression(filters))
+            else:
+                table = pq.read_table(p, columns=columns, filters=filters, **kwargs)
+            r = table.to_pandas()
+        elif how == FileType.FEATHER:
+            import pyarrow.feather as pf
+
+            r = pf.read_table(p, columns=kwargs.pop("columns", None)).to_pandas()
         elif how == FileType.TXT:
             r = p.read().decode()
         elif how == FileType.ENV:
-            if isinstance(p, io.BytesIO):
-                config = io.StringIO(p.getvalue().decode("UTF-8"))
-                r = load_dotenv(stream=config)
-            else:
-                raise ValueError("Will not read gzipped env files")
+            from dotenv import load_dotenv
+
+            config = io.StringIO(p.read().decode("UTF-8"))
+            r = load_dotenv(stream=config)
         else:
             r = dict()
+        if into is not None:
+            r = decode(r, into)
         return r
 
     @classmethod
-    def load(
+    def _resolve(
         cls,
-        ppath: str | pathlib.Path | None = None,
-        pname: str | None = None,
-        how: FileType = FileType.YAML,
-        **kwargs,
-    ):
-        """
+        ppath: str | pathlib.Path | None,
+        pname: str | None,
+        how: FileType,
+        fpath: str | pathlib.Path | None = None,
+        compression: Compression | str | None = None,
+    ) -> tuple[str | None, FileType, Compression | None]:
+        """Resolve the source location, file type and compression of a load.
 
-        :param ppath:
-        :param pname:
-        :param how:
-        :param kwargs:
-        :return:
-        """
+        Args:
+            ppath: Package name (if pname is given) or filesystem path
+            pname: Resource name within package ppath
+            how: Default FileType, overridden by the file extension
+            fpath: Explicit filesystem path, takes precedence over ppath
+            compression: Compression, overridden by the file extension
 
-        compression = kwargs.pop("compression", None)
-        fpath: str | pathlib.Path | None = kwargs.pop("fpath", None)
+        Returns:
+            Tuple of filesystem path (None for package resources),
+            FileType and compression
 
-        # assume loading from a package
+        Raises:
+            ValueError: If neither a filesystem path nor a package is provided
+        """
         if pname is not None:
-            lemmas = suffixes(pname)
-            if lemmas[-1] == ".gz":
-                compression = "gz"
-                how_ = cls._find_mode(lemmas[-2])
-            else:
-                how_ = cls._find_mode(lemmas[-1])
-            if how_:
-                how = how_
-            if ppath is not None and isinstance(ppath, str):
-                bytes_ = pkgutil.get_data(ppath, pname)
-            else:
+            if ppath is None or not isinstance(ppath, str):
                 raise ValueError(
                     "package name provided, package path (as a string) needed"
                 )
-
-        # interpret as filesystem load
+            fpath = None
+            lemmas = suffixes(pname)
         else:
             if fpath is None:
                 if ppath is not None:
@@ -198,56 +354,827 @@ class FileHandle:
                     raise ValueError("either fpath or ppath should be provided")
             fpath = pathlib.Path(fpath).expanduser().as_posix()
             lemmas = suffixes(fpath)
-            if lemmas[-1] == ".gz":
-                compression = "gz"
-                how_ = cls._find_mode(lemmas[-2])
-            else:
-                how_ = cls._find_mode(lemmas[-1])
-            if how_:
-                how = how_
-            with open(fpath, "rb") as fp:
-                bytes_ = fp.read()
-
-        if bytes_ is None:
-            raise ValueError("None received as Bytes")
-
-        if compression == "gz":
-            with gzip.GzipFile(fileobj=io.BytesIO(bytes_), mode="r") as p:
-                r = cls._open_pointer(p, how, **kwargs)
+        compression_ = Compression.from_suffix(lemmas[-1])
+        if compression_ is not None:
+            compression = compression_
+            how_ = cls._find_mode(lemmas[-2])
         else:
-            with io.BytesIO(bytes_) as p:
-                r = cls._open_pointer(p, how, **kwargs)
-        return r
+            how_ = cls._find_mode(lemmas[-1])
+        if how_:
+            how = how_
+        if compression is not None:
+            compression = Compression(compression)
+        return fpath, how, compression
+
+    @classmethod
+    @contextlib.contextmanager
+    def _open_stream(
+        cls,
+        fpath: str | None,
+        ppath: str | pathlib.Path | None,
+        pname: str | None,
+        compression: Compression | None,
+        memory_map: bool = False,
+        how: FileType | None = None,
+        cancel: threading.Event | None = None,
+    ) -> Generator[IO[bytes]]:
+        """Open a binary stream over a file or a package resource.
+
+        The stream is not read ahead: compressed content is decompressed
+        incrementally as the caller consumes it. The stream and the
+        underlying file are closed when the context exits.
+
+        Args:
+            fpath: Filesystem path, None for package resources
+            ppath: Package name, used if fpath is None
+            pname: Resource name within package ppath
+            compression: Compression of the content
+            memory_map: Map a (non-empty) filesystem file in memory
+                instead of reading it through a buffered file object
+            how: FileType of the content; uncompressed columnar files are
+                mapped with pyarrow so that arrow buffers are not copied
+            cancel: Event that makes subsequent reads raise CancelledError;
+                disables memory mapping
+
+        Yields:
+            Binary file-like object
+        """
+        if cancel is not None:
+            memory_map = False
+        if memory_map and how in COLUMNAR_TYPES and fpath and compression is None:
+            import pyarrow as pa
+
+            with pa.memory_map(fpath) as p:
+                yield p  # type: ignore[misc]
+            return
+        with contextlib.ExitStack() as stack:
+            if fpath is not None:
+                fp: IO[bytes] = stack.enter_context(open(fpath, "rb"))
+                if memory_map and os.fstat(fp.fileno()).st_size > 0:
+                    mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                    fp = cast(IO[bytes], stack.enter_context(mapped))
+            else:
+                resource = resources.files(str(ppath)).joinpath(*str(pname).split("/"))
+                fp = stack.enter_context(resource.open("rb"))
+            if cancel is not None:
+                fp = stack.enter_context(
+                    io.BufferedReader(_CancellableReader(fp, cancel))  # type: ignore[arg-type]
+                )
+            if compression is not None:
+                fp = stack.enter_context(open_reader(fp, compression))
+            yield fp
 
     @classmethod
-    def dump(cls, item, path: str | pathlib.Path, how: FileType = FileType.YAML):
+    def iter_load(
+        cls,
+        ppath: str | pathlib.Path | None = None,
+        pname: str | None = None,
+        how: FileType = FileType.JSONLD,
+        batch_size: int | None = None,
+        **kwargs,
+    ) -> Generator[Any]:
+        """Iterate over the records of a file without loading it entirely.
+
+        JSONLD files are yielded record by record (or as lists of batch_size
+        records), CSV files as DataFrame chunks of batch_size rows, Parquet
+        and Feather files as DataFrames of (at most) batch_size rows. Only the
+        current record or chunk is held in memory.
+
+        Args:
+            ppath: Package name (if pname is given) or filesystem path
+            pname: Resource name within package ppath
+            how: Default FileType, overridden by the file extension
+            batch_size: Number of records per yielded batch;
+                for CSV defaults to 10000 rows, for Parquet to 65536 rows
+            **kwargs: fpath, compression, backend (JSONLD, see suthing.backend)
+                and arguments passed to pd.read_csv;
+                columns and (Parquet only) row_groups for columnar formats;
+                records (slice) reads a range of records of a JSONLD file
+                through its offset index, see FileHandle.index;
+                into (a dataclass type) decodes records, batches and chunks
+                into instances and lists of instances, see suthing.typed;
+                the shards of a manifest are streamed one after the other
+
+        Yields:
+            Records, lists of records or DataFrame chunks
+
+        Raises:
+            ValueError: If the file type does not support streaming
         """
+        compression = kwargs.pop("compression", None)
+        fpath, how, compression = cls._resolve(
+            ppath, pname, how, kwargs.pop("fpath", None), compression
+        )
+        streamed = (FileType.JSONLD, FileType.CSV, *COLUMNAR_TYPES, FileType.MANIFEST)
+        if how not in streamed:
+            raise ValueError(f"streaming is not supported for {how.value} files")
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"batch_size should be positive, got {batch_size}")
 
-        :param item:
-        :param path: if path ends with ".gz" the output will be gzip compressed
+        if how == FileType.MANIFEST:
+            manifest = read_manifest(str(fpath))
+            for shard in manifest["shards"]:
+                yield from cls.iter_load(
+                    shard["path"],
+                    None,
+                    FileType(manifest["format"]),
+                    batch_size,
+                    **kwargs,
+                )
+            return
+
+        into = kwargs.pop("into", None)
+        if into is not None:
+            record = record_type(into)[0]
+            items = cls.iter_load(
+                ppath,
+                pname,
+                how,
+                batch_size,
+                fpath=fpath,
+                compression=compression,
+                **kwargs,
+            )
+            if how == FileType.JSONLD and batch_size is None:
+                yield from map(decoder(record), items)
+            else:
+                yield from (decode(batch, record) for batch in items)
+            return
+
+        selected = kwargs.pop("records", None)
+        if selected is not None:
+            index = cls.index(fpath=fpath, compression=compression)
+            start, stop, _ = selected.indices(len(index))
+            records = index.iter(start, stop, backend=kwargs.pop("backend", None))
+            yield from _batched(records, batch_size)
+            return
+
+        memory_map = how in COLUMNAR_TYPES
+        cancel = kwargs.pop("_cancel", None)
+        with cls._open_stream(
+            fpath, ppath, pname, compression, memory_map, how, cancel
+        ) as p:
+            if how == FileType.PARQUET:
+                import pyarrow.parquet as pq
+
+                batches = pq.ParquetFile(p).iter_batches(
+                    batch_size=batch_size or 65536,
+                    columns=kwargs.pop("columns", None),
+                    row_groups=kwargs.pop("row_groups", None),
+                )
+                for batch in batches:
+                    yield batch.to_pandas()
+            elif how == FileType.FEATHER:
+                import pyarrow as pa
+
+                reader = pa.ipc.open_file(p)
+                columns = kwargs.pop("columns", None)
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    if columns is not None:
+                        batch = batch.select(columns)
+                    step = batch_size or max(batch.num_rows, 1)
+                    for offset in range(0, batch.num_rows, step):
+                        yield batch.slice(offset, step).to_pandas()
+            elif how == FileType.CSV:
+                import pandas as pd
+
+                chunksize = kwargs.pop("chunksize", 10000)
+                with pd.read_csv(
+                    p, chunksize=batch_size or chunksize, **kwargs
+                ) as reader:
+                    yield from reader
+            else:
+                loads = json_loader(kwargs.pop("backend", None))
+                yield from _batched(
+                    (loads(line) for line in p if line.strip()), batch_size
+                )
+
+    @classmethod
+    def load(
+        cls,
+        ppath: str | pathlib.Path | None = None,
+        pname: str | None = None,
+        how: FileType = FileType.YAML,
+        **kwargs,
+    ):
+        """
+
+        :param ppath:
+        :param pname:
         :param how:
+        :param kwargs: memory_map=True maps filesystem files in memory
+            instead of reading them through a buffered file object;
+            backend selects the JSON or YAML backend, see suthing.backend;
+            cache=True (or a LoadCache instance) serves unchanged files
+            from FileHandle.cache (or the instance), see suthing.cache;
+            select="a.b[3].c" (or a list of key paths) reads only the
+            requested subtrees of a JSON or YAML document, see suthing.keypath;
+            into=MyDataclass (or list[MyDataclass]) decodes the document, or
+            every record of a list, JSONLD or CSV file, see suthing.typed;
+            for manifests of sharded dumps (see dump_sharded) workers loads
+            the shards in parallel (with executor "thread" or "process")
         :return:
         """
 
+        compression = kwargs.pop("compression", None)
+        memory_map = kwargs.pop("memory_map", False)
+        fpath, how, compression = cls._resolve(
+            ppath, pname, how, kwargs.pop("fpath", None), compression
+        )
+
+        if how == FileType.ENV and compression is not None:
+            raise ValueError("Will not read compressed env files")
+        if kwargs.get("select") is not None and how not in (
+            FileType.JSON,
+            FileType.YAML,
+        ):
+            raise ValueError(f"select is not supported for {how.value} files")
+
+        cancel = kwargs.pop("_cancel", None)
+        if how == FileType.MANIFEST:
+            if fpath is None:
+                raise ValueError("manifests are read from the filesystem only")
+            return cls._load_manifest(fpath, **kwargs)
+
+        # columnar files are always mapped: arrow buffers reference the mapping
+        memory_map = memory_map or how in COLUMNAR_TYPES
+        args = (fpath, ppath, pname, compression, memory_map, how, cancel)
+
+        # env files are loaded for their side effect, never cached
+        cache = kwargs.pop("cache", None)
+        if cache and how != FileType.ENV:
+            cache = cls.cache if cache is True else cache
+            source, version = cls._cache_source(fpath, ppath, pname)
+            key = (source, how, compression, repr(sorted(kwargs.items())))
+            r = cache.get(key, version, _MISSING)
+            if r is _MISSING:
+                r = cache.put(key, version, cls._read(args, how, **kwargs))
+            return r
+        return cls._read(args, how, **kwargs)
+
+    @classmethod
+    def _read(cls, args: tuple, how: FileType, **kwargs):
+        """Open a stream with _open_stream arguments args and parse it."""
+        fpath, compression = args[0], args[3]
+        if how == FileType.PICKLE and fpath is not None and compression is None:
+            # containers are mapped instead of read, their buffers zero-copy
+            with open(fpath, "rb") as f:
+                container = is_oob(f)
+            if container:
+                into = kwargs.get("into")
+                r = load_oob(str(fpath))
+                return r if into is None else decode(r, into)
+        with cls._open_stream(*args) as p:
+            return cls._open_pointer(p, how, **kwargs)
+
+    @classmethod
+    def index(
+        cls,
+        ppath: str | pathlib.Path | None = None,
+        persist: bool = True,
+        **kwargs,
+    ) -> RecordIndex:
+        """Get the record offset index of a JSONLD file.
+
+        The index is read from its sidecar file (path + ".idx"), or built by
+        scanning the file if the sidecar is missing or stale.
+
+        Args:
+            ppath: Filesystem path of a plain or gzip compressed JSONLD file
+            persist: Write a (re)built index to the sidecar file
+            **kwargs: fpath, compression
+
+        Returns:
+            RecordIndex supporting len(), index[i] and index[a:b]
+
+        Raises:
+            ValueError: If the file is not JSONLD or has another compression
+        """
+        fpath, how, compression = cls._resolve(
+            ppath,
+            None,
+            FileType.JSONLD,
+            kwargs.pop("fpath", None),
+            kwargs.pop("compression", None),
+        )
+        if how != FileType.JSONLD:
+            raise ValueError(f"offset index is not supported for {how.value} files")
+        return RecordIndex.open(str(fpath), compression, persist=persist)
+
+    @classmethod
+    def load_parallel(
+        cls,
+        ppath: str | pathlib.Path,
+        shards: int = 4,
+        workers: int | None = None,
+        executor: str = "thread",
+        **kwargs,
+    ) -> list:
+        """Load a JSONLD file by reading byte range shards in parallel.
+
+        Args:
+            ppath: Filesystem path of a plain or gzip compressed JSONLD file
+            shards: Number of shards the records are split into
+            workers: Maximum number of workers, executor default if None
+            executor: "thread" or "process"
+            **kwargs: Arguments passed to index, and backend
+
+        Returns:
+            List of records, in file order
+        """
+        backend = kwargs.pop("backend", None)
+        index = cls.index(ppath, **kwargs)
+        pool = cls._executor(workers, executor)
+        with pool:
+            parts = pool.map(
+                _read_records,
+                itertools.repeat(index),
+                index.shards(shards),
+                itertools.repeat(backend),
+            )
+            return [record for part in parts for record in part]
+
+    @classmethod
+    def _cache_source(
+        cls, fpath: str | None, ppath: str | pathlib.Path | None, pname: str | None
+    ) -> tuple[Hashable, Hashable]:
+        """Identify the source of a load for caching.
+
+        Returns:
+            Tuple of source key and source version
+        """
+        if fpath is not None:
+            st = os.stat(fpath)
+            return os.path.realpath(fpath), (st.st_mtime_ns, st.st_size)
+        resource = resources.files(str(ppath)).joinpath(*str(pname).split("/"))
+        if isinstance(resource, pathlib.Path):
+            st = resource.stat()
+            return (ppath, pname), (st.st_mtime_ns, st.st_size)
+        # resources of zipped packages do not change while the process runs
+        return (ppath, pname), None
+
+    @classmethod
+    def _async_semaphore(cls) -> asyncio.Semaphore:
+        """Get the semaphore bounding blocking work on the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = cls._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(cls.async_limit)
+            cls._semaphores[loop] = semaphore
+        return semaphore
+
+    @classmethod
+    async def _run_blocking(
+        cls, foo: Callable, *args, cancel: threading.Event | None = None, **kwargs
+    ):
+        """Run blocking work in the default executor, within async_limit.
+
+        If the awaiting task is cancelled, cancel is set and the work is
+        waited for before the cancellation propagates: files get closed and
+        the concurrency limit holds.
+        """
+        async with cls._async_semaphore():
+            future = asyncio.ensure_future(asyncio.to_thread(foo, *args, **kwargs))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if cancel is not None:
+                    cancel.set()
+                await asyncio.wait([future])
+                raise
+
+    @classmethod
+    async def aload(
+        cls,
+        ppath: str | pathlib.Path | None = None,
+        pname: str | None = None,
+        how: FileType = FileType.YAML,
+        **kwargs,
+    ):
+        """Load a file without blocking the event loop.
+
+        Reading and parsing run in the loop's default executor; at most
+        async_limit loads, dumps and iteration steps run at once. Cancelling
+        the awaiting task stops reading at the next chunk.
+
+        Args:
+            ppath: Package name (if pname is given) or filesystem path
+            pname: Resource name within package ppath
+            how: Default FileType, overridden by the file extension
+            **kwargs: Arguments passed to load
+
+        Returns:
+            Data read from file in appropriate format
+        """
+        cancel = threading.Event()
+        return await cls._run_blocking(
+            cls.load, ppath, pname, how, cancel=cancel, _cancel=cancel, **kwargs
+        )
+
+    @classmethod
+    async def aiter_load(
+        cls,
+        ppath: str | pathlib.Path | None = None,
+        pname: str | None = None,
+        how: FileType = FileType.JSONLD,
+        batch_size: int | None = None,
+        **kwargs,
+    ) -> AsyncIterator[Any]:
+        """Iterate over the records of a file without blocking the event loop.
+
+        Asynchronous counterpart of iter_load: every step of the iteration
+        runs in the loop's default executor.
+
+        Args:
+            ppath: Package name (if pname is given) or filesystem path
+            pname: Resource name within package ppath
+            how: Default FileType, overridden by the file extension
+            batch_size: Number of records per yielded batch
+            **kwargs: Arguments passed to iter_load
+
+        Yields:
+            Records, lists of records or DataFrame chunks
+        """
+        cancel = threading.Event()
+        records = cls.iter_load(ppath, pname, how, batch_size, _cancel=cancel, **kwargs)
+        done = object()
+        try:
+            while True:
+                item = await cls._run_blocking(next, records, done, cancel=cancel)
+                if item is done:
+                    break
+                yield item
+        finally:
+            await asyncio.to_thread(records.close)
+
+    @classmethod
+    def resolve_dump(
+        cls, path: str | pathlib.Path, how: FileType
+    ) -> tuple[str, FileType, Compression | None]:
+        """Resolve the destination path, file type and compression of a dump.
+
+        Args:
+            path: Destination path
+            how: Default FileType, overridden by the file extension
+
+        Returns:
+            Tuple of expanded path, FileType and compression
+        """
         lemmas = suffixes(path)
         path = pathlib.Path(path).expanduser().as_posix()
-        if lemmas[-1] == ".gz":
-            compression = "gz"
+        compression = Compression.from_suffix(lemmas[-1])
+        if compression is not None:
             how_ = cls._find_mode(lemmas[-2])
         else:
-            compression = None
             how_ = cls._find_mode(lemmas[-1])
         if how_:
             how = how_
-        if how == FileType.PICKLE:
+        return path, how, compression
+
+    @classmethod
+    def writer(
+        cls,
+        path: str | pathlib.Path,
+        how: FileType = FileType.JSONLD,
+        mode: str = "w",
+        batch_size: int = 1000,
+        backend: Backend | str | None = None,
+        compresslevel: int | None = None,
+        threads: int | None = None,
+        atomic: bool = True,
+    ) -> "RecordWriter":
+        """Open an incremental writer of JSONLD, JSON or CSV records.
+
+        Records are serialized in batches and streamed through the
+        compressor into a temporary file next to path, which replaces path
+        when the writer is closed without error; or into path itself if not
+        atomic, e.g. to append to a growing file without copying it.
+
+        Args:
+            path: Destination path, format and compression are inferred as in dump
+            how: Default FileType, overridden by the file extension
+            mode: "w" to overwrite path, "a" to append to it (JSONLD and CSV)
+            batch_size: Number of records serialized and written at once
+            backend: JSON serialization backend, see suthing.backend
+            compresslevel: Codec specific compression level
+            threads: Number of compression threads (zstd only)
+            atomic: Replace path on close, otherwise write it in place
+
+        Returns:
+            RecordWriter, to be used as a context manager
+        """
+        from suthing.writer import RecordWriter
+
+        path, how, compression = cls.resolve_dump(path, how)
+        return RecordWriter(
+            path,
+            how,
+            compression,
+            append=mode == "a",
+            batch_size=batch_size,
+            backend=backend,
+            compresslevel=compresslevel,
+            threads=threads,
+            atomic=atomic,
+        )
+
+    @classmethod
+    def dump(
+        cls,
+        item,
+        path: str | pathlib.Path,
+        how: FileType = FileType.YAML,
+        backend: Backend | str | None = None,
+        compresslevel: int | None = None,
+        threads: int | None = None,
+        index: bool = False,
+        checkpoint: int = 10000,
+        out_of_band: bool = False,
+    ):
+        """
+
+        :param item:
+        :param path: if path ends with ".gz", ".bz2", ".xz", ".lzma" or ".zst"
+            the output will be compressed accordingly
+        :param how:
+        :param backend: JSON or YAML serialization backend, see suthing.backend
+        :param compresslevel: codec specific compression level,
+            see suthing.compression.open_writer
+        :param threads: number of compression threads (zstd only)
+        :param index: write the record offset index of a (plain or gzip)
+            JSONLD file to a sidecar file, see FileHandle.index
+        :param checkpoint: number of records per gzip member when indexing
+        :param out_of_band: pickle with protocol 5 into a container storing
+            large buffers (e.g. of NumPy arrays) aligned, outside the pickle
+            stream; load maps them in memory, see suthing.oob
+        :return:
+        """
+
+        path, how, compression = cls.resolve_dump(path, how)
+        if how == FileType.MANIFEST:
+            raise ValueError("sharded datasets are written with dump_sharded")
+        if out_of_band and how != FileType.PICKLE:
+            raise ValueError(f"out-of-band buffers are not supported for {how.value}")
+        if index:
+            if how != FileType.JSONLD:
+                raise ValueError(f"offset index is not supported for {how.value}")
+            dump_indexed(item, path, compression, checkpoint, compresslevel, backend)
+            return
+        if how == FileType.PICKLE or how in COLUMNAR_TYPES:
             mode = "wb"
         else:
             mode = "w"
-        if compression == "gz":
-            if not path.endswith(".gz"):
-                path += ".gz"
-            with gzip.GzipFile(path, mode=mode) as p:
-                cls._dump_pointer(item, p, how)
+        if compression is not None:
+            with (
+                open(path, mode="wb") as fp,
+                open_writer(fp, compression, compresslevel, threads) as p,
+            ):
+                cls._dump_pointer(
+                    item, p, how, backend=backend, out_of_band=out_of_band
+                )
         else:
             with open(path, mode=mode) as p:
-                cls._dump_pointer(item, p, how, bytes_=False)
+                cls._dump_pointer(
+                    item, p, how, bytes_=False, backend=backend, out_of_band=out_of_band
+                )
+
+    @classmethod
+    def _executor(cls, workers: int | None, executor: str) -> Executor:
+        if executor == "thread":
+            return ThreadPoolExecutor(max_workers=workers)
+        elif executor == "process":
+            return ProcessPoolExecutor(max_workers=workers)
+        raise ValueError(f"executor should be thread or process, got {executor}")
+
+    @classmethod
+    def dump_sharded(
+        cls,
+        item,
+        path: str | pathlib.Path,
+        how: FileType | str = FileType.JSONLD,
+        shards: int | None = None,
+        shard_size: int | None = None,
+        shard_bytes: int | None = None,
+        compression: Compression | str | None = None,
+        workers: int | None = None,
+        executor: str = "thread",
+        **kwargs,
+    ) -> list[str]:
+        """Write records or a DataFrame as shards, in parallel, with a manifest.
+
+        Shards are serialized and compressed by a pool of workers and named
+        after the manifest: data.manifest has shards data-00000.jsonld.gz,
+        data-00001.jsonld.gz, ... The manifest is written once all shards
+        are; loading it with load or iter_load reads the whole dataset.
+        Shards already written are removed if one fails.
+
+        Args:
+            item: List or iterable of records, or a DataFrame
+            path: Manifest path, ending with .manifest
+            how: Format of the shards; JSONLD, JSON, YAML or PICKLE for
+                records, CSV, PARQUET, FEATHER or PICKLE for a DataFrame
+            shards: Number of shards; defaults to the number of workers
+                if no shard size is given
+            shard_size: Number of records per shard
+            shard_bytes: Target uncompressed size of a shard in bytes
+            compression: Compression of the shards
+            workers: Maximum number of workers, executor default if None
+            executor: "thread" (compression releases the GIL) or "process"
+                (for CPU bound serialization)
+            **kwargs: Arguments passed to dump for every shard
+
+        Returns:
+            Shard paths, in order
+
+        Raises:
+            ValueError: If the manifest path, format or sizing is invalid
+        """
+        path = pathlib.Path(path).expanduser().as_posix()
+        if not path.endswith(".manifest"):
+            raise ValueError(f"manifest path should end with .manifest, got {path}")
+        how = FileType(how)
+        frame = _is_frame(item)
+        if frame:
+            formats = (FileType.CSV, FileType.PICKLE, *COLUMNAR_TYPES)
+        else:
+            formats = (FileType.JSONLD, FileType.JSON, FileType.YAML, FileType.PICKLE)
+        if how not in formats:
+            kind = "a DataFrame" if frame else "records"
+            raise ValueError(f"can not shard {kind} as {how.value}")
+        compression = None if compression is None else Compression(compression)
+        suffix = f".{how.value}" + (
+            "" if compression is None else f".{compression.value}"
+        )
+        if shards is None and shard_size is None and shard_bytes is None:
+            shards = workers or os.cpu_count() or 1
+
+        def measure(sample) -> int:
+            buf = io.BytesIO()
+            cls._dump_pointer(sample, buf, how, backend=kwargs.get("backend"))
+            return buf.tell()
+
+        chunks = split(item, shards, shard_size, shard_bytes, measure)
+        # bounds the number of chunks held in memory
+        limit = 2 * (workers or os.cpu_count() or 1)
+        entries: list[dict] = []
+        pending: collections.deque = collections.deque()
+        written: list[str] = []
+        pool = cls._executor(workers, executor)
+        try:
+            for i, chunk in enumerate(chunks):
+                written.append(shard_path(path, i, suffix))
+                pending.append(
+                    pool.submit(_dump_shard, chunk, written[-1], how, kwargs)
+                )
+                if len(pending) >= limit:
+                    entries.append(pending.popleft().result())
+            entries.extend(f.result() for f in pending)
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            for shard in written:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(shard)
+            raise
+        pool.shutdown()
+        kind = "frame" if frame else "records"
+        write_manifest(path, how.value, compression, kind, entries)
+        return written
+
+    @classmethod
+    def _load_manifest(
+        cls,
+        fpath: str,
+        workers: int | None = None,
+        executor: str = "thread",
+        **kwargs,
+    ):
+        """Load and concatenate the shards of a manifest."""
+        manifest = read_manifest(fpath)
+        paths = [shard["path"] for shard in manifest["shards"]]
+        if workers is None:
+            parts = [cls.load(p, **kwargs) for p in paths]
+        else:
+            parts = []
+            for r in cls.load_many(paths, workers=workers, executor=executor, **kwargs):
+                if r.exception is not None:
+                    raise r.exception
+                parts.append(r.ret)
+        if manifest["kind"] == "frame" and kwargs.get("into") is None:
+            import pandas as pd
+
+            return pd.concat(parts) if parts else pd.DataFrame()
+        return [record for part in parts for record in part]
+
+    @overload
+    @classmethod
+    def load_many(
+        cls,
+        paths: Iterable[str | pathlib.Path],
+        workers: int | None = ...,
+        executor: str = ...,
+        ordered: bool = ...,
+        as_iterator: Literal[False] = ...,
+        **kwargs,
+    ) -> list[Return]: ...
+
+    @overload
+    @classmethod
+    def load_many(
+        cls,
+        paths: Iterable[str | pathlib.Path],
+        workers: int | None = ...,
+        executor: str = ...,
+        ordered: bool = ...,
+        *,
+        as_iterator: Literal[True],
+        **kwargs,
+    ) -> Iterator[Return]: ...
+
+    @classmethod
+    def load_many(
+        cls,
+        paths: Iterable[str | pathlib.Path],
+        workers: int | None = None,
+        executor: str = "thread",
+        ordered: bool = True,
+        as_iterator: bool = False,
+        **kwargs,
+    ) -> list[Return] | Iterator[Return]:
+        """Load many files in parallel.
+
+        Every file is loaded with load; failures are reported per path
+        instead of aborting the batch.
+
+        Args:
+            paths: Filesystem paths
+            workers: Maximum number of workers, executor default if None
+            executor: "thread" for I/O bound loads and decompression,
+                "process" for CPU bound parsing (YAML, CSV)
+            ordered: Yield results in input order, otherwise as they complete;
+                lists are always in input order
+            as_iterator: Return an iterator instead of a list
+            **kwargs: Arguments passed to load for every path
+
+        Returns:
+            Return per path with hkey set to the path, ret to the loaded data,
+            success, exception and elapsed time
+
+        Raises:
+            ValueError: If the executor is unknown
+        """
+        pool = cls._executor(workers, executor)
+        results = cls._iter_many(pool, list(paths), ordered or not as_iterator, kwargs)
+        return results if as_iterator else list(results)
+
+    @classmethod
+    async def adump(cls, item, path: str | pathlib.Path, **kwargs) -> None:
+        """Write data to a file without blocking the event loop.
+
+        Serialization and writing run in the loop's default executor, within
+        async_limit. A started write is not interrupted: if the awaiting
+        task is cancelled, the cancellation propagates once the file is written.
+
+        Args:
+            item: Data to write
+            path: Destination path, format and compression are inferred as in dump
+            **kwargs: Arguments passed to dump
+        """
+        await cls._run_blocking(cls.dump, item, path, **kwargs)
+
+    @classmethod
+    def _iter_many(
+        cls, pool: Executor, paths: list, ordered: bool, kwargs: dict
+    ) -> Iterator[Return]:
+        try:
+            futures = [pool.submit(_load_one, path, kwargs) for path in paths]
+            yield from (
+                f.result() for f in (futures if ordered else as_completed(futures))
+            )
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _read_records(
+    index: RecordIndex, shard: slice, backend: Backend | str | None
+) -> list:
+    """Read a range of records (module level to be picklable)."""
+    return list(index.iter(shard.start, shard.stop, backend=backend))
+
+
+def _dump_shard(chunk: Any, path: str, how: FileType, kwargs: dict) -> dict:
+    """Write a shard, returning its manifest entry (module level to be picklable)."""
+    FileHandle.dump(chunk, path, how, **kwargs)
+    return {"path": path, "records": len(chunk), "bytes": os.path.getsize(path)}
+
+
+def _load_one(path: str | pathlib.Path, kwargs: dict) -> Return:
+    """Load a file, capturing the outcome (module level to be picklable)."""
+    with Timer() as timer:
+        try:
+            r = Return(ret=FileHandle.load(path, **kwargs), success=True)
+        except Exception as e:
+            r = Return(success=False, exception=e)
+    r.hkey = str(path)
+    r.elapsed = timer.elapsed
+    return r
@@ -0,0 +1,311 @@
+"""Record offset index of JSON lines files.
+
+A RecordIndex maps record numbers of a (plain or gzip compressed) JSON lines
+file to byte offsets, giving constant time access to any record, slice reads
+and shards that several workers read in parallel. It is stored in a sidecar
+file next to the indexed one (path + ".idx") together with the size and mtime
+of the indexed file, and rebuilt when those change.
+
+Plain files are indexed by the offset of every record. Gzip streams can only
+be decompressed from the start of a member, so for gzip files every member is
+a checkpoint: the index keeps the compressed offset of every member and, for
+every record, its decompressed offset within the member it starts in. Files
+written by FileHandle.dump(..., index=True) start a new member every
+checkpoint records, which bounds the decompression needed to reach a record.
+"""
+
+import bisect
+import gzip
+import itertools
+import os
+import pickle
+import zlib
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import IO, Any
+
+from suthing.backend import Backend, json_dumps, json_loader
+from suthing.compression import Compression
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+_CHUNK = 1 << 20
+
+
+class RecordIndex:
+    """Offsets of the records of a JSON lines file."""
+
+    def __init__(
+        self,
+        path: str,
+        compression: Compression | None,
+        members: array,
+        first_records: array,
+        offsets: array,
+        source: tuple[int, int],
+    ):
+        """
+        Args:
+            path: Indexed file
+            compression: None or Compression.GZ
+            members: Offset in the file of every gzip member ([0] for plain files)
+            first_records: Number of the first record starting in every member
+            offsets: Offset of every record within its member (decompressed)
+            source: Size and mtime (ns) of the indexed file
+        """
+        self.path = path
+        self.compression = compression
+        self.members = members
+        self.first_records = first_records
+        self.offsets = offsets
+        self.source = source
+
+    @staticmethod
+    def _check(compression: Compression | None) -> None:
+        if compression not in (None, Compression.GZ):
+            raise ValueError("offset index supports plain and gzip files only")
+
+    @staticmethod
+    def _stat(path: str) -> tuple[int, int]:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    @classmethod
+    def open(
+        cls,
+        path: str,
+        compression: Compression | None = None,
+        persist: bool = True,
+    ) -> "RecordIndex":
+        """Read the sidecar index of a file, building it if missing or stale.
+
+        Args:
+            path: Indexed file
+            compression: None or Compression.GZ
+            persist: Write a (re)built index to the sidecar file
+
+        Returns:
+            RecordIndex
+        """
+        cls._check(compression)
+        try:
+            with open(path + INDEX_SUFFIX, "rb") as f:
+                state = pickle.load(f)
+            if (
+                state.pop("version") == INDEX_VERSION
+                and state["source"] == cls._stat(path)
+                and state["compression"] == compression
+            ):
+                return cls(path, **state)
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError):
+            pass
+        index = cls.build(path, compression)
+        if persist:
+            index.save()
+        return index
+
+    @classmethod
+    def build(cls, path: str, compression: Compression | None = None) -> "RecordIndex":
+        """Index a file by scanning it once.
+
+        Args:
+            path: File to index
+            compression: None or Compression.GZ
+
+        Returns:
+            RecordIndex
+        """
+        cls._check(compression)
+        source = cls._stat(path)
+        offsets = array("Q")
+        with open(path, "rb") as raw:
+            if compression is None:
+                offset = 0
+                for line in raw:
+                    if line.strip():
+                        offsets.append(offset)
+                    offset += len(line)
+                members, first_records = array("Q", [0]), array("Q", [0])
+            else:
+                members, first_records = cls._scan_gzip(raw, offsets)
+        return cls(path, compression, members, first_records, offsets, source)
+
+    @staticmethod
+    def _scan_gzip(raw: IO[bytes], offsets: array) -> tuple[array, array]:
+        """Find gzip members and the record offsets within them."""
+        members, first_records = array("Q"), array("Q")
+        d = zlib.decompressobj(wbits=31)
+        member, position, consumed = -1, 0, 0
+        # offset of the current line within its member, has it content
+        line_offset, line_content = 0, False
+        buf = b""
+        while True:
+            if not buf:
+                buf = raw.read(_CHUNK)
+                if not buf:
+                    break
+                consumed += len(buf)
+            if member < 0 or d.eof:
+                if d.eof:
+                    d = zlib.decompressobj(wbits=31)
+                members.append(consumed - len(buf))
+                # a pending record started in a previous member
+                first_records.append(len(offsets) + line_content)
+                member, position = member + 1, 0
+                if not line_content:
+                    line_offset = 0
+            out = d.decompress(buf)
+            buf = d.unused_data if d.eof else b""
+            i = 0
+            while True:
+                j = out.find(b"\n", i)
+                if not line_content and out[i : len(out) if j < 0 else j].strip():
+                    line_content = True
+                if j < 0:
+                    position += len(out) - i
+                    break
+                if line_content:
+                    offsets.append(line_offset)
+                position += j + 1 - i
+                i = j + 1
+                line_offset, line_content = position, False
+        if line_content:
+            offsets.append(line_offset)
+        return members, first_records
+
+    def save(self) -> None:
+        """Write the index to its sidecar file, atomically."""
+        state = {
+            "version": INDEX_VERSION,
+            "compression": self.compression,
+            "members": self.members,
+            "first_records": self.first_records,
+            "offsets": self.offsets,
+            "source": self.source,
+        }
+        tmp = f"{self.path}{INDEX_SUFFIX}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path + INDEX_SUFFIX)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, item: int | slice) -> Any:
+        if isinstance(item, slice):
+            selected = range(*item.indices(len(self)))
+            if not selected:
+                return []
+            start = min(selected)
+            records = list(self.iter(start, max(selected) + 1))
+            return [records[i - start] for i in selected]
+        n = len(self)
+        if item < 0:
+            item += n
+        if not 0 <= item < n:
+            raise IndexError(f"record {item} out of range for {n} records")
+        return next(self.iter(item, item + 1))
+
+    def iter(
+        self, start: int, stop: int | None = None, backend: Backend | str | None = None
+    ) -> Iterator[Any]:
+        """Iterate over records start to stop (excluded).
+
+        Args:
+            start: First record
+            stop: Record to stop at, the end of the file if None
+            backend: JSON backend, see suthing.backend
+
+        Yields:
+            Records
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        loads = json_loader(backend)
+        with open(self.path, "rb") as raw:
+            if self.compression is None:
+                raw.seek(self.offsets[start])
+                lines: Iterable[bytes] = raw
+            else:
+                member = bisect.bisect_right(self.first_records, start) - 1
+                raw.seek(self.members[member])
+                lines = stream = gzip.GzipFile(fileobj=raw, mode="rb")
+                stream.seek(self.offsets[start])
+            records = (loads(line) for line in lines if line.strip())
+            yield from itertools.islice(records, stop - start)
+
+    def shards(self, n: int) -> list[slice]:
+        """Split the records into contiguous ranges of similar byte size.
+
+        Args:
+            n: Number of shards
+
+        Returns:
+            Up to n non-empty slices covering all records
+        """
+        total = len(self)
+        if total == 0:
+            return []
+        if self.compression is None:
+            size = self.source[0]
+            bounds = [bisect.bisect_left(self.offsets, size * i // n) for i in range(n)]
+        else:
+            bounds = [total * i // n for i in range(n)]
+        bounds = sorted(set(bounds + [0])) + [total]
+        return [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if a < b]
+
+
+def dump_indexed(
+    records: Iterable[Any],
+    path: str,
+    compression: Compression | None = None,
+    checkpoint: int = 10000,
+    compresslevel: int | None = None,
+    backend: Backend | str | None = None,
+) -> RecordIndex:
+    """Write a JSON lines file together with its sidecar index.
+
+    Args:
+        records: Records to write
+        path: Destination path
+        compression: None or Compression.GZ
+        checkpoint: Number of records per gzip member
+        compresslevel: Gzip compression level
+        backend: JSON backend, see suthing.backend
+
+    Returns:
+        RecordIndex of the written file
+    """
+    RecordIndex._check(compression)
+    members, first_records, offsets = array("Q"), array("Q"), array("Q")
+    lines = (json_dumps(r, backend=backend) + b"\n" for r in records)
+    with open(path, "wb") as raw:
+        if compression is None:
+            members.append(0)
+            first_records.append(0)
+            for line in lines:
+                offsets.append(raw.tell())
+                raw.write(line)
+        else:
+            level = 9 if compresslevel is None else compresslevel
+            while batch := list(itertools.islice(lines, checkpoint)):
+                members.append(raw.tell())
+                first_records.append(len(offsets))
+                position = 0
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level) as gz:
+                    for line in batch:
+                        offsets.append(position)
+                        position += len(line)
+                    gz.write(b"".join(batch))
+    index = RecordIndex(
+        path,
+        compression,
+        members,
+        first_records,
+        offsets,
+        RecordIndex._stat(path),
+    )
+    index.save()
+    return index
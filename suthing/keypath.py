@@ -0,0 +1,513 @@
+"""Selective loading of JSON and YAML documents by key path.
+
+A key path addresses a subtree of a document: keys are separated by dots,
+sequence items are indexed in brackets and keys containing dots or brackets
+are quoted in brackets, e.g. models.encoder.vocab, a.b[3].c or a["x.y"].
+
+select_yaml and select_json walk the event stream of a document instead of
+building it: subtrees off the requested paths are consumed without being
+materialized, requested subtrees are built from their events only, and
+parsing stops as soon as every path is found. YAML events come from libyaml
+when available; JSON events come from ijson, if installed, otherwise the
+document is loaded in full and the paths are looked up in it.
+"""
+
+import importlib
+import re
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Iterator, Mapping, Sequence
+from typing import IO, Any
+
+from suthing.backend import Backend, json_loads, resolve_backend
+
+_TOKEN = re.compile(r"""(\.?)([^.\[\]"']+)|\[(\d+)\]|\[(?:"([^"]*)"|'([^']*)')\]""")
+
+
+def parse_path(path: str) -> tuple[str | int, ...]:
+    """Split a key path into keys.
+
+    Args:
+        path: Key path, e.g. a.b[3].c or a["x.y"]
+
+    Returns:
+        Tuple of keys; sequence indices are ints
+
+    Raises:
+        ValueError: If the path is empty or malformed
+    """
+    keys: list[str | int] = []
+    pos = 0
+    while pos < len(path):
+        m = _TOKEN.match(path, pos)
+        # bare keys are separated by a dot, except the first one
+        if m is None or (m.group(2) is not None and bool(m.group(1)) != (pos > 0)):
+            raise ValueError(f"invalid key path {path!r} at position {pos}")
+        _, name, index, dquoted, squoted = m.groups()
+        if index is not None:
+            keys.append(int(index))
+        else:
+            keys.append(next(k for k in (name, dquoted, squoted) if k is not None))
+        pos = m.end()
+    if not keys:
+        raise ValueError("empty key path")
+    return tuple(keys)
+
+
+class _Trie:
+    """Requested paths, merged on their common prefixes."""
+
+    __slots__ = ("children", "paths")
+
+    def __init__(self):
+        # paths ending at this node
+        self.paths: list[str] = []
+        self.children: dict[str | int, _Trie] = {}
+
+    @classmethod
+    def build(cls, paths: list[str]) -> "_Trie":
+        root = cls()
+        for path in paths:
+            node = root
+            for key in parse_path(path):
+                node = node.children.setdefault(key, cls())
+            node.paths.append(path)
+        return root
+
+    def child(self, key: str | int) -> "_Trie | None":
+        """Find the node of a mapping key or a sequence index."""
+        node = self.children.get(key)
+        if node is None:
+            if isinstance(key, int):
+                node = self.children.get(str(key))
+            elif key.isdigit():
+                node = self.children.get(int(key))
+        return node
+
+
+def _step(item: Any, key: str | int) -> Any:
+    """Look a key up in a mapping or an index in a sequence, KeyError if absent."""
+    if isinstance(item, Mapping):
+        if key in item:
+            return item[key]
+        if isinstance(key, int) and str(key) in item:
+            return item[str(key)]
+        if isinstance(key, str) and key.isdigit() and int(key) in item:
+            return item[int(key)]
+    elif isinstance(item, Sequence) and not isinstance(item, str | bytes):
+        if isinstance(key, str) and key.isdigit():
+            key = int(key)
+        if isinstance(key, int) and key < len(item):
+            return item[key]
+    raise KeyError(key)
+
+
+class _Selection:
+    """Values found for the requested paths."""
+
+    def __init__(self, paths: str | list[str]):
+        self.single = isinstance(paths, str)
+        self.paths = list(dict.fromkeys([paths] if isinstance(paths, str) else paths))
+        self.trie = _Trie.build(self.paths)
+        self.found: dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        return len(self.found) == len(self.paths)
+
+    def collect(self, item: Any, node: _Trie) -> None:
+        """Record item for the paths ending at node and its descendants."""
+        for path in node.paths:
+            self.found[path] = item
+        for key, child in node.children.items():
+            try:
+                value = _step(item, key)
+            except KeyError:
+                continue
+            self.collect(value, child)
+
+    def result(self) -> Any:
+        missing = [p for p in self.paths if p not in self.found]
+        if missing:
+            raise KeyError(missing[0] if self.single else missing)
+        if self.single:
+            return self.found[self.paths[0]]
+        return {p: self.found[p] for p in self.paths}
+
+
+class _Done(Exception):
+    """Raised to stop parsing once all paths are found."""
+
+
+def select(item: Any, paths: str | list[str]) -> Any:
+    """Look key paths up in a loaded object.
+
+    Args:
+        item: Nested mappings and sequences
+        paths: Key path or list of key paths
+
+    Returns:
+        Value at the path, or dict of path to value for a list of paths
+
+    Raises:
+        KeyError: If a path is not present
+    """
+    selection = _Selection(paths)
+    selection.collect(item, selection.trie)
+    return selection.result()
+
+
+class _YamlSource(ABC):
+    """Source of the events of a YAML document."""
+
+    def __init__(self, anchors: dict[str, list]):
+        yaml = importlib.import_module("yaml")
+        self._start = (yaml.MappingStartEvent, yaml.SequenceStartEvent)
+        self._end = (yaml.MappingEndEvent, yaml.SequenceEndEvent)
+        # events of the anchored nodes read so far
+        self.anchors = anchors
+
+    @abstractmethod
+    def peek(self):
+        """Next event, not consumed."""
+
+    @abstractmethod
+    def get(self):
+        """Consume the next event."""
+
+    def node(self) -> list:
+        """Consume the events of the next node, returning them."""
+        events = [self.get()]
+        depth = 1 if isinstance(events[0], self._start) else 0
+        while depth:
+            event = self.get()
+            events.append(event)
+            if isinstance(event, self._start):
+                depth += 1
+            elif isinstance(event, self._end):
+                depth -= 1
+        return events
+
+    def skip(self) -> None:
+        """Consume the events of the next node."""
+        depth = 1 if isinstance(self.get(), self._start) else 0
+        while depth:
+            event = self.get()
+            if isinstance(event, self._start):
+                depth += 1
+            elif isinstance(event, self._end):
+                depth -= 1
+
+
+class _YamlEvents(_YamlSource):
+    """Events of a YAML parser, recording anchored nodes.
+
+    Anchored nodes may be referenced by aliases within the requested subtrees,
+    so the events of every anchored node are kept, also when it is skipped.
+    """
+
+    def __init__(self, parser):
+        super().__init__({})
+        self._scalar = importlib.import_module("yaml").ScalarEvent
+        self.parser = parser
+        # open recordings: anchor, depth and events
+        self._recording: list[tuple[str, int, list]] = []
+        self._depth = 0
+
+    def peek(self):
+        return self.parser.peek_event()
+
+    def get(self):
+        event = self.parser.get_event()
+        for _, _, events in self._recording:
+            events.append(event)
+        if isinstance(event, self._start):
+            self._depth += 1
+            if event.anchor is not None:
+                self._recording.append((event.anchor, self._depth, [event]))
+        elif isinstance(event, self._end):
+            if self._recording and self._recording[-1][1] == self._depth:
+                anchor, _, events = self._recording.pop()
+                self.anchors[anchor] = events
+            self._depth -= 1
+        elif isinstance(event, self._scalar) and event.anchor is not None:
+            self.anchors[event.anchor] = [event]
+        return event
+
+
+class _Replay(_YamlSource):
+    """Recorded events of an anchored node."""
+
+    def __init__(self, events: list, anchors: dict[str, list]):
+        super().__init__(anchors)
+        self._events = deque(events)
+
+    def peek(self):
+        return self._events[0]
+
+    def get(self):
+        return self._events.popleft()
+
+
+def _yaml_loader(events: list, anchors: dict[str, list]):
+    """Build a FullLoader compatible object from the events of a node."""
+    yaml = importlib.import_module("yaml")
+    Composer = importlib.import_module("yaml.composer").Composer
+    FullConstructor = importlib.import_module("yaml.constructor").FullConstructor
+    Resolver = importlib.import_module("yaml.resolver").Resolver
+
+    class EventLoader(Composer, FullConstructor, Resolver):
+        def __init__(self):
+            self._events = deque(events)
+            Composer.__init__(self)
+            FullConstructor.__init__(self)
+            Resolver.__init__(self)
+
+        def check_event(self, *choices):
+            if not self._events:
+                return False
+            return not choices or isinstance(self._events[0], choices)
+
+        def peek_event(self):
+            return self._events[0]
+
+        def get_event(self):
+            return self._events.popleft()
+
+        def compose_node(self, parent, index):
+            event = self._events[0]
+            # an alias of a node outside the subtree: compose the recorded node
+            if (
+                isinstance(event, yaml.AliasEvent)
+                and event.anchor not in self.anchors
+                and event.anchor in anchors
+            ):
+                self._events.popleft()
+                self._events.extendleft(reversed(anchors[event.anchor]))
+            return super().compose_node(parent, index)
+
+        def load(self):
+            return self.construct_document(self.compose_node(None, None))
+
+    return EventLoader()
+
+
+def _collect_merged(
+    merged: list[list],
+    anchors: dict[str, list],
+    node: _Trie,
+    seen: set[_Trie],
+    selection: _Selection,
+) -> None:
+    """Collect the paths of node not found in a mapping from its merge keys.
+
+    A merge key takes a mapping or a sequence of mappings, the first ones
+    taking precedence, as in the YAML merge key type.
+    """
+    rest = _Trie()
+    rest.children = {k: c for k, c in node.children.items() if c not in seen}
+    if not rest.children:
+        return
+    values: dict = {}
+    for events in merged:
+        value = _yaml_loader(events, anchors).load()
+        for mapping in reversed(value if isinstance(value, list) else [value]):
+            if isinstance(mapping, Mapping):
+                values.update(mapping)
+    selection.collect(values, rest)
+    if selection.done:
+        raise _Done
+
+
+def _walk_yaml(source: _YamlSource, node: _Trie, selection: _Selection) -> None:
+    yaml = importlib.import_module("yaml")
+    if node.paths:
+        selection.collect(_yaml_loader(source.node(), source.anchors).load(), node)
+        if selection.done:
+            raise _Done
+        return
+    event = source.get()
+    if isinstance(event, yaml.AliasEvent):
+        if event.anchor in source.anchors:
+            _walk_yaml(
+                _Replay(source.anchors[event.anchor], source.anchors), node, selection
+            )
+    elif isinstance(event, yaml.MappingStartEvent):
+        # events of the values of merge keys (<<), the keys of the mapping
+        # taking precedence over the merged ones
+        merged = []
+        seen = set()
+        while not isinstance(source.peek(), yaml.MappingEndEvent):
+            key = source.peek()
+            child = None
+            if isinstance(key, yaml.ScalarEvent):
+                if key.value == "<<" and key.implicit[0]:
+                    source.skip()
+                    merged.append(source.node())
+                    continue
+                child = node.child(key.value)
+            source.skip()
+            if child is None:
+                source.skip()
+            else:
+                seen.add(child)
+                _walk_yaml(source, child, selection)
+        source.get()
+        if merged:
+            _collect_merged(merged, source.anchors, node, seen, selection)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        i = 0
+        while not isinstance(source.peek(), yaml.SequenceEndEvent):
+            child = node.child(i)
+            if child is None:
+                source.skip()
+            else:
+                _walk_yaml(source, child, selection)
+            i += 1
+        source.get()
+
+
+def select_yaml(
+    stream: IO[bytes],
+    paths: str | list[str],
+    backend: Backend | str | None = None,
+) -> Any:
+    """Load the subtrees at key paths of a YAML document.
+
+    Only the first document of a stream is read.
+
+    Args:
+        stream: Binary stream over the document
+        paths: Key path or list of key paths
+        backend: YAML backend, see suthing.backend
+
+    Returns:
+        Value at the path, or dict of path to value for a list of paths
+
+    Raises:
+        KeyError: If a path is not present
+    """
+    yaml = importlib.import_module("yaml")
+    selection = _Selection(paths)
+    if resolve_backend("yaml", backend) == Backend.LIBYAML:
+        parser = yaml.CBaseLoader(stream)
+    else:
+        parser = yaml.BaseLoader(stream)
+    try:
+        source = _YamlEvents(parser)
+        source.get()
+        if not isinstance(source.peek(), yaml.StreamEndEvent):
+            source.get()
+            _walk_yaml(source, selection.trie, selection)
+    except _Done:
+        pass
+    finally:
+        parser.dispose()
+    return selection.result()
+
+
+def _ijson():
+    try:
+        return importlib.import_module("ijson")
+    except ImportError:
+        return None
+
+
+class _JsonEvents:
+    """Event source over ijson basic_parse events."""
+
+    def __init__(self, events: Iterator[tuple[str, Any]]):
+        self._events = events
+        self._next: tuple[str, Any] | None = None
+
+    def peek(self) -> tuple[str, Any]:
+        if self._next is None:
+            self._next = next(self._events)
+        return self._next
+
+    def get(self) -> tuple[str, Any]:
+        event = self.peek()
+        self._next = None
+        return event
+
+    def node(self) -> Iterator[tuple[str, Any]]:
+        """Consume the events of the next node, yielding them."""
+        depth = 0
+        while True:
+            event = self.get()
+            yield event
+            if event[0] in ("start_map", "start_array"):
+                depth += 1
+            elif event[0] in ("end_map", "end_array"):
+                depth -= 1
+            if depth == 0:
+                return
+
+
+def _walk_json(source: _JsonEvents, node: _Trie, selection: _Selection) -> None:
+    if node.paths:
+        builder = _ijson().ObjectBuilder()  # type: ignore[union-attr]
+        for event, value in source.node():
+            builder.event(event, value)
+        selection.collect(builder.value, node)
+        if selection.done:
+            raise _Done
+        return
+    event, _ = source.get()
+    if event == "start_map":
+        while True:
+            event, key = source.get()
+            if event == "end_map":
+                break
+            child = node.child(key)
+            if child is None:
+                for _ in source.node():
+                    pass
+            else:
+                _walk_json(source, child, selection)
+    elif event == "start_array":
+        i = 0
+        while source.peek()[0] != "end_array":
+            child = node.child(i)
+            if child is None:
+                for _ in source.node():
+                    pass
+            else:
+                _walk_json(source, child, selection)
+            i += 1
+        source.get()
+
+
+def select_json(
+    stream: IO[bytes],
+    paths: str | list[str],
+    backend: Backend | str | None = None,
+) -> Any:
+    """Load the subtrees at key paths of a JSON document.
+
+    Without ijson the document is loaded in full with the JSON backend.
+
+    Args:
+        stream: Binary stream over the document
+        paths: Key path or list of key paths
+        backend: JSON backend used without ijson, see suthing.backend
+
+    Returns:
+        Value at the path, or dict of path to value for a list of paths
+
+    Raises:
+        KeyError: If a path is not present
+    """
+    ijson = _ijson()
+    if ijson is None:
+        return select(json_loads(stream.read(), backend), paths)
+    selection = _Selection(paths)
+    try:
+        _walk_json(
+            _JsonEvents(ijson.basic_parse(stream, use_float=True)),
+            selection.trie,
+            selection,
+        )
+    except _Done:
+        pass
+    return selection.result()
@@ -0,0 +1,165 @@
+"""Manifests of sharded datasets.
+
+A sharded dump splits a list of records or a DataFrame into shard files
+written next to a manifest file (suffix .manifest). The manifest is a JSON
+document listing the shards in order, with their record counts and sizes:
+
+    {"version": 1, "format": "jsonld", "compression": "gz", "kind": "records",
+     "records": 25000, "shards": [{"path": "data-00000.jsonld.gz",
+     "records": 10000, "bytes": 81234}, ...]}
+
+Shard paths are relative to the manifest. The manifest is written last and
+atomically: a dataset is visible only once all of its shards are complete.
+"""
+
+import itertools
+import os
+import pathlib
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+from suthing.backend import json_dumps, json_loads
+from suthing.compression import Compression
+
+MANIFEST_VERSION = 1
+
+# number of records serialized to estimate the size of a record
+SAMPLE_SIZE = 1000
+
+
+def shard_path(path: str, i: int, suffix: str) -> str:
+    """Path of the i-th shard of the dataset with manifest path.
+
+    Args:
+        path: Manifest path, e.g. data/events.manifest
+        i: Shard number
+        suffix: Suffix of the shards, e.g. .jsonld.gz
+
+    Returns:
+        Shard path, e.g. data/events-00003.jsonld.gz
+    """
+    p = pathlib.Path(path)
+    return p.with_name(f"{p.name.removesuffix('.manifest')}-{i:05d}{suffix}").as_posix()
+
+
+def split(
+    item: Iterable[Any],
+    shards: int | None = None,
+    shard_size: int | None = None,
+    shard_bytes: int | None = None,
+    measure: Callable[[Any], int] | None = None,
+) -> Iterator[Any]:
+    """Split records or a DataFrame into consecutive shards.
+
+    Exactly one of shards, shard_size and shard_bytes is expected.
+
+    Args:
+        item: List or iterable of records, or a DataFrame
+        shards: Number of shards of similar record counts
+        shard_size: Number of records per shard
+        shard_bytes: Target serialized (uncompressed) size of a shard,
+            estimated from the first SAMPLE_SIZE records
+        measure: Serialized size of a sample of records, for shard_bytes
+
+    Yields:
+        Lists of records or DataFrame slices
+
+    Raises:
+        ValueError: If not exactly one shard size is given or it is not positive
+    """
+    given = [v for v in (shards, shard_size, shard_bytes) if v is not None]
+    if len(given) != 1 or given[0] < 1:
+        raise ValueError(
+            "expected one positive value of shards, shard_size or shard_bytes"
+        )
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(item, pd.DataFrame):
+        if shard_bytes is not None:
+            sample = item.iloc[:SAMPLE_SIZE]
+            size = _records_per_shard(shard_bytes, measure, sample, len(sample))
+        elif shards is not None:
+            size = max(-(-len(item) // shards), 1)
+        else:
+            size = given[0]
+        for start in range(0, len(item), size):
+            yield item.iloc[start : start + size]
+        return
+    if shards is not None:
+        records = list(item)
+        shard_size = max(-(-len(records) // shards), 1)
+        item = records
+    records_ = iter(item)
+    if shard_bytes is not None:
+        sample = list(itertools.islice(records_, SAMPLE_SIZE))
+        shard_size = _records_per_shard(shard_bytes, measure, sample, len(sample))
+        records_ = itertools.chain(sample, records_)
+    while chunk := list(itertools.islice(records_, shard_size)):
+        yield chunk
+
+
+def _records_per_shard(
+    shard_bytes: int, measure: Callable[[Any], int] | None, sample: Any, n: int
+) -> int:
+    if measure is None:
+        raise ValueError("shard_bytes requires a measure of the serialized size")
+    if n == 0:
+        return 1
+    return max(shard_bytes * n // max(measure(sample), 1), 1)
+
+
+def write_manifest(
+    path: str,
+    how: str,
+    compression: Compression | None,
+    kind: str,
+    shards: list[dict[str, Any]],
+) -> None:
+    """Write a manifest, atomically.
+
+    Args:
+        path: Manifest path
+        how: Format of the shards (FileType value)
+        compression: Compression of the shards
+        kind: "records" or "frame"
+        shards: Shard entries with path (absolute or relative to the
+            manifest), records and bytes
+    """
+    root = os.path.dirname(os.path.abspath(path))
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "format": how,
+        "compression": None if compression is None else compression.value,
+        "kind": kind,
+        "records": sum(s["records"] for s in shards),
+        "shards": [
+            {**s, "path": os.path.relpath(os.path.abspath(s["path"]), root)}
+            for s in shards
+        ],
+    }
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(json_dumps(manifest, indent=True) + b"\n")
+    os.replace(tmp, path)
+
+
+def read_manifest(path: str) -> dict[str, Any]:
+    """Read a manifest, resolving shard paths.
+
+    Args:
+        path: Manifest path
+
+    Returns:
+        Manifest with shard paths relative to the working directory
+
+    Raises:
+        ValueError: If the manifest version is not supported
+    """
+    with open(path, "rb") as f:
+        manifest = json_loads(f.read())
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"unsupported manifest version {manifest.get('version')}")
+    root = os.path.dirname(path)
+    for shard in manifest["shards"]:
+        shard["path"] = os.path.join(root, shard["path"])
+    return manifest
@@ -0,0 +1,155 @@
+"""Pickle containers with out-of-band buffers.
+
+Pickle protocol 5 lets objects such as NumPy arrays and pandas frames hand
+their data buffers to the pickler instead of copying them into the stream.
+A container file stores the (small) pickle stream followed by these buffers,
+each aligned to ALIGNMENT bytes:
+
+    MAGIC | version, buffer count, stream size | (offset, size) per buffer
+    | pickle stream | padding | buffer | padding | buffer ...
+
+Loading an uncompressed container maps the file in memory copy-on-write:
+the unpickled arrays are backed by the mapping, pages are read on first
+access and copied only when written to.
+"""
+
+import io
+import mmap
+import pickle
+import struct
+from typing import IO, Any, cast
+
+MAGIC = b"SUTHPKL5"
+VERSION = 1
+# alignment of buffers within the file, a cache line
+ALIGNMENT = 64
+# smaller buffers are kept in the pickle stream
+MIN_BUFFER_SIZE = 1 << 12
+
+_HEADER = struct.Struct("<IIQ")
+_ENTRY = struct.Struct("<QQ")
+
+
+def _align(position: int) -> int:
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def dump_oob(item: Any, fp: IO[bytes], min_size: int = MIN_BUFFER_SIZE) -> None:
+    """Pickle an object into a container, its large buffers out-of-band.
+
+    Args:
+        item: Object to pickle
+        fp: Binary stream, need not be seekable
+        min_size: Size from which contiguous buffers are stored out-of-band
+    """
+    buffers: list[memoryview] = []
+
+    def callback(buffer: pickle.PickleBuffer) -> bool:
+        try:
+            raw = buffer.raw()
+        except BufferError:
+            # non contiguous, serialized in-band
+            return True
+        if raw.nbytes < min_size:
+            return True
+        buffers.append(raw)
+        return False
+
+    stream = pickle.dumps(item, protocol=5, buffer_callback=callback)
+    position = len(MAGIC) + _HEADER.size + _ENTRY.size * len(buffers) + len(stream)
+    entries = []
+    for raw in buffers:
+        position = _align(position)
+        entries.append((position, raw.nbytes))
+        position += raw.nbytes
+
+    fp.write(MAGIC)
+    fp.write(_HEADER.pack(VERSION, len(buffers), len(stream)))
+    for entry in entries:
+        fp.write(_ENTRY.pack(*entry))
+    fp.write(stream)
+    position = len(MAGIC) + _HEADER.size + _ENTRY.size * len(buffers) + len(stream)
+    for (offset, size), raw in zip(entries, buffers):
+        fp.write(b"\0" * (offset - position))
+        fp.write(raw)
+        position = offset + size
+
+
+def _read_header(head: bytes | memoryview) -> tuple[int, int]:
+    if bytes(head[: len(MAGIC)]) != MAGIC:
+        raise ValueError("not an out-of-band pickle container")
+    version, count, size = _HEADER.unpack_from(head, len(MAGIC))
+    if version != VERSION:
+        raise ValueError(f"unsupported pickle container version {version}")
+    return count, size
+
+
+def is_oob(fp: IO[bytes]) -> bool:
+    """Check whether a stream starts with a container, without consuming it.
+
+    Args:
+        fp: Binary stream; streams that can not peek are reported as False
+
+    Returns:
+        True for a container
+    """
+    peek = getattr(fp, "peek", None)
+    return peek is not None and peek(len(MAGIC))[: len(MAGIC)] == MAGIC
+
+
+def load_oob(path: str) -> Any:
+    """Load a container file, mapping its buffers in memory.
+
+    Args:
+        path: Container file
+
+    Returns:
+        Unpickled object, its out-of-band buffers backed by the mapping
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    view = memoryview(mapped)
+    count, size = _read_header(view[: len(MAGIC) + _HEADER.size])
+    position = len(MAGIC) + _HEADER.size
+    buffers = []
+    for i in range(count):
+        offset, length = _ENTRY.unpack_from(view, position + i * _ENTRY.size)
+        buffers.append(view[offset : offset + length])
+    position += count * _ENTRY.size
+    # the views keep the mapping alive as long as the objects built on them
+    return pickle.loads(view[position : position + size], buffers=buffers)
+
+
+def read_oob(fp: IO[bytes]) -> Any:
+    """Read a container from a stream, copying its buffers.
+
+    Used for compressed containers and package resources, which can not be
+    mapped.
+
+    Args:
+        fp: Binary stream positioned at the start of the container
+
+    Returns:
+        Unpickled object
+    """
+    count, size = _read_header(fp.read(len(MAGIC) + _HEADER.size))
+    table = fp.read(count * _ENTRY.size)
+    entries = [_ENTRY.unpack_from(table, i * _ENTRY.size) for i in range(count)]
+    stream = fp.read(size)
+    position = len(MAGIC) + _HEADER.size + len(table) + size
+    # decompressing streams and package resources are buffered streams
+    readinto = cast(io.BufferedIOBase, fp).readinto
+    buffers = []
+    for offset, length in entries:
+        fp.read(offset - position)
+        buffer = bytearray(length)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < length:
+            n = readinto(view[filled:])
+            if not n:
+                raise ValueError("truncated pickle container")
+            filled += n
+        buffers.append(buffer)
+        position = offset + length
+    return pickle.loads(stream, buffers=buffers)
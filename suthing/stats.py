@@ -0,0 +1,246 @@
+"""Constant memory summaries of metric streams.
+
+RunningStats keeps the count, sum, extrema and (Welford) variance of the
+values added to it, together with a QuantileSketch for percentiles. The
+sketch is a log-bucketed histogram in the spirit of DDSketch / HDR
+histograms: a value v falls into bucket ceil(log(v) / log(gamma)), so every
+quantile is estimated within relative_accuracy of a true value, and the
+number of buckets is capped by collapsing the smallest ones. Both merge
+exactly, which makes summaries of separate threads or processes combinable.
+"""
+
+import dataclasses
+import math
+from typing import Any
+
+# values of smaller magnitude are counted as zero
+MIN_VALUE = 1e-12
+
+
+@dataclasses.dataclass(frozen=True)
+class Summary:
+    """Snapshot of a RunningStats."""
+
+    count: int
+    total: float
+    min: float
+    max: float
+    mean: float
+    std: float
+    p50: float
+    p95: float
+    p99: float
+
+
+class QuantileSketch:
+    """Mergeable quantile estimator with bounded relative error and size."""
+
+    __slots__ = (
+        "_gamma",
+        "_log_gamma",
+        "_max_buckets",
+        "_negative",
+        "_positive",
+        "_zero",
+        "count",
+    )
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        Args:
+            relative_accuracy: Relative error bound of the quantiles, in (0, 1)
+            max_buckets: Maximum number of buckets; beyond it the buckets of
+                the smallest magnitudes are merged, degrading their accuracy only
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(
+                f"relative_accuracy should be in (0, 1), got {relative_accuracy}"
+            )
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._max_buckets = max_buckets
+        self._positive: dict[int, int] = {}
+        self._negative: dict[int, int] = {}
+        self._zero = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Add a value count times."""
+        self.count += count
+        if value > MIN_VALUE:
+            buckets = self._positive
+        elif value < -MIN_VALUE:
+            buckets, value = self._negative, -value
+        else:
+            self._zero += count
+            return
+        i = math.ceil(math.log(value) / self._log_gamma)
+        buckets[i] = buckets.get(i, 0) + count
+        if len(buckets) > self._max_buckets:
+            self._collapse(buckets)
+
+    @staticmethod
+    def _collapse(buckets: dict[int, int]) -> None:
+        lowest = sorted(buckets)[:2]
+        buckets[lowest[1]] += buckets.pop(lowest[0])
+
+    def _value(self, i: int) -> float:
+        # midpoint of bucket (gamma^(i-1), gamma^i] with bounded relative error
+        return 2 * self._gamma**i / (self._gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile, NaN if empty.
+
+        Args:
+            q: Quantile in [0, 1]
+
+        Returns:
+            Estimated value
+        """
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for i in sorted(self._negative, reverse=True):
+            seen += self._negative[i]
+            if seen > rank:
+                return -self._value(i)
+        seen += self._zero
+        if seen > rank:
+            return 0.0
+        for i in sorted(self._positive):
+            seen += self._positive[i]
+            if seen > rank:
+                return self._value(i)
+        return self._value(max(self._positive))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add the values of another sketch of the same accuracy."""
+        if other._gamma != self._gamma:
+            raise ValueError("can not merge sketches of different accuracies")
+        for mine, theirs in (
+            (self._positive, other._positive),
+            (self._negative, other._negative),
+        ):
+            for i, c in theirs.items():
+                mine[i] = mine.get(i, 0) + c
+            while len(mine) > self._max_buckets:
+                self._collapse(mine)
+        self._zero += other._zero
+        self.count += other.count
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {
+            "gamma": self._gamma,
+            "max_buckets": self._max_buckets,
+            "positive": self._positive,
+            "negative": self._negative,
+            "zero": self._zero,
+            "count": self.count,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self._gamma = state["gamma"]
+        self._log_gamma = math.log(self._gamma)
+        self._max_buckets = state["max_buckets"]
+        self._positive = state["positive"]
+        self._negative = state["negative"]
+        self._zero = state["zero"]
+        self.count = state["count"]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert to JSON serializable structures."""
+        state = self.__getstate__()
+        for side in ("positive", "negative"):
+            state[side] = {str(i): c for i, c in state[side].items()}
+        return state
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "QuantileSketch":
+        """Rebuild a sketch converted with to_dict."""
+        sketch = cls.__new__(cls)
+        state = dict(d)
+        for side in ("positive", "negative"):
+            state[side] = {int(i): c for i, c in d[side].items()}
+        sketch.__setstate__(state)
+        return sketch
+
+
+class RunningStats:
+    """Count, sum, extrema, variance and quantiles of a stream of values."""
+
+    __slots__ = ("_m2", "count", "max", "mean", "min", "sketch", "total")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value: float) -> None:
+        """Add a value, in constant time and memory."""
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.sketch.add(value)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, 0 for less than two values."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def merge(self, other: "RunningStats") -> None:
+        """Add the values summarized by another RunningStats."""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta**2 * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def summary(self) -> Summary:
+        """Take an immutable snapshot."""
+        empty = self.count == 0
+        return Summary(
+            count=self.count,
+            total=self.total,
+            min=math.nan if empty else self.min,
+            max=math.nan if empty else self.max,
+            mean=math.nan if empty else self.mean,
+            std=math.sqrt(self.variance),
+            p50=self.sketch.quantile(0.5),
+            p95=self.sketch.quantile(0.95),
+            p99=self.sketch.quantile(0.99),
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert to JSON serializable structures."""
+        return {**self.__getstate__(), "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "RunningStats":
+        """Rebuild statistics converted with to_dict."""
+        stats = cls.__new__(cls)
+        stats.__setstate__({**d, "sketch": QuantileSketch.from_dict(d["sketch"])})
+        return stats
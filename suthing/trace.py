@@ -0,0 +1,160 @@
+"""Spans of nested profiled calls.
+
+A span covers a call, from start to end. The span being run is kept in a
+context variable: a span started while another is open becomes its child,
+in the same thread or asyncio task, and in tasks created by it (tasks copy
+the context of their creator). Threads start with an empty context, so
+their spans are roots unless the thread runs in a copy of the parent's
+context, e.g. executor.submit(contextvars.copy_context().run, fn).
+
+The inclusive time of a span is its duration, its self (exclusive) time
+the duration minus the inclusive time of its children. Children running
+concurrently, e.g. gathered tasks, may overlap: self time is then
+clamped at zero.
+
+Finished spans are exported as Chrome trace events (chrome://tracing,
+Perfetto) and as folded stacks ("a;b;c <microseconds>" lines, the input
+of flamegraph.pl, speedscope or inferno).
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import os
+import sys
+import threading
+from collections.abc import Generator
+from contextvars import ContextVar, Token
+from timeit import default_timer
+
+# maximum number of spans kept for trace events by default
+MAX_SPANS = 100000
+
+_current: ContextVar[Span | None] = ContextVar("suthing_span", default=None)
+
+
+class Span:
+    """A call being traced."""
+
+    __slots__ = ("children", "name", "parent", "path", "start")
+
+    def __init__(self, name: str, parent: Span | None):
+        self.name = name
+        self.parent = parent
+        self.path = name if parent is None else f"{parent.path};{name}"
+        self.children = 0.0
+        self.start = default_timer()
+
+
+def current_span() -> Span | None:
+    """Span being run in the current context, None outside of spans."""
+    return _current.get()
+
+
+def _lane() -> int:
+    """Identifier of the current asyncio task, or else of the thread."""
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is not None and asyncio._get_running_loop() is not None:
+        task = asyncio.current_task()
+        if task is not None:
+            return id(task)
+    return threading.get_ident()
+
+
+class Tracer:
+    """Collects the spans of nested calls.
+
+    Spans are started and finished by profile when the profiler traces
+    (SProfiler(trace=True)), or explicitly with Tracer.span.
+    """
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        """
+        Args:
+            max_spans: Number of the latest spans kept for trace events;
+                folded stacks cover all spans
+        """
+        self._lock = threading.Lock()
+        self._events: collections.deque[tuple] = collections.deque(maxlen=max_spans)
+        self._folded: collections.defaultdict[str, float] = collections.defaultdict(
+            float
+        )
+        self.origin = default_timer()
+
+    def start(self, name: str) -> tuple[Span, Token]:
+        """Open a span, child of the current span."""
+        span = Span(name, _current.get())
+        return span, _current.set(span)
+
+    def finish(self, span: Span, token: Token) -> tuple[float, float]:
+        """Close a span opened with start, in the same context.
+
+        Returns:
+            Inclusive and self time of the span, in seconds
+        """
+        end = default_timer()
+        _current.reset(token)
+        elapsed = end - span.start
+        lane = _lane()
+        with self._lock:
+            self_time = max(elapsed - span.children, 0.0)
+            if span.parent is not None:
+                span.parent.children += elapsed
+            self._folded[span.path] += self_time
+            self._events.append((span.name, span.start, elapsed, self_time, lane))
+        return elapsed, self_time
+
+    @contextlib.contextmanager
+    def span(self, name: str) -> Generator[Span]:
+        """Trace the block as a span."""
+        span, token = self.start(name)
+        try:
+            yield span
+        finally:
+            self.finish(span, token)
+
+    def folded(self) -> dict[str, float]:
+        """Self time by stack of span names, in seconds."""
+        with self._lock:
+            return dict(self._folded)
+
+    def chrome_trace(self) -> dict:
+        """Trace event document of the kept spans.
+
+        Every span is a complete ("X") event, in microseconds since the
+        tracer was created, with its self time in args.
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": elapsed * 1e6,
+                    "pid": pid,
+                    "tid": lane,
+                    "args": {"self_us": self_time * 1e6},
+                }
+                for name, start, elapsed, self_time, lane in events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def dump_chrome_trace(self, path) -> None:
+        """Write the trace events with FileHandle, e.g. to trace.json.gz."""
+        from suthing.file_handle import FileHandle, FileType
+
+        FileHandle.dump(self.chrome_trace(), path, how=FileType.JSON)
+
+    def dump_folded(self, path) -> None:
+        """Write the folded stacks with FileHandle, in integer microseconds."""
+        from suthing.file_handle import FileHandle, FileType
+
+        lines = [
+            f"{stack} {round(t * 1e6)}\n" for stack, t in sorted(self.folded().items())
+        ]
+        FileHandle.dump("".join(lines), path, how=FileType.TXT)
@@ -0,0 +1,79 @@
+"""Decoding of loaded data into dataclasses.
+
+Decoding goes through dataclass-wizard, which generates and caches a loader
+function per dataclass on first use.
+"""
+
+import dataclasses
+import functools
+import sys
+import typing
+from collections.abc import Callable
+from typing import Any
+
+
+@functools.cache
+def decoder(into: Any) -> Callable[[Any], Any]:
+    """Get the function decoding one record into a dataclass.
+
+    The dataclass is checked once; decoding is dataclass-wizard fromdict.
+
+    Args:
+        into: Dataclass type
+
+    Returns:
+        Function converting a mapping into an instance of into
+
+    Raises:
+        ValueError: If into is not a dataclass type
+    """
+    if not (isinstance(into, type) and dataclasses.is_dataclass(into)):
+        raise ValueError(f"can only decode into dataclasses, got {into!r}")
+    from dataclass_wizard import fromdict
+
+    return functools.partial(fromdict, into)
+
+
+def record_type(into: Any) -> tuple[Any, bool]:
+    """Split a target type into the record dataclass and a list flag.
+
+    Args:
+        into: Dataclass type or list[dataclass]
+
+    Returns:
+        Tuple of the dataclass type and whether a list is requested
+    """
+    if typing.get_origin(into) is list:
+        (item,) = typing.get_args(into)
+        return item, True
+    return into, False
+
+
+def decode(data: Any, into: Any) -> Any:
+    """Decode loaded data into dataclasses.
+
+    Lists (JSON arrays, JSON lines) and DataFrames (by row) are decoded
+    record by record.
+
+    Args:
+        data: Loaded data, a mapping, a list of mappings or a DataFrame
+        into: Dataclass type or list[dataclass]
+
+    Returns:
+        Instance of the dataclass, or a list of instances for list data
+        or a list target type
+
+    Raises:
+        ValueError: If into is not a dataclass type, or a list type and
+            data is a single record
+    """
+    cls, many = record_type(into)
+    decode_one = decoder(cls)
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(data, pd.DataFrame):
+        data = data.to_dict("records")
+    if isinstance(data, list):
+        return [decode_one(d) for d in data]
+    if many:
+        raise ValueError(f"expected a list of records to decode into {into!r}")
+    return decode_one(data)
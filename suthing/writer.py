@@ -0,0 +1,202 @@
+"""Incremental writers of record files.
+
+RecordWriter accepts records one by one or in bulk, serializes them in
+batches and streams them through the compressor, so that memory use does
+not grow with the size of the export. Output goes to a temporary file in the
+destination directory that atomically replaces the destination on commit:
+readers never see a partially written file. Non atomic writers write the
+destination in place instead, appending to it without copying its content.
+"""
+
+import os
+import secrets
+import shutil
+import sys
+from collections.abc import Iterable
+from typing import IO, TYPE_CHECKING, Any
+
+from suthing.backend import Backend, json_dumps
+from suthing.compression import Compression, open_writer
+from suthing.file_handle import FileType
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class RecordWriter:
+    """Buffered, atomic writer of JSONLD, JSON and CSV records."""
+
+    def __init__(
+        self,
+        path: str,
+        how: FileType,
+        compression: Compression | None = None,
+        append: bool = False,
+        batch_size: int = 1000,
+        backend: Backend | str | None = None,
+        compresslevel: int | None = None,
+        threads: int | None = None,
+        atomic: bool = True,
+    ):
+        """Open a temporary file next to path, or path itself if not atomic.
+
+        Args:
+            path: Destination path
+            how: FileType of the records, JSONLD, JSON or CSV
+            compression: Compression of the output
+            append: Keep the current content of path (JSONLD and CSV only);
+                compressed content is appended as a new member / frame
+            batch_size: Number of records serialized and written at once
+            backend: JSON serialization backend, see suthing.backend
+            compresslevel: Codec specific compression level
+            threads: Number of compression threads (zstd only)
+            atomic: Write a temporary file replacing path on commit,
+                otherwise write path in place, batches written before an
+                abort being kept
+
+        Raises:
+            ValueError: If the format can not be written incrementally or appended to
+        """
+        if how not in (FileType.JSONLD, FileType.JSON, FileType.CSV):
+            raise ValueError(f"incremental writing is not supported for {how.value}")
+        if append and (how == FileType.JSON or compression == Compression.LZMA):
+            raise ValueError(
+                "appending is supported for jsonld and csv files,"
+                " not compressed with lzma"
+            )
+        if batch_size < 1:
+            raise ValueError(f"batch_size should be positive, got {batch_size}")
+        self.path = path
+        self.how = how
+        self.batch_size = batch_size
+        self.backend = backend
+        self.count = 0
+        self._buffer: list[Any] = []
+        self._columns: list | None = None
+        self._closed = False
+
+        self._tmp: str | None = None
+        if not atomic:
+            self._raw: IO[bytes] = open(path, "ab" if append else "wb")
+        else:
+            head, tail = os.path.split(path)
+            self._tmp = os.path.join(
+                head, f".{tail}.{os.getpid()}.{secrets.token_hex(4)}.tmp"
+            )
+            # created through os.open for the permissions to follow the umask
+            fd = os.open(self._tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            self._raw = os.fdopen(fd, "wb")
+            if append and os.path.exists(path):
+                with open(path, "rb") as fp:
+                    shutil.copyfileobj(fp, self._raw)
+                shutil.copymode(path, self._tmp)
+        self._empty = self._raw.tell() == 0
+        if how == FileType.CSV and not self._empty:
+            import pandas as pd
+
+            self._columns = list(pd.read_csv(path, nrows=0).columns)
+        self._stream: IO[bytes] = self._raw
+        if compression is not None:
+            self._stream = open_writer(self._raw, compression, compresslevel, threads)
+        if how == FileType.JSON:
+            self._stream.write(b"[")
+
+    def write(self, record: Any) -> None:
+        """Add a record, writing the batch once batch_size records are buffered.
+
+        Args:
+            record: JSON serializable object; for CSV a mapping of column to value
+        """
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records: "Iterable[Any] | pd.DataFrame") -> None:
+        """Add records.
+
+        Args:
+            records: Iterable of records or a DataFrame (written row by row,
+                without its index)
+        """
+        # a DataFrame implies pandas is imported
+        pd = sys.modules.get("pandas")
+        if pd is not None and isinstance(records, pd.DataFrame):
+            if self.how == FileType.CSV:
+                self.flush()
+                self._write_frame(records)
+                self.count += len(records)
+                return
+            records = records.to_dict("records")
+        for record in records:
+            self.write(record)
+
+    def flush(self) -> None:
+        """Serialize and write the buffered records."""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        if self.how == FileType.CSV:
+            import pandas as pd
+
+            self._write_frame(pd.DataFrame.from_records(batch))
+        elif self.how == FileType.JSONLD:
+            self._stream.write(
+                b"".join(json_dumps(r, backend=self.backend) + b"\n" for r in batch)
+            )
+        else:
+            chunk = b",\n".join(json_dumps(r, backend=self.backend) for r in batch)
+            self._stream.write((b"\n" if self.count == 0 else b",\n") + chunk)
+        self.count += len(batch)
+
+    def _write_frame(self, df: "pd.DataFrame") -> None:
+        if self._columns is None:
+            self._columns = list(df.columns)
+        else:
+            df = df.reindex(columns=self._columns)
+        chunk = df.to_csv(index=False, header=self._empty)
+        self._stream.write(chunk.encode("utf-8"))
+        self._empty = False
+
+    def commit(self) -> None:
+        """Write the remaining records and move the file to its destination."""
+        if self._closed:
+            return
+        try:
+            self.flush()
+            if self.how == FileType.JSON:
+                self._stream.write(b"\n]\n")
+            if self._stream is not self._raw:
+                self._stream.close()
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+        except BaseException:
+            self.abort()
+            raise
+        self._raw.close()
+        self._closed = True
+        if self._tmp is not None:
+            os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        """Discard the records written, only those buffered if not atomic."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._stream is not self._raw:
+                self._stream.close()
+        finally:
+            self._raw.close()
+            if self._tmp is not None:
+                os.remove(self._tmp)
+
+    close = commit
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
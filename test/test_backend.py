@@ -0,0 +1,53 @@
+import math
+
+import pytest
+
+from suthing.backend import (
+    Backend,
+    available_backends,
+    json_dumps,
+    json_loads,
+    resolve_backend,
+    set_backend,
+)
+from suthing.file_handle import FileHandle
+
+
+@pytest.mark.parametrize("backend", available_backends("json"))
+def test_json_roundtrip(backend):
+    item = {"a": [1, 2.5, None, "é"], "b": {"c": True}}
+    assert json_loads(json_dumps(item, indent=True, backend=backend)) == item
+
+
+def test_json_default_lossless(tmp_path):
+    item = [{"big": 2**70 + 1, "inf": float("inf"), "nan": float("nan")}]
+    path = tmp_path / "example.jsonld"
+    FileHandle.dump(item, path)
+    assert (
+        path.read_text()
+        == '{"big": 1180591620717411303425, "inf": Infinity, "nan": NaN}\n'
+    )
+    r = FileHandle.load(path)
+    assert r[0]["big"] == 2**70 + 1 and r[0]["inf"] == float("inf")
+    for backend in available_backends("json"):
+        r = FileHandle.load(path, backend=backend)
+        assert r[0]["big"] == 2**70 + 1 and math.isnan(r[0]["nan"])
+
+
+@pytest.mark.parametrize("ext", ["json", "jsonld", "yaml"])
+def test_backend_override(tmp_path, ext):
+    kind = "yaml" if ext == "yaml" else "json"
+    item = [{"a": 1}, {"b": [1, 2]}]
+    path = tmp_path / f"example.{ext}.gz"
+    for backend in available_backends(kind):
+        FileHandle.dump(item, path, backend=backend)
+        assert FileHandle.load(path, backend=backend) == item
+
+
+def test_set_backend():
+    set_backend(json="json")
+    assert resolve_backend("json") == Backend.JSON
+    set_backend(json="auto")
+    assert resolve_backend("json") == available_backends("json")[0]
+    with pytest.raises(ValueError):
+        set_backend(yaml="orjson")
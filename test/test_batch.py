@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+import pytest
+
+from suthing.batch import arun_batch, run_batch
+
+
+def square(x):
+    if x < 0:
+        raise ValueError("x should be non negative")
+    time.sleep(0.001 * (x % 3))
+    return x * x
+
+
+class Flaky:
+    """Fails the first attempts of every input."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = {}
+
+    def __call__(self, x):
+        self.calls[x] = self.calls.get(x, 0) + 1
+        if self.calls[x] <= self.failures:
+            raise ConnectionError(f"attempt {self.calls[x]}")
+        return x
+
+
+@pytest.mark.parametrize("executor", ["thread", "process", "asyncio"])
+def test_run_batch(executor):
+    inputs = [3, -1, 4, 1, -5, 9, 2, 6]
+    batch = run_batch(square, iter(inputs), workers=3, executor=executor, ordered=True)
+    results = list(batch)
+    assert [r.hkey for r in results] == [f"square<({i})>" for i in range(8)]
+    assert [r.ret for r in results] == [9, None, 16, 1, None, 81, 4, 36]
+    assert isinstance(results[1].exception, ValueError)
+    summary = batch.summary()
+    assert (summary.count, summary.succeeded, summary.failed) == (8, 6, 2)
+    assert summary.success_rate == 0.75 and summary.failures == {"ValueError": 2}
+    assert summary.latency.count == 8
+
+
+def test_retries():
+    fn = Flaky(failures=2)
+    batch = run_batch(fn, range(5), workers=2, retries=2, backoff=0.001)
+    results = sorted(batch, key=lambda r: r.ret)
+    assert [r.ret for r in results] == list(range(5))
+    assert all(r.success and len(r.reports) == 2 for r in results)
+    assert not results[0].reports[0].success
+    assert batch.summary().retries == 10
+
+    batch = run_batch(Flaky(failures=2), range(3), retries=1, backoff=0.001)
+    assert batch.summary().count == 0
+    assert all(isinstance(r.exception, ConnectionError) for r in batch)
+    assert batch.summary().failures == {"ConnectionError": 3}
+
+    batch = run_batch(Flaky(failures=1), range(3), retries=3, retry_on=[KeyError])
+    assert not any(r.success for r in batch)
+
+
+def test_timeout():
+    def slow(x):
+        time.sleep(x)
+        return x
+
+    start = time.monotonic()
+    results = list(
+        run_batch(slow, [0.5, 0.01, 0.01], workers=2, ordered=True, timeout=0.1)
+    )
+    assert isinstance(results[0].exception, TimeoutError)
+    assert [r.ret for r in results[1:]] == [0.01, 0.01]
+    assert time.monotonic() - start < 0.4
+
+    async def aslow(x):
+        await asyncio.sleep(x)
+        return x
+
+    async def main():
+        batch = arun_batch(aslow, [1.0, 0.01], timeout=0.05, retries=1, backoff=0)
+        results = [r async for r in batch]
+        return results, batch.summary()
+
+    results, summary = asyncio.run(main())
+    assert [r.ret for r in results] == [0.01, None]
+    assert summary.failures == {"TimeoutError": 1} and summary.retries == 1
+
+
+def test_aclose_awaits_cancelled_tasks():
+    cancelled = []
+
+    async def aslow(x):
+        try:
+            await asyncio.sleep(x)
+        except asyncio.CancelledError:
+            cancelled.append(x)
+            raise
+        return x
+
+    async def main():
+        batch = arun_batch(aslow, [0.01, 1.0, 1.0], workers=3)
+        r = await anext(batch)
+        await batch.aclose()
+        # the cancelled tasks are done once aclose returns
+        assert cancelled == [1.0, 1.0]
+        return r, batch.summary()
+
+    r, summary = asyncio.run(main())
+    assert r.ret == 0.01 and summary.count == 1 and summary.success_rate == 1
+
+
+def test_workers():
+    for executor in ("thread", "process", "asyncio"):
+        with pytest.raises(ValueError):
+            run_batch(square, range(2), workers=0, executor=executor)
+    with pytest.raises(ValueError):
+        arun_batch(square, range(2), workers=0)
+
+    # a function timing out in a thread keeps its worker until it returns
+    running, peak = [0], [0]
+
+    def slow(x):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        time.sleep(x)
+        running[0] -= 1
+        return x
+
+    batch = run_batch(
+        slow, [0.2, 0.01], workers=1, executor="asyncio", ordered=True, timeout=0.05
+    )
+    results = list(batch)
+    assert isinstance(results[0].exception, TimeoutError) and results[1].ret == 0.01
+    assert peak[0] == 1
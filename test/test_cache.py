@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from suthing.cache import LoadCache
+from suthing.file_handle import FileHandle
+
+
+def test_load_cache(tmp_path):
+    cache = LoadCache(max_entries=2)
+    path = tmp_path / "config.yaml"
+    FileHandle.dump({"a": [1, 2]}, path)
+    r = FileHandle.load(path, cache=cache)
+    r["a"].append(3)
+    assert FileHandle.load(path, cache=cache) == {"a": [1, 2]}
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+    FileHandle.dump({"a": [1, 2, 3, 4]}, path)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert FileHandle.load(path, cache=cache) == {"a": [1, 2, 3, 4]}
+    assert cache.stats.invalidations == 1
+
+    for i in range(3):
+        FileHandle.dump({"i": i}, tmp_path / f"{i}.json")
+        FileHandle.load(tmp_path / f"{i}.json", cache=cache)
+    assert cache.stats.entries == 2
+    assert cache.stats.evictions == 2
+
+
+def test_load_cache_frozen(tmp_path):
+    cache = LoadCache(mode="frozen", max_bytes=1 << 20)
+    path = tmp_path / "config.json"
+    FileHandle.dump({"a": [1, {"b": 2}]}, path)
+    r = FileHandle.load(path, cache=cache)
+    assert r is FileHandle.load(path, cache=cache)
+    with pytest.raises(TypeError):
+        r["a"][1]["b"] = 3
+
+
+def test_load_cache_package():
+    FileHandle.cache.clear()
+    assert FileHandle.load("test.data", "some.secret", cache=True) == "123"
+    assert FileHandle.load("test.data", "some.secret", cache=True) == "123"
+    assert FileHandle.cache.stats.hits >= 1
+
+
+def test_load_cache_memory(tmp_path):
+    path = tmp_path / "records.json.gz"
+    records = [{"a": i, "b": "x" * 10} for i in range(10000)]
+    FileHandle.dump(records, path)
+    assert os.path.getsize(path) < 1 << 16
+    # charged for the loaded records, far larger than the compressed file
+    cache = LoadCache(max_bytes=1 << 16)
+    assert FileHandle.load(path, cache=cache) == records
+    assert cache.stats.entries == 0
+    cache = LoadCache()
+    FileHandle.load(path, cache=cache)
+    assert cache.stats.bytes > 1 << 20
+
+
+def test_load_cache_frozen_frame(tmp_path):
+    path = tmp_path / "frame.csv"
+    path.write_text("a,b\n1,2\n")
+    cache = LoadCache(mode="frozen")
+    df = FileHandle.load(path, cache=cache)
+    df.loc[0, "a"] = 5
+    again = FileHandle.load(path, cache=cache)
+    assert again is not df and again.loc[0, "a"] == 1
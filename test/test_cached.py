@@ -0,0 +1,184 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from suthing.decorate import SProfiler, cached
+
+
+def test_cached_lru_ttl():
+    calls = []
+
+    @cached(maxsize=2, ttl=0.05)
+    def f(x, y=0, **kwargs):
+        calls.append((x, y))
+        return x + y
+
+    sp = SProfiler(aggregate=True)
+    assert [f(1, _profiler=sp), f(1, _profiler=sp), f(1, y=1), f(2), f(3), f(1)] == [
+        1,
+        1,
+        2,
+        2,
+        3,
+        1,
+    ]
+    assert calls == [(1, 0), (1, 1), (2, 0), (3, 0), (1, 0)]
+    info = f.cache_info()
+    assert (info.hits, info.misses, info.size, info.maxsize) == (1, 5, 2, 2)
+    assert sp.view_stats()["f:hit"].count == 1 and sp.view_stats()["f:miss"].count == 1
+    time.sleep(0.06)
+    f(1)
+    assert len(calls) == 6
+    f.cache_clear()
+    info = f.cache_info()
+    assert (info.size, info.hits, info.misses) == (0, 0, 0)
+
+
+@pytest.mark.parametrize("how", ["pkl", "json"])
+def test_cached_disk(tmp_path, how):
+    calls = []
+
+    def g(x):
+        calls.append(x)
+        return {"x": x}
+
+    first = cached(maxsize=0, path=str(tmp_path), how=how)(g)
+    assert first(1) == first(1) == {"x": 1}
+    assert len(os.listdir(tmp_path)) == 1
+    # another process (here another wrapper) reads the files
+    second = cached(path=str(tmp_path), how=how)(g)
+    assert second(1) == {"x": 1} and second(1) == {"x": 1}
+    assert calls == [1]
+    info = second.cache_info()
+    assert (info.disk_hits, info.hits, info.misses) == (1, 1, 0)
+    # corrupt or truncated files are recomputed
+    (file,) = os.listdir(tmp_path)
+    (tmp_path / file).write_bytes(b"\x80\x05truncated")
+    assert cached(path=str(tmp_path), how=how)(g)(1) == {"x": 1}
+    assert calls == [1, 1]
+    second.cache_clear()
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(ValueError):
+        cached(how="csv")
+
+
+def test_cached_single_flight():
+    calls = []
+    barrier = threading.Barrier(4)
+
+    @cached
+    def slow(x):
+        calls.append(x)
+        time.sleep(0.05)
+        if x < 0:
+            raise ValueError("x should be non negative")
+        return x
+
+    def run(x, results):
+        barrier.wait()
+        try:
+            results.append(slow(x))
+        except ValueError as e:
+            results.append(e)
+
+    for x in (7, -1):
+        results: list = []
+        threads = [threading.Thread(target=run, args=(x, results)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert calls.count(x) == 1
+        assert len(results) == 4
+        assert all(r == x for r in results) or all(
+            isinstance(r, ValueError) for r in results
+        )
+    # callers which waited for a failure are not counted
+    assert slow.cache_info().coalesced == 3
+
+    @cached(ttl=10)
+    async def aslow(x):
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        return x
+
+    async def main():
+        return await asyncio.gather(*(aslow(5) for _ in range(5)))
+
+    assert asyncio.run(main()) == [5] * 5
+    assert calls.count(5) == 1 and aslow.cache_info().coalesced == 4
+
+
+def test_cached_keys():
+    @cached
+    def kind(x):
+        return type(x).__name__
+
+    assert [kind(1), kind("1"), kind(1.0), kind(True)] == [
+        "int",
+        "str",
+        "float",
+        "bool",
+    ]
+
+    np = pytest.importorskip("numpy")
+
+    @cached
+    def total(a):
+        return a.sum()
+
+    a = np.zeros(10000)
+    b = a.copy()
+    b[5000] = 1
+    assert (total(a), total(b)) == (0, 1)
+    assert total.cache_info().misses == 2
+
+    @cached
+    def length(x):
+        return len(x)
+
+    # not picklable, not cached
+    x = [lambda: None]
+    assert length(x) == length(x) == 1
+    assert length.cache_info().misses == 2
+
+
+def test_cached_async_cancel():
+    calls = []
+
+    @cached
+    async def slow(x):
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return x
+
+    async def main():
+        leader = asyncio.ensure_future(slow(1))
+        await asyncio.sleep(0)
+        other = asyncio.ensure_future(slow(1))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await other
+
+    assert asyncio.run(main()) == 1
+    assert calls == [1] and slow.cache_info().size == 1
+
+    # callers in other event loops run their own computation
+    barrier = threading.Barrier(2)
+    results = []
+
+    def run():
+        barrier.wait()
+        results.append(asyncio.run(slow(2)))
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [2, 2]
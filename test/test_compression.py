@@ -0,0 +1,39 @@
+import importlib.util
+
+import pytest
+
+from suthing.compression import Compression
+from suthing.file_handle import FileHandle
+
+codecs = ["gz", "bz2", "xz", "lzma"]
+if importlib.util.find_spec("zstandard") is not None:
+    codecs += ["zst"]
+
+
+@pytest.mark.parametrize("codec", codecs)
+def test_roundtrip(tmp_path, parameters, codec):
+    _, rj = parameters
+    for ext in ["jsonld", "yaml", "pkl"]:
+        path = tmp_path / f"example.{ext}.{codec}"
+        FileHandle.dump(rj, path, compresslevel=1)
+        assert FileHandle.load(path) == rj
+    assert list(FileHandle.iter_load(tmp_path / f"example.jsonld.{codec}")) == rj
+
+
+def test_zstd_threads(tmp_path, parameters):
+    pytest.importorskip("zstandard")
+    _, rj = parameters
+    path = tmp_path / "example.jsonld.zst"
+    FileHandle.dump(rj * 1000, path, compresslevel=10, threads=2)
+    assert FileHandle.load(path) == rj * 1000
+
+
+def test_threads_unsupported(tmp_path, parameters):
+    _, rj = parameters
+    with pytest.raises(ValueError):
+        FileHandle.dump(rj, tmp_path / "example.json.gz", threads=2)
+
+
+def test_from_suffix():
+    assert Compression.from_suffix(".xz") == Compression.XZ
+    assert Compression.from_suffix(".json") is None
@@ -1,4 +1,18 @@
+import asyncio
+import inspect
+import pickle
+import time
+
+import pytest
+
 from suthing import secureit, timeit
+from suthing.decorate import (
+    Report,
+    Return,
+    SimpleReturn,
+    simple_secureit,
+    simple_timeit,
+)
 
 
 def test_update():
@@ -65,3 +79,104 @@ def test_combine():
     rneg1 = fa(-1)
     assert r5.success
     assert not rneg1.success
+
+
+def numbers(n, fail_at=None):
+    for i in range(n):
+        if i == fail_at:
+            raise ValueError("fail")
+        time.sleep(0.001)
+        yield i
+
+
+def test_generator():
+    r = timeit(numbers, "n")(3)
+    assert r.items == 0 and "3" in r.hkey
+    assert list(r.ret) == [0, 1, 2]
+    assert r.items == 3 and r.elapsed >= 0.003
+
+    r = secureit(numbers)(3, fail_at=1)
+    assert r.success is None
+    assert list(r.ret) == [0]
+    assert not r.success and isinstance(r.exception, ValueError)
+
+    r = timeit(secureit(numbers))(3, fail_at=2)
+    assert list(r.ret) == [0, 1]
+    assert not r.success and r.items == 2 and r.elapsed >= 0.002
+
+    r = simple_timeit(numbers)(2)
+    assert sum(r.ret) == 1 and r.items == 2
+
+    r = simple_secureit(timeit(numbers))(5)
+    it = iter(r.ret)
+    assert next(it) == 0
+    r.ret.close()
+    assert r.success and r.items == 1
+
+
+def test_coroutine():
+    async def a(x):
+        await asyncio.sleep(0.01)
+        if x < 0:
+            raise ValueError("x should be non negative")
+        return x + 2
+
+    ta = timeit(a, "x")
+    assert inspect.iscoroutinefunction(ta)
+    r = asyncio.run(ta(1))
+    assert r.ret == 3 and r.elapsed >= 0.01
+    r = asyncio.run(simple_timeit(secureit(a))(-1))
+    assert not r.success and r.elapsed >= 0.01
+
+
+def test_async_generator():
+    async def agen(n):
+        for i in range(n):
+            await asyncio.sleep(0.001)
+            if i == 2:
+                raise ValueError("fail")
+            yield i
+
+    async def consume(r):
+        return [i async for i in r.ret]
+
+    r = timeit(secureit(agen))(5)
+    assert asyncio.run(consume(r)) == [0, 1]
+    assert not r.success and r.items == 2 and r.elapsed >= 0.003
+
+
+def test_collect():
+    def allocate(n):
+        blocks = [bytearray(n) for _ in range(10)]
+        kept = blocks[0]
+        del blocks
+        return kept
+
+    r = timeit(allocate, collect=["cpu", "thread_cpu", "alloc", "rss"])(1 << 20)
+    assert sorted(r.metrics) == [
+        "alloc_net",
+        "alloc_peak",
+        "cpu",
+        "rss",
+        "thread_cpu",
+    ]
+    assert r.metrics["alloc_peak"] >= 10 << 20
+    assert (1 << 20) <= r.metrics["alloc_net"] < 2 << 20
+    assert r.metrics["cpu"] >= 0 and timeit(allocate)(1).metrics is None
+    with pytest.raises(ValueError):
+        timeit(allocate, collect="disk")
+
+
+def test_slots():
+    r = Return(ret=[1], hkey="a<(1)>", elapsed=0.5, success=True)
+    assert not hasattr(r, "__dict__") and r._reports is None
+    r.update([Return(hkey="b", elapsed=0.1), Report(hkey="c")])
+    assert [x.hkey for x in r.reports] == ["b", "c"]
+    assert type(r.reports[0]) is Report
+    copy = pickle.loads(pickle.dumps(r))
+    assert copy.ret == [1] and copy.reports[1].hkey == "c"
+    assert repr(r).splitlines()[0] == "hkey : 'a<(1)>' "
+    assert repr(r).splitlines()[6] == "ret : [1] "
+    s = SimpleReturn(ret=1)
+    with pytest.raises(AttributeError):
+        setattr(s, "hkey", "a")
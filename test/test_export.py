@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from suthing.decorate import SProfiler
+from suthing.export import Exporter, split_hkey, to_prometheus
+from suthing.file_handle import FileHandle
+
+
+def test_windows(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("suthing.decorate.default_timer", lambda: clock[0])
+    sp = SProfiler(window=60, resolution=10)
+    for i in range(12):
+        sp.add_metric("f(x=1)", value=float(i))
+        sp.add_metric("f(x=1)", "cpu", value=1.0)
+        clock[0] += 10
+    clock[0] -= 10
+    assert sp.view_stats(last=10)["f(x=1)"].count == 1
+    last = sp.view_stats(last=30)["f(x=1)"]
+    assert last.count == 3 and last.min == 9 and last.max == 11
+    assert sp.view_stats(last=60)["f(x=1):cpu"].total == 6
+    assert len(sp.view_stats()["f(x=1)"]) == 12
+    assert len(sp._slots) <= 7
+    with pytest.raises(ValueError):
+        sp.view_stats(last=120)
+    with pytest.raises(ValueError):
+        SProfiler().view_stats(last=10)
+
+
+def test_prometheus():
+    assert split_hkey("f(x=a:b)") == ("f(x=a:b)", "seconds")
+    assert split_hkey("f(x=1):alloc_peak") == ("f(x=1)", "alloc_peak")
+    sp = SProfiler(aggregate=True, window=60)
+    sp.add_metric('f(x="a")', value=0.5)
+    text = to_prometheus({None: sp.view_stats(), 60: sp.view_stats(last=60)})
+    lines = text.splitlines()
+    assert lines[0] == "# TYPE suthing_metric summary" and lines[-1] == "# EOF"
+    labels = 'hkey="f(x=\\"a\\")",metric="seconds"'
+    assert f"suthing_metric_sum{{{labels}}} 0.5" in lines
+    assert any(
+        line.startswith(f'suthing_metric{{{labels},quantile="0.99"}}') for line in lines
+    )
+    assert f'suthing_metric_count{{{labels},window="60"}} 1' in lines
+
+
+@pytest.mark.parametrize("ext", ["prom", "csv", "jsonld", "csv.gz", "jsonld.gz"])
+def test_exporter(tmp_path, ext):
+    path = tmp_path / f"metrics.{ext}"
+    sp = SProfiler(window=300)
+    with pytest.raises(ValueError):
+        Exporter(sp, path, windows=(600,))
+    with Exporter(sp, path, interval=0.05, windows=(None, 60)) as exporter:
+        sp.add_metric("f(x=1)", value=0.1)
+        time.sleep(0.2)
+    assert exporter.flushes >= 2
+    if ext == "prom":
+        assert "# EOF" in path.read_text()
+    else:
+        records = FileHandle.load(path)
+        records = records.to_dict("records") if "csv" in ext else records
+        assert len(records) == 2 * exporter.flushes
+        assert {r["hkey"] for r in records} == {"f(x=1)"}
+        assert records[-1]["count"] == 1
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+
+def test_exporter_appends(tmp_path):
+    path = tmp_path / "metrics.csv"
+    sp = SProfiler()
+    sp.add_metric("f(x=1)", value=0.1)
+    exporter = Exporter(sp, path)
+    exporter.flush()
+    head = path.read_bytes()
+    exporter.flush()
+    text = path.read_bytes()
+    # appended in place, the previous content left as is
+    assert text.startswith(head) and len(text.splitlines()) == 3
+    assert len(FileHandle.load(path)) == 2
+    with pytest.raises(ValueError):
+        Exporter(sp, tmp_path / "metrics.jsonld.lzma")
+
+
+def test_exporter_failures(tmp_path, caplog):
+    path = tmp_path / "missing" / "metrics.jsonld"
+    sp = SProfiler()
+    sp.add_metric("f(x=1)", value=0.1)
+    exporter = Exporter(sp, path, interval=0.02).start()
+    time.sleep(0.1)
+    assert "export of metrics" in caplog.text
+    path.parent.mkdir()
+    time.sleep(0.1)
+    exporter.stop()
+    assert len(FileHandle.load(path)) == exporter.flushes >= 2
@@ -1,6 +1,8 @@
+import asyncio
 import os
 
 import pandas as pd
+import pytest
 
 from suthing.file_handle import FileHandle
 
@@ -53,3 +55,90 @@ def test_csv_dump(parameters):
 def test_txt():
     r = FileHandle.load("test.data", "some.secret")
     assert r == "123"
+
+
+def test_iter_load_jsonld(parameters):
+    cpath, rj = parameters
+    path = os.path.join(cpath, "./data/example.jsonld")
+    assert list(FileHandle.iter_load(path)) == rj
+    r = list(FileHandle.iter_load(fpath=path + ".gz", batch_size=1))
+    assert r == [[item] for item in rj]
+
+
+def test_iter_load_package():
+    r = list(FileHandle.iter_load("test.data", "example.jsonld.gz", batch_size=5))
+    assert len(r) == 1 and len(r[0]) == 2
+
+
+def test_iter_load_csv(parameters):
+    cpath, _ = parameters
+    path = os.path.join(cpath, "./data/example.csv")
+    chunks = list(FileHandle.iter_load(path, batch_size=1))
+    assert pd.concat(chunks).shape == FileHandle.load(path).shape
+    chunks = list(FileHandle.iter_load(path, batch_size=1, chunksize=5))
+    assert all(len(c) == 1 for c in chunks)
+
+
+def test_memory_map(parameters):
+    cpath, rj = parameters
+    path = os.path.join(cpath, "./data/example.jsonld")
+    assert FileHandle.load(path, memory_map=True) == rj
+    assert FileHandle.load(path + ".gz", memory_map=True) == rj
+
+
+def test_columnar(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({"a": range(10), "b": [f"x{i}" for i in range(10)]})
+    for ext in ["parquet", "feather"]:
+        path = tmp_path / f"example.{ext}"
+        FileHandle.dump(df, path)
+        assert FileHandle.load(path).equals(df)
+        assert list(FileHandle.load(path, columns=["b"]).columns) == ["b"]
+        chunks = list(FileHandle.iter_load(path, batch_size=4))
+        assert [len(c) for c in chunks] == [4, 4, 2]
+    r = FileHandle.load(
+        tmp_path / "example.parquet", row_groups=[0], filters=[("a", ">", 6)]
+    )
+    assert r["a"].tolist() == [7, 8, 9]
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_load_many(parameters, executor):
+    cpath, rj = parameters
+    path = os.path.join(cpath, "./data/example.jsonld")
+    paths = [path, path + ".gz", os.path.join(cpath, "./data/missing.json")]
+    r = FileHandle.load_many(paths, workers=2, executor=executor)
+    assert [x.hkey for x in r] == paths
+    assert [x.ret for x in r[:2]] == [rj, rj]
+    assert not r[2].success and isinstance(r[2].exception, FileNotFoundError)
+    r = FileHandle.load_many(paths, ordered=False, as_iterator=True)
+    assert {x.hkey for x in r} == set(paths)
+
+
+def test_async(tmp_path, parameters):
+    _, rj = parameters
+    path = tmp_path / "example.jsonld.gz"
+
+    async def main():
+        await FileHandle.adump(rj, path)
+        loaded = await asyncio.gather(*[FileHandle.aload(path) for _ in range(10)])
+        records = [r async for r in FileHandle.aiter_load(path)]
+        return loaded, records
+
+    loaded, records = asyncio.run(main())
+    assert loaded == [rj] * 10
+    assert records == rj
+
+
+def test_async_cancel(tmp_path):
+    path = tmp_path / "large.jsonld"
+    FileHandle.dump([{"a": i} for i in range(200000)], path)
+
+    async def main():
+        task = asyncio.create_task(FileHandle.aload(path))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
@@ -0,0 +1,60 @@
+import subprocess
+import sys
+
+import pytest
+
+# cumulative import time of suthing, in microseconds, as reported by
+# python -X importtime; pandas alone takes several times more
+IMPORT_BUDGET = 200_000
+
+HEAVY = ["pandas", "numpy", "yaml", "dotenv", "pyarrow"]
+
+
+def loaded_modules(code: str) -> set[str]:
+    out = subprocess.run(
+        [sys.executable, "-c", f"import sys\n{code}\nprint(*sys.modules)"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return set(out.split())
+
+
+def test_import_budget():
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import suthing"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    line = next(s for s in err.splitlines() if s.rstrip().endswith("| suthing"))
+    cumulative = int(line.split("|")[1])
+    assert cumulative < IMPORT_BUDGET, err
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import suthing",
+        "from suthing import Timer, equals, profile, timeit, secureit, SProfiler",
+        "from suthing import FileHandle",
+    ],
+)
+def test_no_heavy_imports(code):
+    assert not loaded_modules(code) & set(HEAVY)
+
+
+def test_imports_on_use(tmp_path):
+    path = tmp_path / "x.json"
+    modules = loaded_modules(
+        "from suthing import FileHandle\n"
+        f"FileHandle.dump({{'a': 1}}, {str(path)!r}, how='json')\n"
+        f"FileHandle.load({str(path)!r})"
+    )
+    assert not modules & {"pandas", "dotenv"}
+    path = tmp_path / "x.csv"
+    path.write_text("a,b\n1,2\n")
+    modules = loaded_modules(
+        f"from suthing import FileHandle\nFileHandle.load({str(path)!r})"
+    )
+    assert "pandas" in modules
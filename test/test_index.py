@@ -0,0 +1,46 @@
+import gzip
+
+import pytest
+
+from suthing.file_handle import FileHandle
+
+records = [{"i": i, "s": "x" * (i % 17)} for i in range(1000)]
+
+
+@pytest.mark.parametrize("ext", ["jsonld", "jsonld.gz"])
+@pytest.mark.parametrize("indexed", [True, False])
+def test_index(tmp_path, ext, indexed):
+    path = tmp_path / f"records.{ext}"
+    FileHandle.dump(records, path, index=indexed, checkpoint=64)
+    index = FileHandle.index(path)
+    assert (tmp_path / f"records.{ext}.idx").exists()
+    assert len(index) == len(records)
+    assert index[0] == records[0] and index[-1] == records[-1]
+    assert index[500] == records[500]
+    assert index[130:270] == records[130:270]
+    r = list(FileHandle.iter_load(path, records=slice(990, None), batch_size=4))
+    assert r == [records[990:994], records[994:998], records[998:]]
+    assert FileHandle.load_parallel(path, shards=3) == records
+
+
+def test_index_members(tmp_path):
+    path = tmp_path / "records.jsonld.gz"
+    with open(path, "wb") as f:
+        for chunk in [
+            b'{"a": 1}\n\n{"b": ',
+            b"2}\n  \n",
+            b"  ",
+            b'{"c": 3}\n{"d"',
+            b":4}",
+        ]:
+            f.write(gzip.compress(chunk))
+    index = FileHandle.index(path)
+    assert index[0:4] == [{"a": 1}, {"b": 2}, {"c": 3}, {"d": 4}]
+    assert [index[i] for i in range(4)] == index[0:4]
+
+
+def test_index_stale(tmp_path):
+    path = tmp_path / "records.jsonld"
+    FileHandle.dump(records, path, index=True)
+    FileHandle.dump(records[:10], path)
+    assert len(FileHandle.index(path)) == 10
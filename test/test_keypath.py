@@ -0,0 +1,107 @@
+from typing import Any
+
+import pytest
+
+from suthing.backend import available_backends
+from suthing.file_handle import FileHandle
+from suthing.keypath import parse_path, select
+
+doc: dict[str, Any] = {
+    "models": {
+        "encoder": {"vocab": ["a", "b", "c"], "size": 3},
+        "decoder": {"layers": [{"dim": 4}, {"dim": 8, "x.y": True}]},
+    },
+    "name": "test",
+    "7": "seven",
+}
+
+
+def test_parse_path():
+    assert parse_path("a.b[3].c") == ("a", "b", 3, "c")
+    assert parse_path("a[0][1]") == ("a", 0, 1)
+    assert parse_path("""a["x.y"]['z']""") == ("a", "x.y", "z")
+    for path in ["", ".a", "a..b", "a[0]b", "a[x]"]:
+        with pytest.raises(ValueError):
+            parse_path(path)
+
+
+def test_select():
+    assert select(doc, "models.decoder.layers[1].dim") == 8
+    assert select(doc, ["name", "models.decoder.layers[1]['x.y']", "7"]) == {
+        "name": "test",
+        "models.decoder.layers[1]['x.y']": True,
+        "7": "seven",
+    }
+    with pytest.raises(KeyError):
+        select(doc, "models.encoder.vocab[3]")
+
+
+@pytest.mark.parametrize("ext", ["json", "yaml", "yaml.gz"])
+def test_load_select(tmp_path, ext):
+    path = tmp_path / f"doc.{ext}"
+    FileHandle.dump(doc, path)
+    paths = ["models.encoder", "models.encoder.vocab[2]", "models.decoder.layers[0]"]
+    assert FileHandle.load(path, select=paths) == {
+        "models.encoder": doc["models"]["encoder"],
+        "models.encoder.vocab[2]": "c",
+        "models.decoder.layers[0]": {"dim": 4},
+    }
+    assert FileHandle.load(path, select="name") == "test"
+    with pytest.raises(KeyError):
+        FileHandle.load(path, select=["name", "models.decoder.missing"])
+
+
+@pytest.mark.parametrize("backend", available_backends("yaml"))
+def test_load_select_yaml(tmp_path, backend):
+    path = tmp_path / "doc.yaml"
+    path.write_text(
+        "defaults: &defaults\n"
+        "  lr: 0.1\n"
+        "  steps: [1, 2]\n"
+        "runs:\n"
+        "  - name: a\n"
+        "    <<: *defaults\n"
+        "  - *defaults\n"
+        "---\n"
+        "other: 1\n"
+    )
+    assert FileHandle.load(path, select="runs[0]", backend=backend) == {
+        "name": "a",
+        "lr": 0.1,
+        "steps": [1, 2],
+    }
+    assert FileHandle.load(path, select="runs[1].steps[1]", backend=backend) == 2
+    with pytest.raises(KeyError):
+        FileHandle.load(path, select="other", backend=backend)
+
+
+@pytest.mark.parametrize("backend", available_backends("yaml"))
+def test_load_select_yaml_merge(tmp_path, backend):
+    path = tmp_path / "doc.yaml"
+    path.write_text(
+        "base: &b {host: h, port: 1, db: {name: x}}\n"
+        "extra: &e {host: e, user: u}\n"
+        "prod: {<<: *b, port: 2}\n"
+        "dev:\n"
+        "  <<: [*e, *b]\n"
+        "  '<<': quoted\n"
+    )
+    assert FileHandle.load(path, select="prod.host", backend=backend) == "h"
+    assert FileHandle.load(path, select="prod.port", backend=backend) == 2
+    assert FileHandle.load(path, select="prod.db.name", backend=backend) == "x"
+    paths = ["dev.host", "dev.user", "dev.port", "dev.<<"]
+    r = FileHandle.load(path, select=paths, backend=backend)
+    assert r == {"dev.host": "e", "dev.user": "u", "dev.port": 1, "dev.<<": "quoted"}
+    assert (
+        FileHandle.load(path, select="dev", backend=backend)
+        == FileHandle.load(path)["dev"]
+    )
+    with pytest.raises(KeyError):
+        FileHandle.load(path, select="prod.user", backend=backend)
+
+
+def test_load_select_json_without_ijson(tmp_path, monkeypatch):
+    monkeypatch.setattr("suthing.keypath._ijson", lambda: None)
+    path = tmp_path / "doc.json"
+    FileHandle.dump(doc, path)
+    assert FileHandle.load(path, select="models.encoder.vocab") == ["a", "b", "c"]
@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+import pytest
+
+from suthing.file_handle import FileHandle
+from suthing.manifest import read_manifest, split
+
+records = [{"i": i, "s": "x" * (i % 13)} for i in range(1000)]
+
+
+def test_split():
+    assert [len(c) for c in split(records, shards=3)] == [334, 334, 332]
+    assert [len(c) for c in split(iter(records), shard_size=400)] == [400, 400, 200]
+    chunks = list(split(records, shard_bytes=2000, measure=lambda s: 20 * len(s)))
+    assert len(chunks) == 10 and sum(chunks, []) == records
+    with pytest.raises(ValueError):
+        list(split(records, shards=2, shard_size=10))
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+@pytest.mark.parametrize("ext", ["jsonld", "jsonld.gz"])
+def test_dump_sharded(tmp_path, executor, ext):
+    path = tmp_path / "data.manifest"
+    how, _, compression = ext.partition(".")
+    shards = FileHandle.dump_sharded(
+        iter(records),
+        path,
+        how=how,
+        shard_size=300,
+        compression=compression or None,
+        workers=2,
+        executor=executor,
+    )
+    assert shards[1] == (tmp_path / f"data-00001.{ext}").as_posix()
+    manifest = read_manifest(str(path))
+    assert manifest["records"] == 1000
+    assert [s["records"] for s in manifest["shards"]] == [300, 300, 300, 100]
+    assert FileHandle.load(path) == records
+    assert FileHandle.load(path, workers=2, executor=executor) == records
+    assert list(FileHandle.iter_load(path, batch_size=500))[-1] == records[900:]
+
+
+def test_dump_sharded_frame(tmp_path):
+    path = tmp_path / "frame.manifest"
+    df = pd.DataFrame(records)
+    FileHandle.dump_sharded(df, path, how="pkl", shards=4)
+    assert len(os.listdir(tmp_path)) == 5
+    pd.testing.assert_frame_equal(FileHandle.load(path, workers=4), df)
+    with pytest.raises(ValueError):
+        FileHandle.dump_sharded(df, path, how="jsonld")
+    with pytest.raises(ValueError):
+        FileHandle.dump(df, path)
+
+
+def test_dump_sharded_failure(tmp_path):
+    path = tmp_path / "data.manifest"
+    bad = records[:10] + [{"x": object()}]
+    with pytest.raises(TypeError):
+        FileHandle.dump_sharded(bad, path, shard_size=5)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from suthing.file_handle import FileHandle
+from suthing.oob import ALIGNMENT, MAGIC
+
+
+@pytest.mark.parametrize("ext", ["pkl", "pkl.gz"])
+def test_out_of_band(tmp_path, ext):
+    path = tmp_path / f"model.{ext}"
+    weights = np.arange(1 << 16, dtype=np.float64).reshape(256, 256)
+    df = pd.DataFrame({"a": np.arange(10000), "b": np.linspace(0, 1, 10000)})
+    item = {"weights": weights, "df": df, "small": np.arange(3), "name": "m"}
+    FileHandle.dump(item, path, out_of_band=True)
+    r = FileHandle.load(path)
+    assert r["name"] == "m"
+    assert np.array_equal(r["weights"], weights)
+    assert np.array_equal(r["small"], item["small"])
+    pd.testing.assert_frame_equal(r["df"], df)
+    # copy-on-write: writable without touching the file
+    r["weights"][0, 0] = -1.0
+    assert FileHandle.load(path)["weights"][0, 0] == 0.0
+
+
+def test_out_of_band_layout(tmp_path):
+    path = tmp_path / "array.pkl"
+    weights = np.ones(1 << 12)
+    FileHandle.dump(weights, path, out_of_band=True)
+    content = path.read_bytes()
+    assert content.startswith(MAGIC)
+    offset = content.index(weights.tobytes())
+    assert offset % ALIGNMENT == 0
+    r = FileHandle.load(path)
+    assert np.array_equal(r, weights)
+    # backed by the mapping, not a copy
+    base = r
+    while isinstance(base, np.ndarray):
+        base = base.base
+    assert isinstance(base, memoryview)
+    # plain pickles are still read
+    FileHandle.dump(weights, path)
+    assert np.array_equal(FileHandle.load(path), weights)
+    with pytest.raises(ValueError):
+        FileHandle.dump(weights, tmp_path / "array.json", out_of_band=True)
@@ -1,4 +1,20 @@
-from suthing.decorate import SProfiler, profile
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from suthing.collectors import Collector
+from suthing.decorate import (
+    ProfileSnapshot,
+    SProfiler,
+    derive_hid,
+    profile,
+    profiling_enabled,
+    set_profiling,
+)
+from suthing.file_handle import FileHandle
 
 
 def test_profile():
@@ -33,3 +49,214 @@ def test_profile_nested():
     _ = list(sp.view_stats().keys())[0]
     print(sp.view_stats())
     # assert len(sp.accumulator[k]) == 1
+
+
+def test_profile_aggregate():
+    sp = SProfiler(aggregate=True)
+
+    @profile(_argnames="x")
+    def a(x, **kwargs):
+        return x
+
+    for _ in range(1000):
+        a(x=1, _profiler=sp)
+    a(x=2, _profiler=sp)
+    stats = sp.view_stats()
+    assert sorted(s.count for s in stats.values()) == [1, 1000]
+    s = max(stats.values(), key=lambda s: s.count)
+    assert s.min <= s.p50 <= s.p99 <= s.max * 1.01
+    assert s.total == pytest.approx(s.mean * s.count)
+    assert not sp._accumulator
+
+
+def work(n):
+    sp = SProfiler(aggregate=True)
+    for i in range(n):
+        sp.add_metric("work", value=i)
+    return sp.snapshot()
+
+
+@pytest.mark.parametrize("aggregate", [False, True])
+def test_profile_threads(aggregate):
+    sp = SProfiler(aggregate=aggregate)
+
+    def add(i):
+        for _ in range(2000):
+            sp.add_metric(f"k{i % 2}", value=1.0)
+        # reads concurrent with writes
+        sp.view_stats()
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(add, range(16)))
+    stats = sp.view_stats()
+    counts = [s.count if aggregate else len(s) for s in stats.values()]
+    assert counts == [16000, 16000]
+
+
+def test_profile_snapshots(tmp_path):
+    with ProcessPoolExecutor(2) as pool:
+        snapshots = list(pool.map(work, [100, 300]))
+    sp = SProfiler(aggregate=True)
+    for snapshot in snapshots:
+        sp.merge(snapshot)
+    s = sp.view_stats()["work"]
+    assert (
+        s.count == 400 and s.max == 299 and s.total == sum(range(100)) + sum(range(300))
+    )
+    merged = snapshots[0].merge(snapshots[1])
+    FileHandle.dump(merged.to_dict(), tmp_path / "profile.json")
+    loaded = ProfileSnapshot.from_dict(FileHandle.load(tmp_path / "profile.json"))
+    assert loaded.stats["work"].summary() == s
+
+    raw = SProfiler()
+    raw.add_metric("work", value=1)
+    sp.merge(raw)
+    assert sp.view_stats()["work"].count == 401
+    with pytest.raises(ValueError):
+        raw.merge(sp)
+
+
+def test_profile_overhead_options():
+    sp = SProfiler()
+
+    @profile(_argnames="y", _sample=10)
+    def a(x, y, **kwargs):
+        return x + y
+
+    for i in range(100):
+        assert a(i, y=1, _profiler=sp) == i + 1
+    assert list(sp.view_stats()) == ["a(y=1)"]
+    assert len(sp.view_stats()["a(y=1)"]) == 10
+
+    set_profiling(False)
+    try:
+        assert not profiling_enabled()
+        a(1, y=2, _profiler=sp)
+    finally:
+        set_profiling(True)
+    assert "a(y=2)" not in sp.view_stats()
+
+
+def test_profile_keys():
+    sp = SProfiler()
+
+    @profile
+    def f(x, **kwargs):
+        return x
+
+    @profile(_argnames="y")
+    def g(x, y=None, **kwargs):
+        return x
+
+    calls = [((1,), {}), ((1.0,), {}), ((True,), {}), (([1, 2],), {"z": "a"})]
+    for args, kwargs in calls:
+        f(*args, **kwargs, _profiler=sp)
+        g(*args, **kwargs, _profiler=sp)
+    keys = [
+        name + derive_hid(argnames, *args, **kwargs, _profiler=sp)
+        for args, kwargs in calls
+        for name, argnames in (("f", None), ("g", "y"))
+    ]
+    assert len(set(keys)) == 8 and set(sp.view_stats()) == set(keys)
+    # the value of a named argument passed positionally is the first argument
+    g(3, 4, _profiler=sp)
+    assert "g(y=3)" in sp.view_stats()
+
+    @profile
+    def b(x, **kwargs):
+        return x
+
+    b(1, _profiler=sp)
+    b(1, _profiler=sp)
+    b([1], _profiler=sp)
+    assert sorted(len(v) for k, v in sp.view_stats().items() if k[0] == "b") == [1, 2]
+
+    with pytest.raises(TypeError):
+        profile(_argnames=["x"])
+
+
+def test_profile_keys_cached(monkeypatch):
+    hashed = []
+
+    def hash_args(*args, **kwargs):
+        hashed.append(args)
+        return hashlib.sha256(repr(args).encode()).hexdigest()
+
+    monkeypatch.setattr("suthing.decorate.hash_args", hash_args)
+    sp = SProfiler()
+
+    @profile
+    def f(x, **kwargs):
+        return x
+
+    for x in [1, 1, 1.0, True, (1,), (1,), [1], [1]]:
+        f(x, _profiler=sp)
+    # hashed once per typed hashable argument, at every call otherwise
+    assert len(hashed) == 6 and len(sp.view_stats()) == 5
+
+
+def test_profile_async_and_generators():
+    sp = SProfiler()
+
+    @profile(_argnames="n")
+    async def a(n, **kwargs):
+        await asyncio.sleep(0.01)
+        return n
+
+    @profile(_argnames="n")
+    def g(n, **kwargs):
+        for i in range(n):
+            time.sleep(0.001)
+            yield i
+
+    @profile(_argnames="n")
+    async def ag(n, **kwargs):
+        for i in range(n):
+            await asyncio.sleep(0.001)
+            yield i
+
+    async def consume():
+        return [i async for i in ag(4, _profiler=sp)]
+
+    assert asyncio.run(a(1, _profiler=sp)) == 1
+    assert list(g(3, _profiler=sp)) == [0, 1, 2]
+    for i in g(5, _profiler=sp):
+        if i == 1:
+            break
+    assert asyncio.run(consume()) == [0, 1, 2, 3]
+    stats = sp.view_stats()
+    assert stats["a(n=1)"][0] >= 0.01
+    assert len(stats["g(n=3):item"]) == 3 and stats["g(n=3)"][0] >= 0.003
+    assert len(stats["g(n=5):item"]) == 2 and len(stats["g(n=5)"]) == 1
+    assert len(stats["ag(n=4):item"]) == 4 and stats["ag(n=4)"][0] >= 0.004
+    assert list(g(2)) == [0, 1]
+
+
+def test_profile_collect():
+    sp = SProfiler(aggregate=True, trace=True)
+
+    @profile(_argnames="n", _collect=("thread_cpu", "alloc"))
+    def inner(n, **kwargs):
+        return bytearray(n)
+
+    @profile(_argnames="n", _collect="alloc")
+    def outer(n, **kwargs):
+        big = bytearray(4 * n)
+        del big
+        return [inner(n, **kwargs) for _ in range(2)]
+
+    outer(1 << 20, _profiler=sp)
+    stats = sp.view_stats()
+    assert stats["inner(n=1048576):thread_cpu"].count == 2
+    assert stats["inner(n=1048576):alloc_net"].min >= 1 << 20
+    # the peak of outer precedes the calls of inner resetting it
+    assert stats["outer(n=1048576):alloc_peak"].max >= 4 << 20
+    assert stats["outer(n=1048576):alloc_net"].max >= 2 << 20
+    assert "outer(n=1048576):self" in stats
+
+    class Partial(Collector):
+        def start(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()  # type: ignore
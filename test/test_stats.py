@@ -0,0 +1,40 @@
+import math
+import pickle
+import random
+import statistics
+
+import pytest
+
+from suthing.stats import QuantileSketch, RunningStats
+
+
+def test_running_stats():
+    rng = random.Random(0)
+    values = [rng.lognormvariate(0, 1) for _ in range(20000)]
+    a, b = RunningStats(), RunningStats()
+    for v in values[:5000]:
+        a.add(v)
+    for v in values[5000:]:
+        b.add(v)
+    a.merge(b)
+    s = pickle.loads(pickle.dumps(a)).summary()
+    assert s.count == len(values)
+    assert s.min == min(values) and s.max == max(values)
+    assert s.mean == pytest.approx(statistics.mean(values))
+    assert s.std == pytest.approx(statistics.stdev(values))
+    q = statistics.quantiles(values, n=100)
+    for estimate, exact in [(s.p50, q[49]), (s.p95, q[94]), (s.p99, q[98])]:
+        assert estimate == pytest.approx(exact, rel=0.03)
+    assert math.isnan(RunningStats().summary().p50)
+
+
+def test_sketch_bounded():
+    sketch = QuantileSketch(max_buckets=64)
+    for i in range(-1000, 100000):
+        sketch.add(i * 1.37)
+    assert len(sketch._positive) <= 64 and len(sketch._negative) <= 64
+    assert sketch.quantile(0) < 0 and sketch.quantile(1) == pytest.approx(
+        99999 * 1.37, rel=0.02
+    )
+    with pytest.raises(ValueError):
+        sketch.merge(QuantileSketch(relative_accuracy=0.05))
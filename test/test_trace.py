@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from suthing.decorate import SProfiler, profile
+from suthing.file_handle import FileHandle
+from suthing.trace import Tracer, current_span
+
+
+@profile(_argnames="x")
+def leaf(x, **kwargs):
+    time.sleep(0.01)
+    return x
+
+
+@profile(_argnames="n")
+def root(n, **kwargs):
+    time.sleep(0.01)
+    return [leaf(i, **kwargs) for i in range(n)]
+
+
+def test_trace_nested():
+    sp = SProfiler(trace=True)
+    root(3, _profiler=sp)
+    assert sp.tracer is not None
+    stats = sp.view_stats()
+    inclusive, self_time = stats["root(n=3)"][0], stats["root(n=3):self"][0]
+    assert inclusive >= 0.04 and 0.01 <= self_time < 0.02
+    assert stats["leaf(x=0)"][0] >= 0.01 and "leaf(x=0):self" in stats
+    stacks = sp.tracer.folded()
+    assert set(stacks) == {"root(n=3)"} | {f"root(n=3);leaf(x={i})" for i in range(3)}
+    assert current_span() is None
+
+
+def test_trace_tasks_and_threads():
+    sp = SProfiler(trace=True)
+
+    @profile(_argnames="x")
+    async def child(x, **kwargs):
+        await asyncio.sleep(0.01)
+        return x
+
+    @profile(_argnames="n")
+    async def parent(n, **kwargs):
+        return await asyncio.gather(*(child(i, **kwargs) for i in range(n)))
+
+    tracer = sp.tracer
+    assert tracer is not None
+    assert asyncio.run(parent(3, _profiler=sp)) == [0, 1, 2]
+    assert "parent(n=3);child(x=2)" in tracer.folded()
+    assert sp.view_stats()["parent(n=3):self"][0] >= 0
+
+    with tracer.span("main"):
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(2) as executor:
+            executor.submit(leaf, 7, _profiler=sp).result()
+            executor.submit(context.run, leaf, 8, _profiler=sp).result()
+    stacks = tracer.folded()
+    assert "leaf(x=7)" in stacks and "main;leaf(x=8)" in stacks
+    # leaf(x=7) runs outside of the context of main, hence in its self time
+    events = {e["name"]: e for e in tracer.chrome_trace()["traceEvents"]}
+    main = events["main"]
+    assert main["dur"] - main["args"]["self_us"] == pytest.approx(
+        events["leaf(x=8)"]["dur"]
+    )
+    assert stacks["main"] >= 0.01
+
+
+def test_trace_export(tmp_path):
+    tracer = Tracer(max_spans=2)
+    with tracer.span("a"):
+        with tracer.span("b"):
+            time.sleep(0.002)
+        with tracer.span("c"):
+            pass
+    tracer.dump_chrome_trace(tmp_path / "trace.json.gz")
+    events = FileHandle.load(tmp_path / "trace.json.gz")["traceEvents"]
+    assert [e["name"] for e in events] == ["c", "a"]
+    assert events[1]["dur"] >= 2000 and events[1]["args"]["self_us"] < 2000
+    tracer.dump_folded(tmp_path / "stacks.folded")
+    lines = (tmp_path / "stacks.folded").read_text().splitlines()
+    assert [line.split()[0] for line in lines] == ["a", "a;b", "a;c"]
+    assert int(lines[1].split()[1]) >= 2000
@@ -0,0 +1,60 @@
+import dataclasses
+from typing import Any
+
+import pytest
+
+from suthing.file_handle import FileHandle
+from suthing.typed import decode, decoder
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: float
+    tags: list[str] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class Shape:
+    name: str
+    points: list[Point]
+
+
+points: list[dict[str, Any]] = [
+    {"x": i, "y": i / 2, "tags": ["a"] * (i % 3)} for i in range(100)
+]
+
+
+def test_decode():
+    assert decoder(Point) is decoder(Point)
+    assert decode({"x": "1", "y": 2}, Point) == Point(1, 2.0)
+    assert decode(points[:2], list[Point]) == [Point(0, 0.0), Point(1, 0.5, ["a"])]
+    with pytest.raises(ValueError):
+        decode(points[0], list[Point])
+    with pytest.raises(ValueError):
+        decoder(dict)
+
+
+@pytest.mark.parametrize("ext", ["json", "yaml", "pkl"])
+def test_load_into(tmp_path, ext):
+    path = tmp_path / f"shape.{ext}"
+    FileHandle.dump({"name": "s", "points": points}, path)
+    shape = FileHandle.load(path, into=Shape)
+    assert shape.name == "s" and shape.points[98] == Point(98, 49.0, ["a", "a"])
+
+
+@pytest.mark.parametrize("ext", ["jsonld", "jsonld.gz", "csv"])
+def test_load_into_records(tmp_path, ext):
+    path = tmp_path / f"points.{ext}"
+    if ext == "csv":
+        path.write_text("x,y\n" + "".join(f"{p['x']},{p['y']}\n" for p in points))
+        expected = [Point(p["x"], p["y"]) for p in points]
+    else:
+        FileHandle.dump(points, path)
+        expected = [Point(**p) for p in points]
+    assert FileHandle.load(path, into=Point) == expected
+    assert FileHandle.load(path, into=list[Point]) == expected
+    batches = list(FileHandle.iter_load(path, into=Point, batch_size=30))
+    assert batches[-1] == expected[90:]
+    if ext != "csv":
+        assert list(FileHandle.iter_load(path, into=Point)) == expected
@@ -0,0 +1,57 @@
+import os
+
+import pandas as pd
+import pytest
+
+from suthing.file_handle import FileHandle
+
+
+@pytest.mark.parametrize("ext", ["jsonld", "jsonld.gz", "json", "json.bz2"])
+def test_writer(tmp_path, ext):
+    path = tmp_path / f"records.{ext}"
+    records = [{"a": i, "b": str(i)} for i in range(25)]
+    with FileHandle.writer(path, batch_size=10) as w:
+        w.write(records[0])
+        w.write_many(records[1:])
+        assert not path.exists()
+    assert w.count == 25
+    assert FileHandle.load(path) == records
+
+
+@pytest.mark.parametrize("ext", ["jsonld", "jsonld.gz", "csv", "csv.xz"])
+def test_writer_append(tmp_path, ext):
+    path = tmp_path / f"records.{ext}"
+    with FileHandle.writer(path) as w:
+        w.write_many([{"a": 1, "b": "x"}, {"a": 2, "b": "y"}])
+    with FileHandle.writer(path, mode="a", batch_size=1) as w:
+        w.write({"b": "z", "a": 3})
+        if ext.startswith("csv"):
+            w.write_many(pd.DataFrame({"a": [4], "b": ["t"]}))
+    r = FileHandle.load(path)
+    if ext.startswith("csv"):
+        assert r["a"].tolist() == [1, 2, 3, 4]
+        assert list(r.columns) == ["a", "b"]
+    else:
+        assert r == [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}, {"b": "z", "a": 3}]
+
+
+@pytest.mark.parametrize("ext", ["jsonld", "csv.gz"])
+def test_writer_in_place(tmp_path, ext):
+    path = tmp_path / f"records.{ext}"
+    for i in range(3):
+        with FileHandle.writer(path, mode="a", atomic=False) as w:
+            w.write({"a": i, "b": str(i)})
+    assert os.listdir(tmp_path) == [path.name]
+    r = FileHandle.load(path)
+    r = r.to_dict("records") if ext.startswith("csv") else r
+    assert [x["a"] for x in r] == [0, 1, 2]
+
+
+def test_writer_abort(tmp_path):
+    path = tmp_path / "records.jsonld"
+    FileHandle.dump([{"a": 0}], path)
+    with pytest.raises(RuntimeError), FileHandle.writer(path) as w:
+        w.write({"a": 1})
+        raise RuntimeError
+    assert FileHandle.load(path) == [{"a": 0}]
+    assert os.listdir(tmp_path) == ["records.jsonld"]